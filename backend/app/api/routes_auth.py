@@ -3,20 +3,26 @@ from __future__ import annotations
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.auth.security import (
     authenticate,
-    create_access_token,
-    create_refresh_token,
     get_current_user,
     get_role_value,
+    oauth2_scheme,
 )
-from app.database.session import get_db
+from app.auth.tokens import (
+    issue_tokens,
+    revoke_access_token,
+    revoke_refresh_token,
+    rotate_refresh_token,
+)
+from app.database.session import SessionLocal, get_db
 from app.models.user import User
 from app.schemas import auth as auth_schema
-from jose import JWTError, jwt
+from jose import jwt
 from app.core.config import get_settings
 
 router = APIRouter(redirect_slashes=False)
@@ -24,6 +30,13 @@ settings = get_settings()
 logger = logging.getLogger(__name__)
 
 
+def _issue_login_tokens(user: User) -> dict:
+    with SessionLocal() as db:
+        tokens = issue_tokens(db, user)
+        db.commit()
+    return tokens
+
+
 async def _extract_credentials(request: Request) -> tuple[str | None, str | None]:
     content_type = request.headers.get("content-type", "")
     if content_type.startswith("application/json"):
@@ -38,7 +51,7 @@ async def _extract_credentials(request: Request) -> tuple[str | None, str | None
 
 
 @router.post("/login", response_model=auth_schema.Token)
-async def login(request: Request, db: Session = Depends(get_db)):
+async def login(request: Request):
     """
     Тестовые запросы:
       curl -i -X POST http://127.0.0.1:8000/api/auth/login -H "Content-Type: application/json" -d '{"login":"admin","password":"..."}'
@@ -47,17 +60,9 @@ async def login(request: Request, db: Session = Depends(get_db)):
     login_value: str | None = None
     try:
         login_value, password = await _extract_credentials(request)
-        user = authenticate(db, login_value, password)
-        role_value = get_role_value(user.role)
-        token_payload = {
-            "sub": str(user.id),
-            "user_id": user.id,
-            "role": role_value,
-            "branch_id": user.branch_id,
-        }
-        access_token = create_access_token(token_payload)
-        refresh_token = create_refresh_token(token_payload)
-        return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+        # The lookup runs in the request threadpool and bcrypt in the password pool.
+        user = await authenticate(login_value, password)
+        return await run_in_threadpool(_issue_login_tokens, user)
     except HTTPException as exc:
         error_code = "LOGIN_HTTP_ERROR" if exc.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR else "LOGIN_AUTH_FAILED"
         if exc.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR:
@@ -86,7 +91,7 @@ async def login(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=auth_schema.AuthUser)
-async def get_profile(current_user: User = Depends(get_current_user)):
+def get_profile(current_user: User = Depends(get_current_user)):
     return auth_schema.AuthUser(
         id=current_user.id,
         login=current_user.login,
@@ -99,26 +104,26 @@ async def get_profile(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/refresh", response_model=auth_schema.Token)
-async def refresh_token(payload: auth_schema.RefreshRequest, db: Session = Depends(get_db)):
+def refresh_token(payload: auth_schema.RefreshRequest, db: Session = Depends(get_db)):
     try:
-        data = jwt.decode(payload.refresh_token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-    except JWTError as exc:
-        raise HTTPException(status_code=401, detail="Invalid refresh token") from exc
-    user_id = data.get("user_id") or data.get("sub")
-    try:
-        user = db.get(User, user_id)
+        tokens = rotate_refresh_token(db, payload.refresh_token)
+        db.commit()
     except SQLAlchemyError as exc:
-        logger.exception("Database error during token refresh for user %s", user_id)
+        db.rollback()
+        logger.exception("Database error during token refresh")
         raise HTTPException(status_code=500, detail="Ошибка базы данных при обновлении токена") from exc
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    role_value = get_role_value(user.role)
-    token_payload = {
-        "sub": str(user.id),
-        "user_id": user.id,
-        "role": role_value,
-        "branch_id": user.branch_id,
-    }
-    access_token = create_access_token(token_payload)
-    refresh_token = create_refresh_token(token_payload)
-    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+    return tokens
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    payload: auth_schema.LogoutRequest | None = None,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    revoke_access_token(db, jwt.get_unverified_claims(token))
+    if payload and payload.refresh_token:
+        revoke_refresh_token(db, payload.refresh_token, current_user.id)
+    db.commit()
+    return None
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
@@ -9,6 +9,7 @@ from app.database.session import get_db
 from app.models.entities import Branch, Product, Stock
 from app.models.user import User
 from app.schemas import branches as branch_schema
+from app.services.exports import EXPORT_FORMAT_PATTERN, ExportColumn, export_response
 
 router = APIRouter(redirect_slashes=False)
 
@@ -18,7 +19,7 @@ router = APIRouter(redirect_slashes=False)
     response_model=list[branch_schema.Branch],
     dependencies=[Depends(require_employee)],
 )
-async def list_branches(
+def list_branches(
     db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
 ):
     query = select(Branch)
@@ -29,7 +30,7 @@ async def list_branches(
 
 
 @router.post("", response_model=branch_schema.Branch, dependencies=[Depends(require_admin)])
-async def create_branch(payload: branch_schema.BranchCreate, db: Session = Depends(get_db)):
+def create_branch(payload: branch_schema.BranchCreate, db: Session = Depends(get_db)):
     branch = Branch(**payload.dict())
     db.add(branch)
     db.commit()
@@ -42,7 +43,7 @@ async def create_branch(payload: branch_schema.BranchCreate, db: Session = Depen
     response_model=branch_schema.Branch,
     dependencies=[Depends(require_admin)],
 )
-async def update_branch(branch_id: int, payload: branch_schema.BranchUpdate, db: Session = Depends(get_db)):
+def update_branch(branch_id: int, payload: branch_schema.BranchUpdate, db: Session = Depends(get_db)):
     branch = db.get(Branch, branch_id)
     if not branch:
         raise HTTPException(status_code=404, detail="Branch not found")
@@ -58,7 +59,7 @@ async def update_branch(branch_id: int, payload: branch_schema.BranchUpdate, db:
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[Depends(require_admin)],
 )
-async def delete_branch(branch_id: int, db: Session = Depends(get_db)):
+def delete_branch(branch_id: int, db: Session = Depends(get_db)):
     branch = db.get(Branch, branch_id)
     if not branch:
         raise HTTPException(status_code=404, detail="Branch not found")
@@ -68,7 +69,7 @@ async def delete_branch(branch_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{branch_id}/stock", dependencies=[Depends(require_employee)])
-async def branch_stock(
+def branch_stock(
     branch_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -91,3 +92,42 @@ async def branch_stock(
             }
         )
     return response
+
+
+STOCK_EXPORT_COLUMNS = (
+    ExportColumn("product_id", "ID товара"),
+    ExportColumn("product", "Товар"),
+    ExportColumn("barcode", "Штрихкод"),
+    ExportColumn("unit", "Ед."),
+    ExportColumn("quantity", "Остаток"),
+    ExportColumn("limit", "Мин. остаток"),
+    ExportColumn("purchase_price", "Закупочная цена"),
+    ExportColumn("sale_price", "Цена продажи"),
+)
+
+
+@router.get("/{branch_id}/stock/export", dependencies=[Depends(require_employee)])
+def export_branch_stock(
+    branch_id: int,
+    export_format: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    db: Session = Depends(get_db),
+):
+    branch = db.get(Branch, branch_id)
+    if not branch:
+        raise HTTPException(status_code=404, detail="Branch not found")
+    query = (
+        select(
+            Stock.product_id.label("product_id"),
+            Product.name.label("product"),
+            Product.barcode.label("barcode"),
+            Product.unit.label("unit"),
+            Stock.quantity.label("quantity"),
+            Product.limit.label("limit"),
+            Product.purchase_price.label("purchase_price"),
+            Product.sale_price.label("sale_price"),
+        )
+        .join(Product, Stock.product_id == Product.id)
+        .where(Stock.branch_id == branch_id)
+        .order_by(Product.name, Stock.product_id)
+    )
+    return export_response(query, STOCK_EXPORT_COLUMNS, f"stock_{branch_id}", export_format)
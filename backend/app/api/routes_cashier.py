@@ -1,18 +1,21 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import case, select
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 
 from app.auth.security import get_current_user
 from app.core.config import get_settings
 from app.database.session import get_db
-from app.models.entities import Branch, Product, Stock
+from app.models.entities import Branch
 from app.models.user import User
-from app.schemas.cashier import CashierProduct
+from app.schemas.cashier import CashierCatalogDelta, CashierProduct
+from app.services.catalog import catalog_cache
 
 router = APIRouter(redirect_slashes=False)
 
+CATALOG_VERSION_HEADER = "X-Catalog-Version"
+
 
 def _get_sale_branch(db: Session) -> Branch:
     settings = get_settings()
@@ -22,39 +25,44 @@ def _get_sale_branch(db: Session) -> Branch:
     return branch
 
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip() for value in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+
 @router.get("/products", response_model=list[CashierProduct])
-async def list_cashier_products(
+def list_cashier_products(
+    since: int | None = Query(None, ge=0, description="Версия каталога; вернуть только изменения после неё"),
+    if_none_match: str | None = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    """Cashier catalogue served from the in-process snapshot.
+
+    Responds 304 when ``If-None-Match`` carries the current ETag. With ``since`` the body is a
+    ``CashierCatalogDelta`` holding only products changed after that version (``full`` is set
+    when the version is unknown and every product is returned).
+    """
     # Employees without branch assignment still can sell from main store; no additional filter by user branch
     sale_branch = _get_sale_branch(db)
-    query = (
-        select(Product, Stock)
-        .join(Stock, (Stock.product_id == Product.id) & (Stock.branch_id == sale_branch.id), isouter=True)
-        .options(joinedload(Product.category))
-        .order_by(
-            case((Product.rating.is_(None) | (Product.rating == 0), 0), else_=1),
-            Product.rating.asc(),
-            Product.name.asc(),
-        )
+    snapshot = catalog_cache.snapshot(db, sale_branch.id)
+    headers = {
+        "ETag": snapshot.etag,
+        CATALOG_VERSION_HEADER: str(snapshot.version),
+        "Cache-Control": "no-cache",
+    }
+    if _etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if since is None:
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+    changes = catalog_cache.changes_since(snapshot, since)
+    delta = CashierCatalogDelta(
+        version=changes.version,
+        full=changes.full,
+        items=changes.items,
+        removed=changes.removed,
     )
-    rows = db.execute(query).all()
-    items: list[CashierProduct] = []
-    for product, stock in rows:
-        items.append(
-            CashierProduct(
-                id=product.id,
-                name=product.name,
-                barcode=product.barcode,
-                sale_price=product.sale_price or 0,
-                red_price=float(product.red_price) if product.red_price is not None else None,
-                unit=product.unit,
-                image_url=product.image_url,
-                photo=product.photo,
-                available_qty=stock.quantity if stock else 0,
-                category=product.category.name if product.category else None,
-                rating=product.rating or 0,
-            )
-        )
-    return items
+    return Response(content=delta.model_dump_json(), media_type="application/json", headers=headers)
@@ -15,13 +15,13 @@ logger = logging.getLogger(__name__)
 
 
 @router.get("", response_model=list[category_schema.Category], dependencies=[Depends(require_employee)])
-async def list_categories(db: Session = Depends(get_db)):
+def list_categories(db: Session = Depends(get_db)):
     result = db.execute(select(Category).order_by(Category.name))
     return result.scalars().all()
 
 
 @router.post("", response_model=category_schema.Category, dependencies=[Depends(require_employee)])
-async def create_category(payload: category_schema.CategoryCreate, db: Session = Depends(get_db)):
+def create_category(payload: category_schema.CategoryCreate, db: Session = Depends(get_db)):
     category = Category(name=payload.name)
     db.add(category)
     db.commit()
@@ -30,7 +30,7 @@ async def create_category(payload: category_schema.CategoryCreate, db: Session =
 
 
 @router.put("/{category_id}", response_model=category_schema.Category, dependencies=[Depends(require_admin)])
-async def update_category(category_id: int, payload: category_schema.CategoryUpdate, db: Session = Depends(get_db)):
+def update_category(category_id: int, payload: category_schema.CategoryUpdate, db: Session = Depends(get_db)):
     category = db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -41,7 +41,7 @@ async def update_category(category_id: int, payload: category_schema.CategoryUpd
 
 
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_admin)])
-async def delete_category(category_id: int, db: Session = Depends(get_db)):
+def delete_category(category_id: int, db: Session = Depends(get_db)):
     category = db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
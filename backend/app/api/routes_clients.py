@@ -1,23 +1,27 @@
+from decimal import Decimal
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.auth.security import require_admin, require_employee
+from app.auth.security import get_current_user, require_admin, require_employee
 from app.database.session import get_db
 from app.models.entities import Client
+from app.models.user import User
 from app.schemas import clients as client_schema
+from app.services.debt_ledger import ENTRY_OPENING, post_entry, set_balance
 
 router = APIRouter(redirect_slashes=False)
 
 
 @router.get("", response_model=list[client_schema.Client], dependencies=[Depends(require_employee)])
-async def list_clients(db: Session = Depends(get_db)):
+def list_clients(db: Session = Depends(get_db)):
     result = db.execute(select(Client))
     return result.scalars().all()
 
 
 @router.get("/{client_id}", response_model=client_schema.Client, dependencies=[Depends(require_employee)])
-async def get_client(client_id: int, db: Session = Depends(get_db)):
+def get_client(client_id: int, db: Session = Depends(get_db)):
     client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
@@ -30,9 +34,18 @@ async def get_client(client_id: int, db: Session = Depends(get_db)):
     status_code=status.HTTP_201_CREATED,
     dependencies=[Depends(require_employee)],
 )
-async def create_client(payload: client_schema.ClientCreate, db: Session = Depends(get_db)):
-    client = Client(**payload.dict())
+def create_client(
+    payload: client_schema.ClientCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    data = payload.dict()
+    opening_debt = data.pop("total_debt", 0)
+    client = Client(**data)
     db.add(client)
+    db.flush()
+    if opening_debt:
+        post_entry(db, client.id, Decimal(str(opening_debt)), ENTRY_OPENING, created_by_id=current_user.id)
     db.commit()
     db.refresh(client)
     return client
@@ -43,12 +56,22 @@ async def create_client(payload: client_schema.ClientCreate, db: Session = Depen
     response_model=client_schema.Client,
     dependencies=[Depends(require_admin)],
 )
-async def update_client(client_id: int, payload: client_schema.ClientUpdate, db: Session = Depends(get_db)):
+def update_client(
+    client_id: int,
+    payload: client_schema.ClientUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
-    for field, value in payload.dict(exclude_unset=True).items():
+    updates = payload.dict(exclude_unset=True)
+    total_debt = updates.pop("total_debt", None)
+    for field, value in updates.items():
         setattr(client, field, value)
+    if total_debt is not None:
+        # Manual corrections go through the ledger like every other balance change.
+        set_balance(db, client.id, Decimal(str(total_debt)), created_by_id=current_user.id)
     db.commit()
     db.refresh(client)
     return client
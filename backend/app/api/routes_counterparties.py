@@ -11,7 +11,7 @@ router = APIRouter(redirect_slashes=False, dependencies=[Depends(require_admin)]
 
 
 @router.get("", response_model=list[counterparty_schema.Counterparty])
-async def list_counterparties(
+def list_counterparties(
     q: str | None = None,
     limit: int | None = None,
     db: Session = Depends(get_db),
@@ -34,7 +34,7 @@ async def list_counterparties(
 
 
 @router.get("/{counterparty_id}", response_model=counterparty_schema.Counterparty)
-async def get_counterparty(counterparty_id: int, db: Session = Depends(get_db)):
+def get_counterparty(counterparty_id: int, db: Session = Depends(get_db)):
     counterparty = db.get(Counterparty, counterparty_id)
     if not counterparty:
         raise HTTPException(status_code=404, detail="Counterparty not found")
@@ -42,7 +42,7 @@ async def get_counterparty(counterparty_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("", response_model=counterparty_schema.Counterparty, status_code=status.HTTP_201_CREATED)
-async def create_counterparty(
+def create_counterparty(
     payload: counterparty_schema.CounterpartyCreate,
     db: Session = Depends(get_db),
 ):
@@ -54,7 +54,7 @@ async def create_counterparty(
 
 
 @router.put("/{counterparty_id}", response_model=counterparty_schema.Counterparty)
-async def update_counterparty(
+def update_counterparty(
     counterparty_id: int,
     payload: counterparty_schema.CounterpartyUpdate,
     db: Session = Depends(get_db),
@@ -70,7 +70,7 @@ async def update_counterparty(
 
 
 @router.delete("/{counterparty_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_counterparty(counterparty_id: int, db: Session = Depends(get_db)):
+def delete_counterparty(counterparty_id: int, db: Session = Depends(get_db)):
     counterparty = db.get(Counterparty, counterparty_id)
     if not counterparty:
         raise HTTPException(status_code=404, detail="Counterparty not found")
@@ -54,7 +54,7 @@ def _map_sale_to_summary(sale: CounterpartySale) -> sales_schema.CounterpartySal
 
 
 @router.get("", response_model=list[sales_schema.CounterpartySaleSummary])
-async def list_counterparty_sales(
+def list_counterparty_sales(
     start_date: date | None = None,
     end_date: date | None = None,
     counterparty_id: int | None = None,
@@ -71,7 +71,7 @@ async def list_counterparty_sales(
 
 
 @router.post("", response_model=sales_schema.CounterpartySaleDetail, status_code=status.HTTP_201_CREATED)
-async def create_counterparty_sale(
+def create_counterparty_sale(
     payload: sales_schema.CounterpartySaleCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -133,11 +133,11 @@ async def create_counterparty_sale(
         raise
 
     db.refresh(sale)
-    return await get_counterparty_sale_detail(sale.id, db=db)
+    return get_counterparty_sale_detail(sale.id, db=db)
 
 
 @router.get("/{sale_id}", response_model=sales_schema.CounterpartySaleDetail)
-async def get_counterparty_sale_detail(sale_id: int, db: Session = Depends(get_db)):
+def get_counterparty_sale_detail(sale_id: int, db: Session = Depends(get_db)):
     sale = db.execute(
         select(CounterpartySale)
         .where(CounterpartySale.id == sale_id)
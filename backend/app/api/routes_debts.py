@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+from datetime import date, datetime, time
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.auth.security import get_current_user, require_employee
@@ -12,6 +13,9 @@ from app.models.entities import Client, Debt, DebtPayment
 from app.models.user import User
 from app.schemas.debts import DebtPayment as DebtPaymentSchema
 from app.schemas.debts import DebtPaymentCreate
+from app.services.debt_ledger import ENTRY_PAYMENT, allocate_payment, lock_balance, post_entry
+from app.services.exports import EXPORT_FORMAT_PATTERN, ExportColumn, export_response
+from app.services.rollups import record_debt_payment
 
 router = APIRouter(redirect_slashes=False)
 
@@ -22,7 +26,7 @@ router = APIRouter(redirect_slashes=False)
     status_code=status.HTTP_201_CREATED,
     dependencies=[Depends(require_employee)],
 )
-async def pay_off_debt(
+def pay_off_debt(
     payload: DebtPaymentCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -43,39 +47,14 @@ async def pay_off_debt(
 
     try:
         amount_decimal = Decimal(str(payload.amount)).quantize(Decimal("0.01"))
-        current_debt = Decimal(str(client.total_debt or 0)).quantize(Decimal("0.01"))
+        current_debt = lock_balance(db, client.id)
         applied_amount = min(amount_decimal, current_debt) if current_debt > 0 else amount_decimal
 
-        remaining = applied_amount
-        targeted_debts: list[Debt] = []
         if payload.debt_id:
             targeted = db.get(Debt, payload.debt_id)
             if not targeted or targeted.client_id != client.id:
                 raise HTTPException(status_code=404, detail="Долг не найден")
-            targeted_debts.append(targeted)
-
-        if not targeted_debts:
-            targeted_debts = (
-                db.execute(
-                    select(Debt)
-                    .where(Debt.client_id == client.id, Debt.amount > Debt.paid)
-                    .order_by(Debt.created_at)
-                )
-                .scalars()
-                .all()
-            )
-
-        for debt in targeted_debts:
-            debt_remaining = Decimal(str(debt.amount)) - Decimal(str(debt.paid or 0))
-            if debt_remaining <= 0:
-                continue
-            portion = min(remaining, debt_remaining)
-            debt.paid = float(Decimal(str(debt.paid or 0)) + portion)
-            remaining -= portion
-            if remaining <= 0:
-                break
-
-        client.total_debt = float(max(current_debt - applied_amount, Decimal("0")))
+        allocate_payment(db, client.id, applied_amount, debt_id=payload.debt_id)
 
         debt_payment = DebtPayment(
             client_id=client.id,
@@ -87,6 +66,19 @@ async def pay_off_debt(
             branch_id=branch_id,
         )
         db.add(debt_payment)
+        db.flush()
+        # The balance never goes below zero: an overpayment is recorded but not credited.
+        balance_change = max(current_debt - applied_amount, Decimal("0")) - current_debt
+        if balance_change:
+            post_entry(
+                db,
+                client.id,
+                balance_change,
+                ENTRY_PAYMENT,
+                debt_payment_id=debt_payment.id,
+                created_by_id=current_user.id,
+            )
+        record_debt_payment(db, debt_payment)
         db.commit()
     except Exception:
         db.rollback()
@@ -94,3 +86,50 @@ async def pay_off_debt(
 
     db.refresh(debt_payment)
     return debt_payment
+
+
+DEBT_EXPORT_COLUMNS = (
+    ExportColumn("id", "№"),
+    ExportColumn("created_at", "Дата"),
+    ExportColumn("client_name", "Клиент"),
+    ExportColumn("client_phone", "Телефон"),
+    ExportColumn("sale_id", "Продажа"),
+    ExportColumn("amount", "Сумма долга"),
+    ExportColumn("paid", "Оплачено"),
+    ExportColumn("remaining", "Остаток"),
+)
+
+
+@router.get("/export", dependencies=[Depends(require_employee)])
+def export_debts(
+    client_id: int | None = None,
+    open_only: bool = True,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    export_format: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+):
+    """Debts oldest first (the order payments are allocated in) as a CSV or XLSX download."""
+    remaining = Debt.amount - func.coalesce(Debt.paid, 0)
+    query = (
+        select(
+            Debt.id.label("id"),
+            Debt.created_at.label("created_at"),
+            Client.name.label("client_name"),
+            Client.phone.label("client_phone"),
+            Debt.sale_id.label("sale_id"),
+            Debt.amount.label("amount"),
+            func.coalesce(Debt.paid, 0).label("paid"),
+            remaining.label("remaining"),
+        )
+        .join(Client, Debt.client_id == Client.id)
+        .order_by(Debt.client_id, Debt.created_at, Debt.id)
+    )
+    if client_id:
+        query = query.where(Debt.client_id == client_id)
+    if open_only:
+        query = query.where(remaining > 0)
+    if start_date:
+        query = query.where(Debt.created_at >= datetime.combine(start_date, time.min))
+    if end_date:
+        query = query.where(Debt.created_at <= datetime.combine(end_date, time.max))
+    return export_response(query, DEBT_EXPORT_COLUMNS, "debts", export_format)
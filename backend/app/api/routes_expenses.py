@@ -103,7 +103,7 @@ async def expenses_preflight() -> JSONResponse:
 
 
 @router.get("", response_model=list[ExpenseOut], dependencies=[Depends(require_employee)])
-async def list_expenses(
+def list_expenses(
     request: Request,
     start_date: date | None = None,
     end_date: date | None = None,
@@ -159,7 +159,7 @@ async def list_expenses(
     status_code=status.HTTP_201_CREATED,
     dependencies=[Depends(require_employee)],
 )
-async def create_expense(
+def create_expense(
     request: Request,
     payload: ExpenseCreate,
     db: Session = Depends(get_db),
@@ -231,7 +231,7 @@ async def create_expense(
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[Depends(require_admin)],
 )
-async def delete_expense(
+def delete_expense(
     expense_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -1,19 +1,27 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session, selectinload
 
 from app.auth.security import get_current_user, require_admin, require_employee
+from app.core.config import get_settings
 from app.core.enums import UserRole
+from app.core.pagination import NEXT_CURSOR_HEADER, created_at_keyset, decode_created_at_cursor, encode_cursor
 from app.database.session import get_db
-from app.models.entities import Branch, Income, IncomeItem, Product
+from app.models.entities import Branch, Category, Income, Product
 from app.models.user import User
 from app.schemas import income as income_schema
+from app.services.income import apply_receipt, import_receipt, parse_receipt_csv, require_products, serialize_income
 from app.services.inventory import adjust_stock
 
 router = APIRouter(redirect_slashes=False)
 
+INCOME_MAX_PAGE_SIZE = 200
+
 
 def _get_or_create_workshop(db: Session) -> Branch:
     workshop = db.query(Branch).filter(Branch.is_workshop.is_(True)).first()
@@ -46,21 +54,34 @@ def _resolve_branch(branch_id: int | None, current_user: User, db: Session) -> i
 
 
 @router.get("", response_model=list[income_schema.Income], dependencies=[Depends(require_employee)])
-async def list_income(
+def list_income(
+    response: Response,
     branch_id: int | None = None,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=INCOME_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     role_value = current_user.role.value if hasattr(current_user.role, "value") else current_user.role
     target_branch_id = _resolve_branch(branch_id, current_user, db) if branch_id or role_value in {UserRole.EMPLOYEE.value, UserRole.PRODUCTION_MANAGER.value, UserRole.MANAGER.value} else None
-    query = select(Income).order_by(Income.created_at.desc())
+    query = select(Income).options(selectinload(Income.items))
     if target_branch_id is not None:
         query = query.where(Income.branch_id == target_branch_id)
-    result = db.execute(query)
-    incomes = result.scalars().unique().all()
-    for income in incomes:
-        db.refresh(income, attribute_names=["items"])
-    return incomes
+    if start_date:
+        query = query.where(Income.created_at >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        query = query.where(Income.created_at <= datetime.combine(end_date, datetime.max.time()))
+    if cursor:
+        query = query.where(created_at_keyset(Income.created_at, Income.id, decode_created_at_cursor(cursor)))
+    query = query.order_by(Income.created_at.desc(), Income.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    incomes = db.execute(query).scalars().all()
+    if limit is not None and len(incomes) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(incomes[-1].created_at, incomes[-1].id)
+    return [serialize_income(income) for income in incomes]
 
 
 @router.post(
@@ -69,35 +90,78 @@ async def list_income(
     status_code=status.HTTP_201_CREATED,
     dependencies=[Depends(require_employee)],
 )
-async def create_income(
+def create_income(
     payload: income_schema.IncomeCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     branch_id = _resolve_branch(payload.branch_id, current_user, db)
-    income = Income(branch_id=branch_id, created_by_id=current_user.id)
-    db.add(income)
-    db.flush()
-    for item in payload.items:
-        product = db.get(Product, item.product_id)
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-        income_item = IncomeItem(
-            income_id=income.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            purchase_price=item.purchase_price,
-            sale_price=item.sale_price,
-        )
-        db.add(income_item)
-        product.quantity += item.quantity
-        product.purchase_price = item.purchase_price
-        product.sale_price = item.sale_price
-        adjust_stock(db, branch_id, item.product_id, item.quantity)
+    require_products(db, [item.product_id for item in payload.items])
+    income = apply_receipt(db, branch_id, current_user.id, payload.items).income
     db.commit()
     db.refresh(income)
     db.refresh(income, attribute_names=["items"])
-    return income
+    return serialize_income(income)
+
+
+def _import_income(
+    db: Session,
+    current_user: User,
+    branch_id: int | None,
+    items: list[income_schema.IncomeImportItem],
+    create_missing: bool,
+    category_id: int | None,
+) -> income_schema.IncomeImportResult:
+    max_lines = get_settings().income_import_max_lines
+    if not items:
+        raise HTTPException(status_code=400, detail="Нет товаров для прихода")
+    if len(items) > max_lines:
+        raise HTTPException(status_code=400, detail=f"Слишком много строк в приходе (максимум {max_lines})")
+    target_branch_id = _resolve_branch(branch_id, current_user, db)
+    if category_id is not None and db.get(Category, category_id) is None:
+        raise HTTPException(status_code=400, detail="Категория не найдена")
+    result = import_receipt(db, target_branch_id, current_user.id, items, create_missing, category_id)
+    db.commit()
+    income = result.income
+    db.refresh(income, attribute_names=["items"])
+    return income_schema.IncomeImportResult(
+        income=serialize_income(income),
+        lines=len(items),
+        products=len(result.stock),
+        created_products=result.created_products,
+    )
+
+
+@router.post(
+    "/import",
+    response_model=income_schema.IncomeImportResult,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_employee)],
+)
+def import_income(
+    payload: income_schema.IncomeImport,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return _import_income(db, current_user, payload.branch_id, payload.items, payload.create_missing, payload.category_id)
+
+
+@router.post(
+    "/import/csv",
+    response_model=income_schema.IncomeImportResult,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_employee)],
+)
+def import_income_csv(
+    file: UploadFile = File(...),
+    branch_id: int | None = Query(None),
+    create_missing: bool = Query(False),
+    category_id: int | None = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    items = parse_receipt_csv(file.file.read())
+    return _import_income(db, current_user, branch_id, items, create_missing, category_id)
 
 
 @router.delete(
@@ -105,7 +169,7 @@ async def create_income(
     status_code=status.HTTP_200_OK,
     dependencies=[Depends(require_admin)],
 )
-async def delete_income(
+def delete_income(
     income_id: int,
     db: Session = Depends(get_db),
 ):
@@ -73,7 +73,7 @@ def _date_bounds(dt: date, start: bool) -> datetime:
 
 
 @router.get("", response_model=list[MovementSummary], dependencies=[Depends(require_employee)])
-async def list_movements(
+def list_movements(
     branch_id: int | None = None,
     status: MovementStatus | None = None,
     date_from: date | None = None,
@@ -129,7 +129,7 @@ async def list_movements(
     status_code=status.HTTP_201_CREATED,
     dependencies=[Depends(require_employee)],
 )
-async def create_movement(
+def create_movement(
     payload: MovementCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -190,7 +190,7 @@ async def create_movement(
     db.commit()
     db.refresh(movement)
     db.refresh(movement, attribute_names=["items", "from_branch", "to_branch", "created_by"])
-    return await get_movement_detail(movement.id, db=db, current_user=current_user)
+    return get_movement_detail(movement.id, db=db, current_user=current_user)
 
 
 @router.post(
@@ -198,7 +198,7 @@ async def create_movement(
     response_model=MovementDetail,
     dependencies=[Depends(require_employee)],
 )
-async def accept_movement(
+def accept_movement(
     movement_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -240,7 +240,7 @@ async def accept_movement(
         raise
 
     db.refresh(movement)
-    return await get_movement_detail(movement_id, db=db, current_user=current_user)
+    return get_movement_detail(movement_id, db=db, current_user=current_user)
 
 
 @router.post(
@@ -248,7 +248,7 @@ async def accept_movement(
     response_model=MovementDetail,
     dependencies=[Depends(require_employee)],
 )
-async def reject_movement(
+def reject_movement(
     movement_id: int,
     reason: str | None = None,
     db: Session = Depends(get_db),
@@ -278,11 +278,11 @@ async def reject_movement(
         db.rollback()
         raise
     db.refresh(movement)
-    return await get_movement_detail(movement_id, db=db, current_user=current_user)
+    return get_movement_detail(movement_id, db=db, current_user=current_user)
 
 
 @router.get("/{movement_id}", response_model=MovementDetail, dependencies=[Depends(require_employee)])
-async def get_movement_detail(
+def get_movement_detail(
     movement_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -1,14 +1,23 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import exists, func, select
 from sqlalchemy.orm import Session
 
 from app.auth.security import get_current_user, require_employee
+from app.core.config import get_settings
 from app.database.session import get_db
 from app.models.entities import Branch, Product, Stock
 from app.models.user import User
-from app.schemas.pos import PosProduct
+from app.schemas.pos import PosBarcodeProduct, PosProduct
+from app.services.catalog import barcode_index
+from app.services.product_search import (
+    DEFAULT_SEARCH_LIMIT,
+    MAX_SEARCH_LIMIT,
+    normalize_search_term,
+    product_match,
+    product_rank,
+)
 
 router = APIRouter(redirect_slashes=False)
 
@@ -22,29 +31,44 @@ def _resolve_branch_scope(branch_id: int | None, current_user: User) -> int | No
 
 
 @router.get("/products", response_model=list[PosProduct], dependencies=[Depends(require_employee)])
-async def search_products_for_pos(
+def search_products_for_pos(
     query: str | None = None,
     barcode: str | None = None,
     branch_id: int | None = None,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    query = normalize_search_term(query)
     if not query and not barcode:
         return []
 
     target_branch = _resolve_branch_scope(branch_id, current_user)
 
+    if barcode:
+        criteria = [Product.barcode == barcode]
+        order = [Product.name.asc(), Product.id.asc()]
+    else:
+        criteria = [product_match(query)]
+        order = [product_rank(query), Product.name.asc(), Product.id.asc()]
+    if target_branch is not None:
+        criteria.append(exists().where(Stock.product_id == Product.id, Stock.branch_id == target_branch))
+
+    # ``limit`` counts products: rank and cut the ids first, then join every stock row of each.
+    ranked = (
+        select(Product.id, func.row_number().over(order_by=order).label("position"))
+        .where(*criteria)
+        .order_by(*order)
+        .limit(limit)
+        .subquery()
+    )
     stmt = (
         select(Product, Stock, Branch)
+        .join(ranked, ranked.c.id == Product.id)
         .join(Stock, Stock.product_id == Product.id, isouter=True)
         .join(Branch, Stock.branch_id == Branch.id, isouter=True)
+        .order_by(ranked.c.position, Branch.id.asc())
     )
-
-    if barcode:
-        stmt = stmt.where(Product.barcode == barcode)
-    elif query:
-        stmt = stmt.where(func.lower(Product.name).like(f"%{query.lower()}%"))
-
     if target_branch is not None:
         stmt = stmt.where(Stock.branch_id == target_branch)
 
@@ -67,3 +91,36 @@ async def search_products_for_pos(
         )
 
     return items
+
+
+@router.get("/barcode/{code}", response_model=PosBarcodeProduct, dependencies=[Depends(require_employee)])
+def get_product_by_barcode(
+    code: str,
+    branch_id: int | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Scanner fast path: served from the in-process barcode index, not a stock join."""
+    target_branch = _resolve_branch_scope(branch_id, current_user)
+    if target_branch is None:
+        settings = get_settings()
+        target_branch = db.execute(
+            select(Branch.id).where(Branch.name == settings.sale_branch_name)
+        ).scalar_one_or_none()
+        if target_branch is None:
+            raise HTTPException(status_code=400, detail=f"Филиал продажи '{settings.sale_branch_name}' не найден")
+
+    found = barcode_index.lookup(db, code, target_branch)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    entry, quantity = found
+    return PosBarcodeProduct(
+        id=entry.id,
+        name=entry.name,
+        barcode=entry.barcode,
+        sale_price=entry.sale_price,
+        red_price=entry.red_price,
+        unit=entry.unit,
+        branch_id=target_branch,
+        quantity=quantity,
+    )
@@ -3,11 +3,12 @@ from __future__ import annotations
 from datetime import datetime, date
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from sqlalchemy.orm import Session, joinedload
 
 from app.auth.security import get_current_user, require_production_access
 from app.core.enums import UserRole
+from app.core.pagination import NEXT_CURSOR_HEADER, created_at_keyset, decode_created_at_cursor, encode_cursor
 from app.database.session import get_db
 from app.models import (
     Branch,
@@ -22,6 +23,8 @@ from app.schemas import production as production_schema
 
 router = APIRouter(redirect_slashes=False, dependencies=[Depends(require_production_access)])
 
+ORDERS_MAX_PAGE_SIZE = 200
+
 
 WORKSHOP_NAME = "Цех"
 
@@ -51,17 +54,47 @@ def _ensure_order(db: Session, order_id: int) -> ProductionOrder:
     return order
 
 
-@router.get("/orders", response_model=list[production_schema.ProductionOrderOut])
-def list_orders(db: Session = Depends(get_db)):
-    orders = (
-        db.query(ProductionOrder)
-        .options(
-            joinedload(ProductionOrder.materials),
-            joinedload(ProductionOrder.payments),
+@router.get(
+    "/orders",
+    response_model=list[production_schema.ProductionOrderSummary],
+    description=(
+        "Production orders, newest first. Materials and payments are served by "
+        "`/orders/{order_id}` only. Pass `limit` to page through the list: the next page's "
+        "`cursor` is returned in the X-Next-Cursor header."
+    ),
+)
+def list_orders(
+    response: Response,
+    status_filter: str | None = Query(None, alias="status"),
+    start_date: date | None = Query(None),
+    end_date: date | None = Query(None),
+    customer: str | None = Query(None, description="Часть имени клиента"),
+    branch_id: int | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    db: Session = Depends(get_db),
+):
+    query = db.query(ProductionOrder)
+    if status_filter:
+        query = query.filter(ProductionOrder.status == status_filter)
+    if start_date:
+        query = query.filter(ProductionOrder.created_at >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        query = query.filter(ProductionOrder.created_at <= datetime.combine(end_date, datetime.max.time()))
+    if customer and customer.strip():
+        query = query.filter(ProductionOrder.customer_name.icontains(customer.strip(), autoescape=True))
+    if branch_id is not None:
+        query = query.filter(ProductionOrder.branch_id == branch_id)
+    if cursor:
+        query = query.filter(
+            created_at_keyset(ProductionOrder.created_at, ProductionOrder.id, decode_created_at_cursor(cursor))
         )
-        .order_by(ProductionOrder.created_at.desc())
-        .all()
-    )
+    query = query.order_by(ProductionOrder.created_at.desc(), ProductionOrder.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    orders = query.all()
+    if limit is not None and len(orders) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(orders[-1].created_at, orders[-1].id)
     return orders
 
 
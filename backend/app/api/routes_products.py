@@ -3,7 +3,7 @@ from __future__ import annotations
 import logging
 
 from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
-from sqlalchemy import case, or_, select
+from sqlalchemy import case, select
 from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError, SQLAlchemyError
 from sqlalchemy.orm import Session
 
@@ -15,6 +15,7 @@ from app.models.user import User
 from app.schemas import stock as stock_schema
 from app.schemas import products as product_schema
 from app.services.files import save_upload
+from app.services.product_search import apply_product_search, normalize_search_term, search_limit
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +23,7 @@ router = APIRouter(redirect_slashes=False)
 
 
 @router.get("", response_model=list[product_schema.Product], dependencies=[Depends(require_employee)])
-async def list_products(
+def list_products(
     branch_id: int | None = None,
     q: str | None = None,
     limit: int | None = None,
@@ -35,15 +36,8 @@ async def list_products(
         if target_branch_id is None:
             raise HTTPException(status_code=400, detail="Сотрудник не привязан к филиалу")
 
+    q = normalize_search_term(q)
     query = select(Product)
-    if q:
-        like = f"%{q}%"
-        query = query.where(
-            or_(
-                Product.name.ilike(like),
-                Product.barcode.ilike(like),
-            )
-        )
     if target_branch_id is not None:
         query = query.join(
             Stock,
@@ -51,20 +45,24 @@ async def list_products(
             isouter=True,
         )
 
-    query = query.order_by(
+    rating_order = (
         case((Product.rating.is_(None) | (Product.rating == 0), 0), else_=1),
         Product.rating.asc(),
         Product.name.asc(),
     )
-    if limit:
-        query = query.limit(limit)
+    if q:
+        query = apply_product_search(query, q, *rating_order).limit(search_limit(limit))
+    else:
+        query = query.order_by(*rating_order)
+        if limit:
+            query = query.limit(limit)
 
     result = db.execute(query)
     return result.scalars().all()
 
 
 @router.post("", response_model=product_schema.Product, dependencies=[Depends(require_employee)])
-async def create_product(payload: product_schema.ProductCreate, db: Session = Depends(get_db)):
+def create_product(payload: product_schema.ProductCreate, db: Session = Depends(get_db)):
     settings = get_settings()
     safe_payload = payload.model_dump(exclude_none=True)
     logger.info("Incoming product payload: %s", safe_payload)
@@ -124,7 +122,7 @@ async def create_product(payload: product_schema.ProductCreate, db: Session = De
     response_model=product_schema.Product,
     dependencies=[Depends(require_admin)],
 )
-async def update_product(product_id: int, payload: product_schema.ProductUpdate, db: Session = Depends(get_db)):
+def update_product(product_id: int, payload: product_schema.ProductUpdate, db: Session = Depends(get_db)):
     product = db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -158,7 +156,7 @@ async def update_product(product_id: int, payload: product_schema.ProductUpdate,
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[Depends(require_admin)],
 )
-async def delete_product(product_id: int, db: Session = Depends(get_db)):
+def delete_product(product_id: int, db: Session = Depends(get_db)):
     product = db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -214,7 +212,7 @@ async def upload_photo(
 
 
 @router.get("/low-stock", response_model=list[stock_schema.LowStockItem], dependencies=[Depends(require_employee)])
-async def low_stock(
+def low_stock(
     branch_id: int | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
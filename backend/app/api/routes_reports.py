@@ -1,9 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
 from datetime import date, datetime, time, timedelta
-from calendar import monthrange
 
-from sqlalchemy import case, func, select
-from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload
 
 from app.auth.security import get_current_user, require_admin
 from app.core.enums import UserRole
@@ -11,21 +10,19 @@ from app.database.session import get_db
 from app.models.entities import (
     Branch,
     Client,
-    CounterpartySale,
-    CounterpartySaleItem,
-    Debt,
+    ClosedPeriod,
     DebtPayment,
-    Expense,
     Product,
+    ReportResult,
     Return,
-    ReturnItem,
-    SalaryPayment,
     Sale,
     SaleItem,
     User,
 )
 from app.schemas import reports as report_schema
-from app.services.returns import calculate_return_breakdowns
+from app.services.period_close import close_period, reopen_period
+from app.services.report_jobs import cached_report, submit_report
+from app.services.rollups import rollup_totals, rollup_totals_by_day
 
 router = APIRouter(redirect_slashes=False)
 
@@ -63,7 +60,7 @@ def _resolve_report_scope(
         "if no seller_id is provided, the current user is applied automatically."
     ),
 )
-async def get_summary(
+def get_summary(
     start_date: date | None = None,
     end_date: date | None = None,
     branch_id: int | None = None,
@@ -78,89 +75,23 @@ async def get_summary(
         start_date = end_date
     start_date = start_date or date.today()
     end_date = end_date or start_date
-    start_dt = datetime.combine(start_date, time.min)
-    end_dt = datetime.combine(end_date, time.max)
 
     if seller_id is None and user_id is not None:
         seller_id = user_id
     seller_id, branch_id = _resolve_report_scope(current_user, seller_id, branch_id)
 
-    sale_filters = [Sale.created_at >= start_dt, Sale.created_at <= end_dt]
-    if branch_id:
-        sale_filters.append(Sale.branch_id == branch_id)
-    if seller_id:
-        sale_filters.append(Sale.seller_id == seller_id)
-
-    sales_total, cash_total, card_total, _ = db.execute(
-        select(
-            func.coalesce(func.sum(Sale.total_amount), 0),
-            func.coalesce(func.sum(Sale.paid_cash), 0),
-            func.coalesce(func.sum(Sale.paid_card), 0),
-            func.coalesce(func.sum(Sale.paid_debt), 0),
-        ).where(*sale_filters)
-    ).one()
-
-    return_query = (
-        select(Return)
-        .options(
-            selectinload(Return.items),
-            joinedload(Return.sale),
-        )
-        .where(Return.created_at >= start_dt, Return.created_at <= end_dt)
-    )
-    if branch_id:
-        return_query = return_query.where(Return.branch_id == branch_id)
-    if seller_id:
-        return_query = return_query.where(Return.created_by_id == seller_id)
-    return_entries = db.execute(return_query).scalars().unique().all()
-    return_breakdowns = calculate_return_breakdowns(return_entries)
-    refunds_total = sum(b.total for b in return_breakdowns.values())
-    refunds_cash = sum(b.cash for b in return_breakdowns.values())
-    refunds_card = sum(b.card for b in return_breakdowns.values())
-    refunds_debt = sum(b.debt for b in return_breakdowns.values())
-
-    debt_filters = [
-        DebtPayment.created_at >= start_dt,
-        DebtPayment.created_at <= end_dt,
-    ]
-    if branch_id:
-        debt_filters.append(DebtPayment.branch_id == branch_id)
-    if seller_id:
-        debt_filters.append(DebtPayment.processed_by_id == seller_id)
-
-    debt_payment_cash, debt_payment_card, debt_payments_amount = db.execute(
-        select(
-            func.coalesce(
-                func.sum(
-                    case((DebtPayment.payment_type == "cash", DebtPayment.amount), else_=0)
-                ),
-                0,
-            ),
-            func.coalesce(
-                func.sum(
-                    case(
-                        (DebtPayment.payment_type.notin_(["cash", "offset"]), DebtPayment.amount),
-                        else_=0,
-                    )
-                ),
-                0,
-            ),
-            func.coalesce(
-                func.sum(case((DebtPayment.payment_type != "offset", DebtPayment.amount), else_=0)),
-                0,
-            ),
-        ).where(*debt_filters)
-    ).one()
-
-    debt_created_query = select(func.coalesce(func.sum(Debt.amount), 0)).select_from(Debt)
-    if branch_id or seller_id:
-        debt_created_query = debt_created_query.select_from(Debt.__table__.join(Sale, Debt.sale_id == Sale.id))
-        if branch_id:
-            debt_created_query = debt_created_query.where(Sale.branch_id == branch_id)
-        if seller_id:
-            debt_created_query = debt_created_query.where(Sale.seller_id == seller_id)
-    debt_created_query = debt_created_query.where(Debt.created_at >= start_dt, Debt.created_at <= end_dt)
-    debts_created_amount = db.execute(debt_created_query).scalar() or 0
+    totals = rollup_totals(db, start_date, end_date, branch_id=branch_id, seller_id=seller_id)
+    sales_total = totals["sales_total"]
+    cash_total = totals["sales_cash"]
+    card_total = totals["sales_card"]
+    refunds_total = totals["refunds_total"]
+    refunds_cash = totals["refunds_cash"]
+    refunds_card = totals["refunds_card"]
+    refunds_debt = totals["refunds_debt"]
+    debt_payment_cash = totals["debt_payments_cash"]
+    debt_payment_card = totals["debt_payments_card"]
+    debt_payments_amount = totals["debt_payments_total"]
+    debts_created_amount = totals["debts_created"]
 
     total_debt_all_clients = db.execute(select(func.coalesce(func.sum(Client.total_debt), 0))).scalar() or 0
 
@@ -202,149 +133,90 @@ async def get_summary(
     response_model=report_schema.ProfitReportResponse,
     dependencies=[Depends(require_admin)],
 )
-async def get_profit_report(
+def get_profit_report(
     month: str,
     db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
 ):
-    try:
-        period_start = datetime.strptime(month, "%Y-%m").date()
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM.") from exc
-
-    _, last_day = monthrange(period_start.year, period_start.month)
-    period_end = date(period_start.year, period_start.month, last_day)
-    start_dt = datetime.combine(period_start, time.min)
-    end_dt = datetime.combine(period_end, time.max)
-
-    sales_total = db.execute(
-        select(func.coalesce(func.sum(Sale.total_amount), 0)).where(
-            Sale.created_at >= start_dt,
-            Sale.created_at <= end_dt,
-        )
-    ).scalar_one()
-
-    return_entries = db.execute(
-        select(Return)
-        .options(selectinload(Return.items), joinedload(Return.sale))
-        .where(Return.created_at >= start_dt, Return.created_at <= end_dt)
-    ).scalars().unique().all()
-    return_breakdowns = calculate_return_breakdowns(return_entries)
-    refunds_total = sum(b.total for b in return_breakdowns.values())
+    return cached_report(db, "profit", {"month": month}, requested_by_id=current_user.id)
 
-    sales_total_value = float(sales_total or 0) - float(refunds_total or 0)
 
-    sales_cogs = db.execute(
-        select(
-            func.coalesce(
-                func.sum(
-                    SaleItem.quantity * func.coalesce(Product.purchase_price, 0)
-                ),
-                0,
-            )
-        )
-        .join(Sale, SaleItem.sale_id == Sale.id)
-        .join(Product, SaleItem.product_id == Product.id)
-        .where(Sale.created_at >= start_dt, Sale.created_at <= end_dt)
-    ).scalar_one()
+@router.get(
+    "/profit/counterparties",
+    response_model=report_schema.CounterpartyProfitReportResponse,
+    dependencies=[Depends(require_admin)],
+)
+def get_counterparty_profit_report(
+    month: str,
+    counterparty_id: int | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return cached_report(
+        db,
+        "counterparty_profit",
+        {"month": month, "counterparty_id": counterparty_id},
+        requested_by_id=current_user.id,
+    )
 
-    returns_cogs = db.execute(
-        select(
-            func.coalesce(
-                func.sum(
-                    ReturnItem.quantity * func.coalesce(Product.purchase_price, 0)
-                ),
-                0,
-            )
-        )
-        .join(Return, ReturnItem.return_id == Return.id)
-        .join(SaleItem, ReturnItem.sale_item_id == SaleItem.id)
-        .join(Product, SaleItem.product_id == Product.id)
-        .where(Return.created_at >= start_dt, Return.created_at <= end_dt)
-    ).scalar_one()
 
-    cogs_total = float(sales_cogs or 0) - float(returns_cogs or 0)
+@router.post(
+    "/jobs",
+    response_model=report_schema.ReportJob,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_admin)],
+    description=(
+        "Queue a report (`profit`, `counterparty_profit`, `workshop_summary`) for background computation. "
+        "A result already stored for the same parameters and unchanged data is returned at once with "
+        "status `done`; otherwise poll `GET /api/reports/jobs/{id}`."
+    ),
+)
+def submit_report_job(
+    payload: report_schema.ReportJobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return submit_report(db, payload.report_type, payload.params, requested_by_id=current_user.id)
 
-    expenses_total = db.execute(
-        select(func.coalesce(func.sum(Expense.amount), 0)).where(
-            Expense.created_at >= start_dt,
-            Expense.created_at <= end_dt,
-        )
-    ).scalar_one()
 
-    salary_expenses_total = db.execute(
-        select(func.coalesce(func.sum(SalaryPayment.amount), 0)).where(
-            SalaryPayment.created_at >= start_dt,
-            SalaryPayment.created_at <= end_dt,
-        )
-    ).scalar_one()
+@router.get("/jobs/{job_id}", response_model=report_schema.ReportJob, dependencies=[Depends(require_admin)])
+def get_report_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(ReportResult, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Отчёт не найден")
+    return job
 
-    expenses_total_value = float(expenses_total or 0) + float(salary_expenses_total or 0)
-    profit_total = sales_total_value - cogs_total - expenses_total_value
 
-    return report_schema.ProfitReportResponse(
-        month=month,
-        sales_total=sales_total_value,
-        cogs_total=cogs_total,
-        expenses_total=expenses_total_value,
-        profit=profit_total,
-    )
+@router.get("/periods", response_model=list[report_schema.ClosedPeriod], dependencies=[Depends(require_admin)])
+def list_closed_periods(db: Session = Depends(get_db)):
+    return db.execute(select(ClosedPeriod).order_by(ClosedPeriod.month.desc())).scalars().all()
 
 
-@router.get(
-    "/profit/counterparties",
-    response_model=report_schema.CounterpartyProfitReportResponse,
+@router.post(
+    "/periods/{month}/close",
+    response_model=report_schema.ClosedPeriod,
+    status_code=status.HTTP_201_CREATED,
     dependencies=[Depends(require_admin)],
+    description=(
+        "Freeze the month's profit, workshop summary and salary reports. Reads of a closed month "
+        "return the frozen snapshot; backdated workshop salary entries into it are refused."
+    ),
 )
-async def get_counterparty_profit_report(
+def close_month(
     month: str,
-    counterparty_id: int | None = None,
     db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
 ):
-    try:
-        period_start = datetime.strptime(month, "%Y-%m").date()
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM.") from exc
-
-    _, last_day = monthrange(period_start.year, period_start.month)
-    period_end = date(period_start.year, period_start.month, last_day)
-    start_dt = datetime.combine(period_start, time.min)
-    end_dt = datetime.combine(period_end, time.max)
-
-    sale_filters = [
-        CounterpartySale.created_at >= start_dt,
-        CounterpartySale.created_at <= end_dt,
-    ]
-    if counterparty_id:
-        sale_filters.append(CounterpartySale.counterparty_id == counterparty_id)
+    period = close_period(db, month, closed_by_id=current_user.id)
+    db.commit()
+    db.refresh(period)
+    return period
 
-    count_sales = db.execute(select(func.count(CounterpartySale.id)).where(*sale_filters)).scalar_one()
 
-    totals = db.execute(
-        select(
-            func.coalesce(func.sum(CounterpartySaleItem.quantity * CounterpartySaleItem.price), 0),
-            func.coalesce(
-                func.sum(
-                    CounterpartySaleItem.quantity
-                    * func.coalesce(CounterpartySaleItem.cost_price_snapshot, Product.purchase_price, 0)
-                ),
-                0,
-            ),
-        )
-        .join(CounterpartySale, CounterpartySaleItem.sale_id == CounterpartySale.id)
-        .join(Product, CounterpartySaleItem.product_id == Product.id)
-        .where(*sale_filters)
-    ).one()
-
-    revenue = float(totals[0] or 0)
-    cost = float(totals[1] or 0)
-    profit = revenue - cost
-
-    return report_schema.CounterpartyProfitReportResponse(
-        count_sales=int(count_sales or 0),
-        revenue=revenue,
-        cost=cost,
-        profit=profit,
-    )
+@router.delete("/periods/{month}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_admin)])
+def reopen_month(month: str, db: Session = Depends(get_db)):
+    reopen_period(db, month)
+    db.commit()
 
 
 @router.get(
@@ -355,7 +227,7 @@ async def get_counterparty_profit_report(
         "when no seller_id is provided, the current user is enforced."
     ),
 )
-async def get_operations_summary(
+def get_operations_summary(
     start_date: date | None = None,
     end_date: date | None = None,
     branch_id: int | None = None,
@@ -395,8 +267,6 @@ async def get_operations_summary(
         .options(
             joinedload(Return.branch),
             joinedload(Return.created_by),
-            selectinload(Return.items),
-            joinedload(Return.sale),
         )
         .order_by(Return.created_at.desc())
     )
@@ -406,11 +276,9 @@ async def get_operations_summary(
         return_query = return_query.where(Return.created_by_id == seller_id)
     return_query = _apply_date_filters(return_query, start_date, end_date, Return.created_at)
     return_entries = db.execute(return_query).scalars().unique().all()
-    return_breakdowns = calculate_return_breakdowns(return_entries)
 
     for entry in return_entries:
-        breakdown = return_breakdowns.get(entry.id)
-        total_amount = breakdown.total if breakdown else sum(item.amount for item in entry.items)
+        total_amount = float(entry.refund_total or 0)
         operations.append(
             report_schema.SaleSummary(
                 id=entry.id,
@@ -420,9 +288,9 @@ async def get_operations_summary(
                 branch=entry.branch.name if entry.branch else "-",
                 total_amount=-float(total_amount),
                 payment_type="return",
-                paid_cash=-(breakdown.cash if breakdown else total_amount),
-                paid_card=-(breakdown.card if breakdown else 0),
-                paid_debt=-(breakdown.debt if breakdown else 0),
+                paid_cash=-float(entry.refund_cash or 0),
+                paid_card=-float(entry.refund_card or 0),
+                paid_debt=-float(entry.refund_debt or 0),
             )
         )
 
@@ -496,7 +364,7 @@ async def get_operations_summary(
         "seller_id defaults to the current user for non-admins."
     ),
 )
-async def get_analytics(
+def get_analytics(
     start_date: date | None = None,
     end_date: date | None = None,
     branch_id: int | None = None,
@@ -511,84 +379,27 @@ async def get_analytics(
         start_date = start_date or (end_date - timedelta(days=30))
     start_dt = datetime.combine(start_date, time.min)
     end_dt = datetime.combine(end_date, time.max)
-    branch_clause = Sale.branch_id == branch_id if branch_id else None
-    seller_clause = Sale.seller_id == seller_id if seller_id else None
-
     totals_filters = [
         Sale.created_at >= start_dt,
         Sale.created_at <= end_dt,
     ]
-    if branch_clause is not None:
-        totals_filters.append(branch_clause)
-    if seller_clause is not None:
-        totals_filters.append(seller_clause)
-
-    total_sales, total_credit, total_receipts, total_cash, total_kaspi = db.execute(
-        select(
-            func.sum(Sale.total_amount),
-            func.sum(Sale.paid_debt),
-            func.count(Sale.id),
-            func.sum(Sale.paid_cash),
-            func.sum(Sale.paid_card),
-        ).where(*totals_filters)
-    ).one()
-
-    returns_query = (
-        select(Return)
-        .options(
-            selectinload(Return.items),
-            joinedload(Return.sale),
-        )
-        .where(Return.created_at >= start_dt, Return.created_at <= end_dt)
-    )
     if branch_id:
-        returns_query = returns_query.where(Return.branch_id == branch_id)
+        totals_filters.append(Sale.branch_id == branch_id)
     if seller_id:
-        returns_query = returns_query.where(Return.created_by_id == seller_id)
-
-    return_entries = db.execute(returns_query).scalars().unique().all()
-    return_breakdowns = calculate_return_breakdowns(return_entries)
-    refunds_total = sum(b.total for b in return_breakdowns.values())
-    refunds_cash = sum(b.cash for b in return_breakdowns.values())
-    refunds_card = sum(b.card for b in return_breakdowns.values())
-    refunds_debt = sum(b.debt for b in return_breakdowns.values())
-
-    debt_filters = [
-        DebtPayment.created_at >= start_dt,
-        DebtPayment.created_at <= end_dt,
-    ]
-    if branch_id:
-        debt_filters.append(DebtPayment.branch_id == branch_id)
-    if seller_id:
-        debt_filters.append(DebtPayment.processed_by_id == seller_id)
+        totals_filters.append(Sale.seller_id == seller_id)
 
-    debt_cash, debt_card = db.execute(
-        select(
-            func.coalesce(
-                func.sum(
-                    case((DebtPayment.payment_type == "cash", DebtPayment.amount), else_=0)
-                ),
-                0,
-            ),
-            func.coalesce(
-                func.sum(
-                    case(
-                        (DebtPayment.payment_type.notin_(["cash", "offset"]), DebtPayment.amount),
-                        else_=0,
-                    )
-                ),
-                0,
-            ),
-        ).where(*debt_filters)
-    ).one()
-
-    net_total_sales = float(total_sales or 0) - float(refunds_total)
-    net_total_sales += float(debt_cash or 0) + float(debt_card or 0)
-
-    net_cash = float(total_cash or 0) - float(refunds_cash) + float(debt_cash or 0)
-    net_card = float(total_kaspi or 0) - float(refunds_card) + float(debt_card or 0)
-
-    credit_total = float(total_credit or 0) - float(refunds_debt)
+    totals = rollup_totals(db, start_date, end_date, branch_id=branch_id, seller_id=seller_id)
+    refunds_total = totals["refunds_total"]
+    refunds_cash = totals["refunds_cash"]
+    refunds_card = totals["refunds_card"]
+    refunds_debt = totals["refunds_debt"]
+    debt_cash = totals["debt_payments_cash"]
+    debt_card = totals["debt_payments_card"]
+
+    net_total_sales = totals["sales_total"] - refunds_total + debt_cash + debt_card
+    net_cash = totals["sales_cash"] - refunds_cash + debt_cash
+    net_card = totals["sales_card"] - refunds_card + debt_card
+    credit_total = totals["sales_debt"] - refunds_debt
 
     payment_breakdown = report_schema.PaymentBreakdown(
         cash=net_cash,
@@ -596,48 +407,16 @@ async def get_analytics(
         credit=credit_total,
     )
 
-    daily_map: dict[date, report_schema.DailyReport] = {}
-
-    sales_by_day_rows = db.execute(
-        select(
-            func.date(Sale.created_at),
-            func.sum(Sale.total_amount),
-            func.sum(Sale.paid_debt),
+    sales_by_date = [
+        report_schema.DailyReport(
+            day=day,
+            total_sales=day_totals["sales_total"] - day_totals["refunds_total"] + day_totals["debt_payments_total"],
+            total_credit=day_totals["sales_debt"] - day_totals["refunds_debt"],
         )
-        .where(*totals_filters)
-        .group_by(func.date(Sale.created_at))
-    ).all()
-    for day, total_amount, credit_amount in sales_by_day_rows:
-        daily_map.setdefault(day, report_schema.DailyReport(day=day, total_sales=0, total_credit=0))
-        entry = daily_map[day]
-        entry.total_sales += float(total_amount or 0)
-        entry.total_credit += float(credit_amount or 0)
-
-    for entry, breakdown in ((ret, return_breakdowns.get(ret.id)) for ret in return_entries):
-        day = entry.created_at.date()
-        daily_map.setdefault(day, report_schema.DailyReport(day=day, total_sales=0, total_credit=0))
-        refund = breakdown.total if breakdown else sum(item.amount for item in entry.items)
-        debt_refund = breakdown.debt if breakdown else 0
-        daily_map[day].total_sales -= float(refund or 0)
-        daily_map[day].total_credit -= float(debt_refund or 0)
-
-    debt_by_day_rows = db.execute(
-        select(
-            func.date(DebtPayment.created_at),
-            func.sum(
-                case((DebtPayment.payment_type != "offset", DebtPayment.amount), else_=0)
-            ),
+        for day, day_totals in rollup_totals_by_day(
+            db, start_date, end_date, branch_id=branch_id, seller_id=seller_id
         )
-        .where(*debt_filters)
-        .group_by(func.date(DebtPayment.created_at))
-    ).all()
-    for day, amount in debt_by_day_rows:
-        daily_map.setdefault(day, report_schema.DailyReport(day=day, total_sales=0, total_credit=0))
-        entry = daily_map[day]
-        entry.total_sales += float(amount or 0)
-
-    sales_by_date = list(daily_map.values())
-    sales_by_date.sort(key=lambda row: row.day)
+    ]
 
     top_products_query = db.execute(
         select(
@@ -669,7 +448,7 @@ async def get_analytics(
         top_products=top_products,
         total_sales=net_total_sales,
         total_debt=credit_total,
-        total_receipts=int(total_receipts or 0),
+        total_receipts=int(totals["sales_count"]),
         refunds_cash=refunds_cash,
         refunds_card=refunds_card,
         refunds_debt=refunds_debt,
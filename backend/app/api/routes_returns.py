@@ -3,16 +3,20 @@ from __future__ import annotations
 from datetime import date, datetime, time
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, select
-from sqlalchemy.orm import Session, joinedload, selectinload
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
 
 from app.auth.security import get_current_user
 from app.database.session import get_db
-from app.models.entities import Client, Debt, DebtPayment, Product, Return, ReturnItem, Sale, SaleItem
+from app.models.entities import Branch, Client, DebtPayment, Product, Return, ReturnItem, Sale, SaleItem
 from app.models.user import User
 from app.schemas import returns as return_schema
-from app.services.inventory import adjust_stock
+from app.services.debt_ledger import ENTRY_RETURN_OFFSET, allocate_payment, lock_balance, post_entry
+from app.services.exports import EXPORT_FORMAT_PATTERN, ExportColumn, export_response
+from app.services.inventory import adjust_product_quantities, adjust_stock_many, aggregate_deltas
+from app.services.returns import refunded_before, reserve_returned_quantities, split_refund
+from app.services.rollups import record_return
 
 router = APIRouter(redirect_slashes=False)
 
@@ -67,39 +71,39 @@ def _build_return_items(
                 raise HTTPException(status_code=400, detail="Неверное количество для возврата")
             items_to_process.append((sale_item, entry.quantity))
 
-    return_items: list[ReturnItem] = []
+    requested: dict[int, int] = {}
     for sale_item, qty in items_to_process:
-        db.execute(select(SaleItem).where(SaleItem.id == sale_item.id).with_for_update()).scalar_one()
-        returned_qty = db.execute(
-            select(func.coalesce(func.sum(ReturnItem.quantity), 0)).where(
-                ReturnItem.sale_item_id == sale_item.id
-            )
-        ).scalar_one()
-        available_for_return = max(sale_item.quantity - int(returned_qty or 0), 0)
+        requested[sale_item.id] = requested.get(sale_item.id, 0) + qty
+    for sale_item_id, qty in requested.items():
+        sale_item = sale_items_map[sale_item_id]
+        available_for_return = max(sale_item.quantity - (sale_item.returned_quantity or 0), 0)
         if qty > available_for_return:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Доступно к возврату только {available_for_return} шт.",
             )
+    # The sale row is locked, so this only fails if a return slipped in without that lock.
+    if not reserve_returned_quantities(db, sale.id, requested):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Позиции чека уже возвращены")
 
+    return_items: list[ReturnItem] = []
+    for sale_item, qty in items_to_process:
         unit_price = (sale_item.total / sale_item.quantity) if sale_item.quantity else sale_item.price
-        amount = unit_price * qty
-        adjust_stock(db, sale.branch_id, sale_item.product_id, qty)
-        product = db.get(Product, sale_item.product_id)
-        if product:
-            product.quantity += qty
         return_items.append(
             ReturnItem(
                 sale_item_id=sale_item.id,
                 quantity=qty,
-                amount=amount,
+                amount=unit_price * qty,
             )
         )
+    product_deltas = aggregate_deltas((sale_item.product_id, qty) for sale_item, qty in items_to_process)
+    adjust_stock_many(db, sale.branch_id, product_deltas)
+    adjust_product_quantities(db, product_deltas)
     return return_items
 
 
 @router.post("", response_model=return_schema.ReturnDetail, status_code=status.HTTP_201_CREATED)
-async def create_return(
+def create_return(
     payload: return_schema.ReturnCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -118,11 +122,20 @@ async def create_return(
         db.add(return_entry)
         db.flush()
 
-        total_amount = 0.0
-        for item in return_items:
-            item.return_id = return_entry.id
-            total_amount += item.amount
-            db.add(item)
+        total_amount = sum(item.amount for item in return_items)
+        # One multi-row INSERT (no RETURNING): the items are read back through the relationship.
+        db.execute(
+            insert(ReturnItem),
+            [
+                {
+                    "return_id": return_entry.id,
+                    "sale_item_id": item.sale_item_id,
+                    "quantity": item.quantity,
+                    "amount": item.amount,
+                }
+                for item in return_items
+            ],
+        )
 
         if payload.apply_to_debt:
             if not sale.client_id:
@@ -131,7 +144,7 @@ async def create_return(
             if not client:
                 raise HTTPException(status_code=404, detail="Клиент не найден")
 
-            outstanding = Decimal(str(client.total_debt or 0)).quantize(Decimal("0.01"))
+            outstanding = lock_balance(db, client.id)
             return_total = Decimal(str(total_amount)).quantize(Decimal("0.01"))
             max_offset = min(outstanding, return_total)
             if max_offset <= 0:
@@ -153,27 +166,7 @@ async def create_return(
             return_entry.apply_to_debt = True
             return_entry.debt_offset_amount = offset_amount
             if offset_amount > 0:
-                remaining = offset_amount
-                debts = (
-                    db.execute(
-                        select(Debt)
-                        .where(Debt.client_id == client.id, Debt.amount > Debt.paid)
-                        .order_by(Debt.created_at)
-                    )
-                    .scalars()
-                    .all()
-                )
-                for debt in debts:
-                    debt_remaining = Decimal(str(debt.amount)) - Decimal(str(debt.paid or 0))
-                    if debt_remaining <= 0:
-                        continue
-                    portion = min(remaining, debt_remaining)
-                    debt.paid = float(Decimal(str(debt.paid or 0)) + portion)
-                    remaining -= portion
-                    if remaining <= 0:
-                        break
-
-                client.total_debt = float(max(outstanding - offset_amount, Decimal("0")))
+                allocate_payment(db, client.id, offset_amount)
                 debt_payment = DebtPayment(
                     client_id=client.id,
                     amount=offset_amount,
@@ -183,6 +176,40 @@ async def create_return(
                     branch_id=sale.branch_id,
                 )
                 db.add(debt_payment)
+                db.flush()
+                post_entry(
+                    db,
+                    client.id,
+                    -offset_amount,
+                    ENTRY_RETURN_OFFSET,
+                    debt_payment_id=debt_payment.id,
+                    return_id=return_entry.id,
+                    created_by_id=current_user.id,
+                )
+
+        breakdown = split_refund(
+            sale,
+            refunded_before(db, sale.id, exclude_return_id=return_entry.id),
+            total_amount,
+            return_entry.debt_offset_amount,
+        )
+        return_entry.refund_total = breakdown.total
+        return_entry.refund_cash = breakdown.cash
+        return_entry.refund_card = breakdown.card
+        return_entry.refund_debt = breakdown.debt
+        sale_items_map = {item.id: item for item in sale.items}
+        purchase_prices = dict(
+            db.execute(
+                select(Product.id, Product.purchase_price).where(
+                    Product.id.in_({sale_items_map[item.sale_item_id].product_id for item in return_items})
+                )
+            ).all()
+        )
+        returns_cogs = Decimal("0")
+        for item in return_items:
+            purchase_price = purchase_prices.get(sale_items_map[item.sale_item_id].product_id)
+            returns_cogs += Decimal(item.quantity) * Decimal(str(purchase_price or 0))
+        record_return(db, return_entry, returns_cogs)
 
         db.commit()
     except HTTPException:
@@ -194,11 +221,11 @@ async def create_return(
 
     db.refresh(return_entry)
     db.refresh(return_entry, attribute_names=["items", "branch", "created_by"])
-    return await get_return_detail(return_entry.id, db=db, current_user=current_user)
+    return get_return_detail(return_entry.id, db=db, current_user=current_user)
 
 
 @router.get("", response_model=list[return_schema.ReturnSummary])
-async def list_returns(
+def list_returns(
     start_date: date | None = None,
     end_date: date | None = None,
     branch_id: int | None = None,
@@ -213,7 +240,6 @@ async def list_returns(
             joinedload(Return.branch),
             joinedload(Return.created_by),
             joinedload(Return.sale).joinedload(Sale.client),
-            selectinload(Return.items),
         )
         .order_by(Return.created_at.desc())
     )
@@ -229,7 +255,7 @@ async def list_returns(
     return_entries = db.execute(query).scalars().unique().all()
     summaries: list[return_schema.ReturnSummary] = []
     for entry in return_entries:
-        total_amount = sum(item.amount for item in entry.items)
+        total_amount = float(entry.refund_total or 0)
         summaries.append(
             return_schema.ReturnSummary(
                 id=entry.id,
@@ -247,8 +273,67 @@ async def list_returns(
     return summaries
 
 
+RETURN_EXPORT_COLUMNS = (
+    ExportColumn("id", "№"),
+    ExportColumn("created_at", "Дата"),
+    ExportColumn("sale_id", "Продажа"),
+    ExportColumn("branch_name", "Филиал"),
+    ExportColumn("created_by_name", "Оформил"),
+    ExportColumn("client_name", "Клиент"),
+    ExportColumn("type", "Тип"),
+    ExportColumn("refund_total", "Сумма"),
+    ExportColumn("refund_cash", "Наличные"),
+    ExportColumn("refund_card", "Карта"),
+    ExportColumn("refund_debt", "Долг"),
+)
+
+
+@router.get("/export")
+def export_returns(
+    start_date: date | None = None,
+    end_date: date | None = None,
+    branch_id: int | None = None,
+    created_by_id: int | None = None,
+    type: str | None = None,
+    export_format: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    current_user: User = Depends(get_current_user),
+):
+    author = aliased(User)
+    query = (
+        select(
+            Return.id.label("id"),
+            Return.created_at.label("created_at"),
+            Return.sale_id.label("sale_id"),
+            Branch.name.label("branch_name"),
+            author.name.label("created_by_name"),
+            Client.name.label("client_name"),
+            Return.type.label("type"),
+            Return.refund_total.label("refund_total"),
+            Return.refund_cash.label("refund_cash"),
+            Return.refund_card.label("refund_card"),
+            Return.refund_debt.label("refund_debt"),
+        )
+        .select_from(Return)
+        .outerjoin(Branch, Return.branch_id == Branch.id)
+        .outerjoin(author, Return.created_by_id == author.id)
+        .outerjoin(Sale, Return.sale_id == Sale.id)
+        .outerjoin(Client, Sale.client_id == Client.id)
+        .order_by(Return.created_at.desc(), Return.id.desc())
+    )
+    query = _enforce_scope(query, current_user)
+    if branch_id:
+        query = query.where(Return.branch_id == branch_id)
+    if created_by_id:
+        query = query.where(Return.created_by_id == created_by_id)
+    if type:
+        query = query.where(Return.type == type)
+    query = _apply_date_filters(query, start_date, end_date)
+    filename = "returns" + "".join(f"_{value.isoformat()}" for value in (start_date, end_date) if value)
+    return export_response(query, RETURN_EXPORT_COLUMNS, filename, export_format)
+
+
 @router.get("/{return_id}", response_model=return_schema.ReturnDetail)
-async def get_return_detail(
+def get_return_detail(
     return_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
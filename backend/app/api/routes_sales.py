@@ -3,19 +3,24 @@ from __future__ import annotations
 from datetime import date, datetime, time
 from decimal import Decimal
 import logging
+from typing import Iterator
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, select
-from sqlalchemy.orm import Session, joinedload, selectinload
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Numeric, String, and_, case, cast, func, insert, literal, or_, select, union_all
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
 
 from app.auth.security import get_current_user
 from app.core.config import get_settings
-from app.database.session import get_db
-from app.models.entities import Branch, Client, Debt, DebtPayment, Product, Return, Sale, SaleItem
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, parse_cursor_datetime
+from app.database.session import SessionLocal, get_db
+from app.models.entities import Branch, Client, DebtPayment, Product, Return, Sale, SaleItem
 from app.models.user import User
 from app.schemas import sales as sales_schema
-from app.services.returns import calculate_return_breakdowns
-from app.services.inventory import adjust_stock
+from app.services.debt_ledger import record_sale_debt
+from app.services.exports import EXPORT_FORMAT_PATTERN, ExportColumn, export_response
+from app.services.inventory import adjust_product_quantities, adjust_stock_many, aggregate_deltas
+from app.services.rollups import record_sale
 
 router = APIRouter(redirect_slashes=False)
 logger = logging.getLogger(__name__)
@@ -43,147 +48,273 @@ def _enforce_employee_scope(query, current_user: User):
     return query
 
 
-def _map_sale_to_summary(sale: Sale) -> sales_schema.SaleSummary:
-    return sales_schema.SaleSummary(
-        id=sale.id,
-        entry_type="sale",
-        created_at=sale.created_at,
-        branch_id=sale.branch_id,
-        branch_name=sale.branch.name if sale.branch else None,
-        seller_id=sale.seller_id,
-        seller_name=sale.seller.name if sale.seller else None,
-        client_id=sale.client_id,
-        client_name=sale.client.name if sale.client else None,
-        total_amount=sale.total_amount,
-        paid_cash=sale.paid_cash,
-        paid_card=sale.paid_card,
-        paid_debt=sale.paid_debt,
-        payment_type=sale.payment_type,
+JOURNAL_MAX_PAGE_SIZE = 500
+JOURNAL_STREAM_CHUNK = 500
+
+
+def _money_column(column):
+    return cast(func.coalesce(column, 0), Numeric(12, 2))
+
+
+def _journal_after(created_at_column, id_column, entry_type: str, after: tuple[datetime, str, int] | None):
+    """Rows of one journal source that sort after the cursor in (created_at, entry_type, id) DESC order."""
+    if after is None:
+        return None
+    after_created_at, after_type, after_id = after
+    if entry_type < after_type:
+        return created_at_column <= after_created_at
+    if entry_type > after_type:
+        return created_at_column < after_created_at
+    return or_(
+        created_at_column < after_created_at,
+        and_(created_at_column == after_created_at, id_column < after_id),
     )
 
 
-@router.get("", response_model=list[sales_schema.SaleSummary])
-async def list_sales(
-    start_date: date | None = None,
-    end_date: date | None = None,
-    branch_id: int | None = None,
-    seller_id: int | None = None,
-    client_id: int | None = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+def _build_journal_query(
+    current_user: User,
+    *,
+    start_date: date | None,
+    end_date: date | None,
+    branch_id: int | None,
+    seller_id: int | None,
+    client_id: int | None,
+    after: tuple[datetime, str, int] | None,
+    limit: int | None,
 ):
-    query = select(Sale).options(
-        joinedload(Sale.seller), joinedload(Sale.branch), joinedload(Sale.client)
+    is_employee = current_user.role == "employee"
+
+    seller = aliased(User)
+    sales_query = (
+        select(
+            literal("sale", String(20)).label("entry_type"),
+            Sale.id.label("id"),
+            Sale.created_at.label("created_at"),
+            Sale.branch_id.label("branch_id"),
+            Branch.name.label("branch_name"),
+            Sale.seller_id.label("seller_id"),
+            seller.name.label("seller_name"),
+            Sale.client_id.label("client_id"),
+            Client.name.label("client_name"),
+            _money_column(Sale.total_amount).label("total_amount"),
+            _money_column(Sale.paid_cash).label("paid_cash"),
+            _money_column(Sale.paid_card).label("paid_card"),
+            _money_column(Sale.paid_debt).label("paid_debt"),
+            Sale.payment_type.label("payment_type"),
+        )
+        .select_from(Sale)
+        .outerjoin(Branch, Sale.branch_id == Branch.id)
+        .outerjoin(seller, Sale.seller_id == seller.id)
+        .outerjoin(Client, Sale.client_id == Client.id)
     )
-    query = _enforce_employee_scope(query, current_user)
+    if is_employee:
+        sales_query = sales_query.where(Sale.seller_id == current_user.id)
     if branch_id:
-        query = query.where(Sale.branch_id == branch_id)
+        sales_query = sales_query.where(Sale.branch_id == branch_id)
     if seller_id:
-        query = query.where(Sale.seller_id == seller_id)
+        sales_query = sales_query.where(Sale.seller_id == seller_id)
     if client_id:
-        query = query.where(Sale.client_id == client_id)
-    query = _apply_date_filters(query, start_date, end_date).order_by(Sale.created_at.desc())
-    sales = db.execute(query).scalars().unique().all()
-
-    # returns
-    return_query = (
-        select(Return)
-        .options(
-            joinedload(Return.branch),
-            joinedload(Return.created_by),
-            selectinload(Return.items),
-            joinedload(Return.sale).joinedload(Sale.client),
-            joinedload(Return.sale).joinedload(Sale.seller),
+        sales_query = sales_query.where(Sale.client_id == client_id)
+    sales_query = _apply_date_filters(sales_query, start_date, end_date)
+
+    return_author = aliased(User)
+    return_sale = aliased(Sale)
+    return_client = aliased(Client)
+    returns_query = (
+        select(
+            literal("return", String(20)).label("entry_type"),
+            Return.id.label("id"),
+            Return.created_at.label("created_at"),
+            Return.branch_id.label("branch_id"),
+            Branch.name.label("branch_name"),
+            func.coalesce(Return.created_by_id, 0).label("seller_id"),
+            return_author.name.label("seller_name"),
+            return_sale.client_id.label("client_id"),
+            return_client.name.label("client_name"),
+            (-_money_column(Return.refund_total)).label("total_amount"),
+            (-_money_column(Return.refund_cash)).label("paid_cash"),
+            (-_money_column(Return.refund_card)).label("paid_card"),
+            (-_money_column(Return.refund_debt)).label("paid_debt"),
+            literal("return", String(50)).label("payment_type"),
         )
+        .select_from(Return)
+        .outerjoin(Branch, Return.branch_id == Branch.id)
+        .outerjoin(return_author, Return.created_by_id == return_author.id)
+        .outerjoin(return_sale, Return.sale_id == return_sale.id)
+        .outerjoin(return_client, return_sale.client_id == return_client.id)
     )
+    if is_employee:
+        returns_query = returns_query.where(Return.created_by_id == current_user.id)
     if branch_id:
-        return_query = return_query.where(Return.branch_id == branch_id)
+        returns_query = returns_query.where(Return.branch_id == branch_id)
     if seller_id:
-        return_query = return_query.where(Return.created_by_id == seller_id)
-    return_query = _apply_date_filters(return_query, start_date, end_date, Return.created_at)
-    if current_user.role == "employee":
-        return_query = return_query.where(Return.created_by_id == current_user.id)
-    returns = db.execute(return_query.order_by(Return.created_at.desc())).scalars().unique().all()
-    return_breakdowns = calculate_return_breakdowns(returns)
-
-    debt_query = (
-        select(DebtPayment)
-        .options(
-            joinedload(DebtPayment.client),
-            joinedload(DebtPayment.processed_by),
-            joinedload(DebtPayment.branch),
+        returns_query = returns_query.where(Return.created_by_id == seller_id)
+    if client_id:
+        returns_query = returns_query.where(return_sale.client_id == client_id)
+    returns_query = _apply_date_filters(returns_query, start_date, end_date, Return.created_at)
+
+    processor = aliased(User)
+    payment_amount = _money_column(DebtPayment.amount)
+    payments_query = (
+        select(
+            literal("debt_payment", String(20)).label("entry_type"),
+            DebtPayment.id.label("id"),
+            DebtPayment.created_at.label("created_at"),
+            DebtPayment.branch_id.label("branch_id"),
+            Branch.name.label("branch_name"),
+            func.coalesce(DebtPayment.processed_by_id, 0).label("seller_id"),
+            processor.name.label("seller_name"),
+            DebtPayment.client_id.label("client_id"),
+            Client.name.label("client_name"),
+            payment_amount.label("total_amount"),
+            case((DebtPayment.payment_type == "cash", payment_amount), else_=0).label("paid_cash"),
+            case(
+                (DebtPayment.payment_type.notin_(["cash", "offset"]), payment_amount), else_=0
+            ).label("paid_card"),
+            cast(literal(0), Numeric(12, 2)).label("paid_debt"),
+            DebtPayment.payment_type.label("payment_type"),
         )
+        .select_from(DebtPayment)
+        .outerjoin(Branch, DebtPayment.branch_id == Branch.id)
+        .outerjoin(processor, DebtPayment.processed_by_id == processor.id)
+        .outerjoin(Client, DebtPayment.client_id == Client.id)
+        .where(func.coalesce(DebtPayment.amount, 0) != 0)
     )
+    if is_employee:
+        payments_query = payments_query.where(DebtPayment.processed_by_id == current_user.id)
     if branch_id:
-        debt_query = debt_query.where(DebtPayment.branch_id == branch_id)
+        payments_query = payments_query.where(DebtPayment.branch_id == branch_id)
     if seller_id:
-        debt_query = debt_query.where(DebtPayment.processed_by_id == seller_id)
-    debt_query = debt_query.where(func.coalesce(DebtPayment.amount, 0) != 0)
-    debt_query = _apply_date_filters(debt_query, start_date, end_date, DebtPayment.created_at)
-    if current_user.role == "employee":
-        debt_query = debt_query.where(DebtPayment.processed_by_id == current_user.id)
-    debt_payments = db.execute(debt_query.order_by(DebtPayment.created_at.desc())).scalars().unique().all()
-
-    summaries: list[sales_schema.SaleSummary] = []
-    for sale in sales:
-        summaries.append(_map_sale_to_summary(sale))
-
-    for return_entry in returns:
-        sale = return_entry.sale
-        breakdown = return_breakdowns.get(return_entry.id)
-        total_amount = breakdown.total if breakdown else sum(item.amount for item in return_entry.items)
-        paid_cash = -(breakdown.cash if breakdown else total_amount)
-        paid_card = -(breakdown.card if breakdown else 0)
-        paid_debt = -(breakdown.debt if breakdown else 0)
-        summaries.append(
-            sales_schema.SaleSummary(
-                id=return_entry.id,
-                entry_type="return",
-                created_at=return_entry.created_at,
-                branch_id=return_entry.branch_id,
-                branch_name=return_entry.branch.name if return_entry.branch else None,
-                seller_id=return_entry.created_by_id or 0,
-                seller_name=return_entry.created_by.name if return_entry.created_by else None,
-                client_id=sale.client_id if sale else None,
-                client_name=sale.client.name if sale and sale.client else None,
-                total_amount=-float(total_amount),
-                paid_cash=paid_cash,
-                paid_card=paid_card,
-                paid_debt=paid_debt,
-                payment_type="return",
+        payments_query = payments_query.where(DebtPayment.processed_by_id == seller_id)
+    if client_id:
+        payments_query = payments_query.where(DebtPayment.client_id == client_id)
+    payments_query = _apply_date_filters(payments_query, start_date, end_date, DebtPayment.created_at)
+
+    parts = []
+    for part, entry_type, created_at_column, id_column in (
+        (sales_query, "sale", Sale.created_at, Sale.id),
+        (returns_query, "return", Return.created_at, Return.id),
+        (payments_query, "debt_payment", DebtPayment.created_at, DebtPayment.id),
+    ):
+        keyset = _journal_after(created_at_column, id_column, entry_type, after)
+        if keyset is not None:
+            part = part.where(keyset)
+        if limit is not None:
+            # Each source only needs to contribute one page; this keeps the sources on their indexes.
+            part = select(
+                part.order_by(created_at_column.desc(), id_column.desc()).limit(limit).subquery()
             )
-        )
+        parts.append(part)
 
-    for payment in debt_payments:
-        cash_amount = float(payment.amount) if payment.payment_type == "cash" else 0.0
-        card_amount = (
-            float(payment.amount) if payment.payment_type not in {"cash", "offset"} else 0.0
-        )
-        summaries.append(
-            sales_schema.SaleSummary(
-                id=payment.id,
-                entry_type="debt_payment",
-                created_at=payment.created_at,
-                branch_id=payment.branch_id,
-                branch_name=payment.branch.name if payment.branch else None,
-                seller_id=payment.processed_by_id or 0,
-                seller_name=payment.processed_by.name if payment.processed_by else None,
-                client_id=payment.client_id,
-                client_name=payment.client.name if payment.client else None,
-                total_amount=float(payment.amount),
-                paid_cash=cash_amount,
-                paid_card=card_amount,
-                paid_debt=0,
-                payment_type=payment.payment_type,
-            )
-        )
+    journal = union_all(*parts).subquery("journal")
+    query = select(journal).order_by(
+        journal.c.created_at.desc(), journal.c.entry_type.desc(), journal.c.id.desc()
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _stream_journal(query) -> Iterator[str]:
+    # The request-scoped session is closed before the body is sent, so stream from a dedicated one.
+    with SessionLocal() as db:
+        result = db.execute(query.execution_options(yield_per=JOURNAL_STREAM_CHUNK))
+        for row in result.mappings():
+            yield sales_schema.SaleSummary(**row).model_dump_json() + "\n"
+
+
+@router.get(
+    "",
+    response_model=list[sales_schema.SaleSummary],
+    description=(
+        "Sales, returns and debt payments, newest first. Pass `limit` to page through the journal: "
+        "the next page's `cursor` is returned in the X-Next-Cursor header. "
+        "With `stream=true` the rows are sent as NDJSON."
+    ),
+)
+def list_sales(
+    response: Response,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    branch_id: int | None = None,
+    seller_id: int | None = None,
+    client_id: int | None = None,
+    limit: int | None = Query(None, ge=1, le=JOURNAL_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    stream: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    after = None
+    if cursor:
+        created_at_value, entry_type, entry_id = decode_cursor(cursor, 3)
+        if not isinstance(entry_type, str) or not isinstance(entry_id, int):
+            raise HTTPException(status_code=400, detail="Неверный курсор")
+        after = (parse_cursor_datetime(created_at_value), entry_type, entry_id)
+
+    query = _build_journal_query(
+        current_user,
+        start_date=start_date,
+        end_date=end_date,
+        branch_id=branch_id,
+        seller_id=seller_id,
+        client_id=client_id,
+        after=after,
+        limit=limit,
+    )
+
+    if stream:
+        return StreamingResponse(_stream_journal(query), media_type="application/x-ndjson")
 
-    summaries.sort(key=lambda x: x.created_at, reverse=True)
+    rows = db.execute(query).mappings().all()
+    summaries = [sales_schema.SaleSummary(**row) for row in rows]
+    if limit is not None and len(summaries) == limit:
+        last = summaries[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.entry_type, last.id)
     return summaries
 
 
+JOURNAL_EXPORT_COLUMNS = (
+    ExportColumn("entry_type", "Тип"),
+    ExportColumn("id", "№"),
+    ExportColumn("created_at", "Дата"),
+    ExportColumn("branch_name", "Филиал"),
+    ExportColumn("seller_name", "Продавец"),
+    ExportColumn("client_name", "Клиент"),
+    ExportColumn("total_amount", "Сумма"),
+    ExportColumn("paid_cash", "Наличные"),
+    ExportColumn("paid_card", "Карта"),
+    ExportColumn("paid_debt", "Долг"),
+    ExportColumn("payment_type", "Тип оплаты"),
+)
+
+
+@router.get("/export", description="The sales journal (same filters as the list) as a CSV or XLSX download.")
+def export_sales(
+    start_date: date | None = None,
+    end_date: date | None = None,
+    branch_id: int | None = None,
+    seller_id: int | None = None,
+    client_id: int | None = None,
+    export_format: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    current_user: User = Depends(get_current_user),
+):
+    query = _build_journal_query(
+        current_user,
+        start_date=start_date,
+        end_date=end_date,
+        branch_id=branch_id,
+        seller_id=seller_id,
+        client_id=client_id,
+        after=None,
+        limit=None,
+    )
+    filename = "sales" + "".join(f"_{value.isoformat()}" for value in (start_date, end_date) if value)
+    return export_response(query, JOURNAL_EXPORT_COLUMNS, filename, export_format)
+
+
 @router.post("", response_model=sales_schema.SaleDetail, status_code=status.HTTP_201_CREATED)
-async def create_sale(
+def create_sale(
     payload: sales_schema.SaleCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -200,6 +331,7 @@ async def create_sale(
         raise HTTPException(status_code=400, detail="Позиции продажи не указаны")
 
     total = Decimal("0")
+    cogs = Decimal("0")
     try:
         sale = Sale(
             branch_id=branch_id,
@@ -214,27 +346,43 @@ async def create_sale(
         db.add(sale)
         db.flush()
 
+        # One locking read for the whole receipt, in id order so concurrent receipts do not deadlock.
+        products = {
+            product.id: product
+            for product in db.execute(
+                select(Product)
+                .where(Product.id.in_({item.product_id for item in payload.items}))
+                .order_by(Product.id)
+                .with_for_update()
+            ).scalars()
+        }
+        sale_item_rows: list[dict] = []
         for item in payload.items:
-            product = db.get(Product, item.product_id)
+            product = products.get(item.product_id)
             if not product:
                 raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
             price = Decimal(str(item.price))
             discount = Decimal(str(item.discount))
             quantity = Decimal(item.quantity)
             line_total = (price - discount) * quantity
-            adjust_stock(db, branch_id, item.product_id, -item.quantity, allow_negative=True)
-            product.quantity -= item.quantity
 
-            sale_item = SaleItem(
-                sale_id=sale.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                price=item.price,
-                discount=item.discount,
-                total=float(line_total),
+            sale_item_rows.append(
+                {
+                    "sale_id": sale.id,
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                    "price": item.price,
+                    "discount": item.discount,
+                    "total": float(line_total),
+                }
             )
-            db.add(sale_item)
             total += line_total
+            cogs += quantity * Decimal(str(product.purchase_price or 0))
+
+        db.execute(insert(SaleItem), sale_item_rows)
+        stock_deltas = aggregate_deltas((item.product_id, -item.quantity) for item in payload.items)
+        adjust_stock_many(db, branch_id, stock_deltas, allow_negative=True)
+        adjust_product_quantities(db, stock_deltas)
 
         paid_total = (
             Decimal(str(payload.paid_cash))
@@ -252,12 +400,11 @@ async def create_sale(
             client = db.get(Client, payload.client_id)
             if not client:
                 raise HTTPException(status_code=404, detail="Client not found")
-            client.total_debt += payload.paid_debt
-            debt = Debt(client_id=client.id, sale_id=sale.id, amount=payload.paid_debt)
-            db.add(debt)
+            record_sale_debt(db, client.id, sale.id, payload.paid_debt, created_by_id=current_user.id)
         if payload.paid_debt > 0 and not payload.client_id:
             raise HTTPException(status_code=400, detail="Для продажи в долг выберите клиента")
 
+        record_sale(db, sale, cogs)
         db.commit()
     except Exception:
         db.rollback()
@@ -265,7 +412,7 @@ async def create_sale(
 
     db.refresh(sale)
     db.refresh(sale, attribute_names=["items", "seller", "branch", "client"])
-    return await get_sale_detail(sale.id, db=db, current_user=current_user)
+    return get_sale_detail(sale.id, db=db, current_user=current_user)
 
 
 def _assert_sale_access(sale: Sale | None, current_user: User):
@@ -277,7 +424,7 @@ def _assert_sale_access(sale: Sale | None, current_user: User):
 
 
 @router.get("/{sale_id}", response_model=sales_schema.SaleDetail)
-async def get_sale_detail(
+def get_sale_detail(
     sale_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -307,6 +454,7 @@ async def get_sale_detail(
                 total=item.total,
                 product_name=product.name if product else None,
                 product_unit=product.unit if product else None,
+                returned_quantity=item.returned_quantity or 0,
             )
         )
 
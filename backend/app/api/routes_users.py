@@ -3,6 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.auth.security import get_current_user, hash_password, require_admin
+from app.auth.tokens import revoke_user_tokens
 from app.database.session import get_db
 from app.models.user import User
 from app.schemas import users as user_schema
@@ -11,13 +12,13 @@ router = APIRouter(redirect_slashes=False, dependencies=[Depends(require_admin)]
 
 
 @router.get("", response_model=list[user_schema.User])
-async def list_users(db: Session = Depends(get_db)):
+def list_users(db: Session = Depends(get_db)):
     result = db.execute(select(User))
     return result.scalars().all()
 
 
 @router.post("", response_model=user_schema.User, status_code=status.HTTP_201_CREATED)
-async def create_user(
+def create_user(
     payload: user_schema.UserCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -54,7 +55,7 @@ async def create_user(
 
 
 @router.put("/{user_id}", response_model=user_schema.User)
-async def update_user(
+def update_user(
     user_id: int,
     payload: user_schema.UserUpdate,
     db: Session = Depends(get_db),
@@ -63,9 +64,11 @@ async def update_user(
     user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    revoke_sessions = False
     for field, value in payload.dict(exclude_unset=True).items():
         if field == "password" and value:
             user.password_hash = hash_password(value)
+            revoke_sessions = True
         elif field != "password":
             if current_user.role != "admin":
                 if field in {"role", "active"}:
@@ -75,14 +78,19 @@ async def update_user(
                         raise HTTPException(status_code=400, detail="Сотрудник не привязан к филиалу")
                     if value != current_user.branch_id:
                         raise HTTPException(status_code=400, detail="Нельзя назначить другой филиал")
+            if field in {"role", "active", "branch_id"} and getattr(user, field) != value:
+                revoke_sessions = True
             setattr(user, field, value)
+    if revoke_sessions:
+        # Role, branch and access are baked into issued tokens; make the user sign in again.
+        revoke_user_tokens(user)
     db.commit()
     db.refresh(user)
     return user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
     user = db.get(User, user_id)
@@ -5,18 +5,17 @@ import logging
 from decimal import Decimal
 from typing import Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
 from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from app.auth.security import get_current_user, require_production_access, require_workshop_only
 from app.core.enums import UserRole
+from app.core.pagination import NEXT_CURSOR_HEADER, created_at_keyset, decode_created_at_cursor, encode_cursor
 from app.database.session import get_db
 from app.models import (
     Branch,
-    Income,
     Expense,
-    IncomeItem,
     Product,
     Stock,
     User,
@@ -34,10 +33,17 @@ from app.models import (
 from app.schemas import branches as branch_schema
 from app.schemas import workshop as workshop_schema
 from app.services.files import save_upload
-from app.services.inventory import adjust_stock
-from app.services.workshop import get_workshop_branch_id
+from app.services.income import apply_receipt, require_products, serialize_income
+from app.services.product_search import apply_product_search, normalize_search_term
+from app.services.period_close import ensure_open, period_snapshot
+from app.services.report_jobs import cached_report
+from app.services.reports import compute_workshop_salary, normalize_workshop_month
+from app.services.workshop import get_workshop_branch_id, load_products, write_off_materials
 
 router = APIRouter(prefix="/api/workshop", dependencies=[Depends(require_workshop_only)])
+
+ORDERS_MAX_PAGE_SIZE = 200
+
 logger = logging.getLogger(__name__)
 
 
@@ -71,21 +77,6 @@ def _ensure_workshop_product(db: Session, branch_id: int, product_id: int) -> Pr
     return product
 
 
-def _get_or_create_stock(db: Session, branch_id: int, product_id: int) -> Stock:
-    stock = (
-        db.query(Stock)
-        .filter(Stock.branch_id == branch_id, Stock.product_id == product_id)
-        .with_for_update()
-        .first()
-    )
-    if stock:
-        return stock
-    stock = Stock(branch_id=branch_id, product_id=product_id, quantity=Decimal("0"))
-    db.add(stock)
-    db.flush()
-    return stock
-
-
 def _serialize_template_detail(
     template: WorkshopOrderTemplate,
     db: Session,
@@ -464,15 +455,48 @@ def delete_customer(item_id: int, db: Session = Depends(get_db)):
     return None
 
 
-@router.get("/orders", response_model=list[workshop_schema.WorkshopOrderOut])
-def list_orders(db: Session = Depends(get_db)):
+@router.get(
+    "/orders",
+    response_model=list[workshop_schema.WorkshopOrderOut],
+    description=(
+        "Workshop orders, newest first, without materials and payouts. Pass `limit` to page through "
+        "the list: the next page's `cursor` is returned in the X-Next-Cursor header."
+    ),
+)
+def list_orders(
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    customer_id: Optional[int] = Query(None),
+    order_type_id: Optional[int] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
     branch = _get_workshop_branch(db)
-    return (
-        db.query(WorkshopOrder)
-        .filter(WorkshopOrder.branch_id == branch.id)
-        .order_by(WorkshopOrder.created_at.desc())
-        .all()
-    )
+    query = db.query(WorkshopOrder).filter(WorkshopOrder.branch_id == branch.id)
+    if status_filter:
+        query = query.filter(WorkshopOrder.status == status_filter)
+    if start_date:
+        query = query.filter(WorkshopOrder.created_at >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        query = query.filter(WorkshopOrder.created_at <= datetime.combine(end_date, datetime.max.time()))
+    if customer_id is not None:
+        query = query.filter(WorkshopOrder.customer_id == customer_id)
+    if order_type_id is not None:
+        query = query.filter(WorkshopOrder.order_type_id == order_type_id)
+    if cursor:
+        query = query.filter(
+            created_at_keyset(WorkshopOrder.created_at, WorkshopOrder.id, decode_created_at_cursor(cursor))
+        )
+    query = query.order_by(WorkshopOrder.created_at.desc(), WorkshopOrder.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    orders = query.all()
+    if limit is not None and len(orders) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(orders[-1].created_at, orders[-1].id)
+    return orders
 
 
 @router.post("/orders", response_model=workshop_schema.WorkshopOrderOut, status_code=status.HTTP_201_CREATED)
@@ -548,11 +572,14 @@ def create_order(
             material_map[item.product_id] = {"per_unit_qty": per_unit_qty, "unit": item.unit}
 
     if material_map:
+        products = load_products(db, material_map)
+        if len(products) != len(material_map):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Товар не найден")
+        consumed: dict[int, Decimal] = {}
         for product_id, data in material_map.items():
-            product = _ensure_workshop_product(db, branch.id, product_id)
+            product = products[product_id]
             total_qty = data["per_unit_qty"] * multiplier
-            stock = _get_or_create_stock(db, branch.id, product_id)
-            stock.quantity = Decimal(str(stock.quantity or 0)) - total_qty
+            consumed[product_id] = total_qty
             material = WorkshopOrderMaterial(
                 order_id=order.id,
                 product_id=product_id,
@@ -562,6 +589,7 @@ def create_order(
                 unit=(data["unit"] or product.unit),
             )
             db.add(material)
+        write_off_materials(db, branch.id, consumed)
 
     db.commit()
     db.refresh(order)
@@ -842,11 +870,27 @@ def _get_order(db: Session, order_id: int) -> WorkshopOrder:
     return order
 
 
-def _serialize_order_detail(order: WorkshopOrder, db: Session) -> workshop_schema.WorkshopOrderDetail:
-    db.refresh(order, attribute_names=["materials", "payouts"])
+def _get_order_detail(db: Session, order_id: int) -> WorkshopOrder:
+    """Load an order with its materials, payouts, products and employees in a fixed number of queries."""
+    order = (
+        db.query(WorkshopOrder)
+        .options(
+            selectinload(WorkshopOrder.materials).joinedload(WorkshopOrderMaterial.product),
+            selectinload(WorkshopOrder.payouts).joinedload(WorkshopOrderPayout.employee),
+        )
+        .filter(WorkshopOrder.id == order_id)
+        .populate_existing()
+        .first()
+    )
+    if not order:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Заказ не найден")
+    return order
+
+
+def _serialize_order_detail(order: WorkshopOrder) -> workshop_schema.WorkshopOrderDetail:
     material_rows: list[workshop_schema.WorkshopOrderMaterialDetail] = []
     for material in order.materials:
-        product = db.get(Product, material.product_id)
+        product = material.product
         material_rows.append(
             workshop_schema.WorkshopOrderMaterialDetail(
                 id=material.id,
@@ -862,7 +906,7 @@ def _serialize_order_detail(order: WorkshopOrder, db: Session) -> workshop_schem
         )
     payout_rows: list[workshop_schema.WorkshopOrderPayoutDetail] = []
     for payout in order.payouts:
-        employee = db.get(WorkshopEmployee, payout.employee_id)
+        employee = payout.employee
         full_name = " ".join(
             filter(None, [employee.first_name if employee else None, employee.last_name if employee else None])
         ).strip()
@@ -911,8 +955,7 @@ def _assert_order_open(order: WorkshopOrder) -> None:
 
 @router.get("/orders/{order_id}", response_model=workshop_schema.WorkshopOrderDetail)
 def get_order(order_id: int, db: Session = Depends(get_db)):
-    order = _get_order(db, order_id)
-    return _serialize_order_detail(order, db)
+    return _serialize_order_detail(_get_order_detail(db, order_id))
 
 
 @router.put("/orders/{order_id}", response_model=workshop_schema.WorkshopOrderOut)
@@ -958,22 +1001,32 @@ def update_order(order_id: int, payload: workshop_schema.WorkshopOrderUpdate, db
 
     if quantity_changed:
         workshop_branch = _get_workshop_branch(db)
+        consumed: dict[int, Decimal] = {}
         for material in order.materials:
             old_total = material.total_qty if material.total_qty is not None else material.quantity or Decimal("0")
             base_qty = material.per_unit_qty if material.per_unit_qty is not None else material.quantity or Decimal("0")
             new_total = base_qty * _order_multiplier(order)
-            delta = new_total - old_total
-            stock = _get_or_create_stock(db, workshop_branch.id, material.product_id)
-            stock.quantity = Decimal(str(stock.quantity or 0)) - delta
+            consumed[material.product_id] = consumed.get(material.product_id, Decimal("0")) + new_total - old_total
             material.per_unit_qty = base_qty
             material.total_qty = new_total
             material.quantity = new_total
-        for payout in order.payouts:
+        write_off_materials(db, workshop_branch.id, consumed)
+        payouts = order.payouts
+        employee_ids = {payout.employee_id for payout in payouts}
+        employees = (
+            {
+                employee.id: employee
+                for employee in db.query(WorkshopEmployee).filter(WorkshopEmployee.id.in_(employee_ids))
+            }
+            if employee_ids
+            else {}
+        )
+        for payout in payouts:
             old_total = payout.total_amount if payout.total_amount is not None else payout.amount or Decimal("0")
             base_amount = payout.per_unit_amount if payout.per_unit_amount is not None else payout.amount or Decimal("0")
             new_total = base_amount * _order_multiplier(order)
             delta = new_total - old_total
-            employee = db.get(WorkshopEmployee, payout.employee_id)
+            employee = employees.get(payout.employee_id)
             if employee:
                 employee.total_salary = (employee.total_salary or Decimal("0")) + delta
             payout.per_unit_amount = base_amount
@@ -1025,8 +1078,7 @@ def add_material(order_id: int, payload: workshop_schema.WorkshopMaterialCreate,
     if per_unit_qty <= 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be positive")
     total_qty = per_unit_qty * _order_multiplier(order)
-    stock = _get_or_create_stock(db, workshop_branch.id, payload.product_id)
-    stock.quantity = Decimal(str(stock.quantity or 0)) - total_qty
+    write_off_materials(db, workshop_branch.id, {payload.product_id: total_qty})
     material = WorkshopOrderMaterial(
         order_id=order.id,
         product_id=payload.product_id,
@@ -1148,10 +1200,12 @@ def workshop_income_products(
     search: Optional[str] = Query(None, alias="q"), db: Session = Depends(get_db)
 ):
     query = db.query(Product)
+    search = normalize_search_term(search)
     if search:
-        term = f"%{search}%"
-        query = query.filter((Product.name.ilike(term)) | (Product.barcode.ilike(term)))
-    products = query.order_by(Product.name.asc()).limit(500).all()
+        query = apply_product_search(query, search)
+    else:
+        query = query.order_by(Product.name.asc())
+    products = query.limit(500).all()
     return [
         workshop_schema.WorkshopIncomeProduct(
             id=product.id,
@@ -1179,40 +1233,22 @@ def create_workshop_income(
     branch = _get_workshop_branch(db)
     if not payload.items:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Нет товаров для прихода")
-    income = Income(branch_id=branch.id, created_by_id=current_user.id)
-    db.add(income)
-    db.flush()
-    stock_updates: list[workshop_schema.WorkshopIncomeStock] = []
     for item in payload.items:
         if item.quantity <= 0:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be positive")
-        product = db.get(Product, item.product_id)
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product {item.product_id} not found",
-            )
-        income_item = IncomeItem(
-            income_id=income.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            purchase_price=item.purchase_price,
-            sale_price=item.sale_price,
-        )
-        db.add(income_item)
-        product.quantity += item.quantity
-        product.purchase_price = item.purchase_price
-        product.sale_price = item.sale_price
-        stock = adjust_stock(db, branch.id, item.product_id, item.quantity)
-        stock_updates.append(
-            workshop_schema.WorkshopIncomeStock(
-                product_id=item.product_id, branch_id=branch.id, quantity=stock.quantity
-            )
+    require_products(db, [item.product_id for item in payload.items])
+    receipt = apply_receipt(db, branch.id, current_user.id, payload.items)
+    income = receipt.income
+    stock_updates = [
+        workshop_schema.WorkshopIncomeStock(
+            product_id=item.product_id, branch_id=branch.id, quantity=receipt.stock[item.product_id]
         )
+        for item in payload.items
+    ]
     db.commit()
     db.refresh(income)
     db.refresh(income, attribute_names=["items"])
-    return workshop_schema.WorkshopIncomeResponse(income=income, stock=stock_updates)
+    return workshop_schema.WorkshopIncomeResponse(income=serialize_income(income), stock=stock_updates)
 
 
 @router.get("/report", response_model=list[workshop_schema.WorkshopClosureOut])
@@ -1234,80 +1270,7 @@ def workshop_report_summary(
     month: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
-    start, end, month_label = _parse_month(month)
-    branch_id = get_workshop_branch_id(db)
-    orders_total = (
-        db.query(func.coalesce(func.sum(WorkshopOrder.amount), 0))
-        .filter(
-            WorkshopOrder.branch_id == branch_id,
-            WorkshopOrder.created_at >= start,
-            WorkshopOrder.created_at < end,
-        )
-        .scalar()
-        or 0
-    )
-    materials_cogs = (
-        db.query(func.coalesce(func.sum(WorkshopOrderMaterial.quantity * Product.purchase_price), 0))
-        .join(WorkshopOrder, WorkshopOrder.id == WorkshopOrderMaterial.order_id)
-        .join(Product, Product.id == WorkshopOrderMaterial.product_id)
-        .filter(
-            WorkshopOrder.branch_id == branch_id,
-            WorkshopOrder.created_at >= start,
-            WorkshopOrder.created_at < end,
-        )
-        .scalar()
-        or 0
-    )
-    expenses_total = (
-        db.query(func.coalesce(func.sum(Expense.amount), 0))
-        .filter(
-            Expense.branch_id == branch_id,
-            Expense.created_at >= start,
-            Expense.created_at < end,
-        )
-        .scalar()
-        or 0
-    )
-    salary_payout_total = (
-        db.query(func.coalesce(func.sum(WorkshopSalaryTransaction.amount), 0))
-        .filter(
-            WorkshopSalaryTransaction.type == "payout",
-            WorkshopSalaryTransaction.created_at >= start,
-            WorkshopSalaryTransaction.created_at < end,
-        )
-        .scalar()
-        or 0
-    )
-    salary_bonus_total = (
-        db.query(func.coalesce(func.sum(WorkshopSalaryTransaction.amount), 0))
-        .filter(
-            WorkshopSalaryTransaction.type == "bonus",
-            WorkshopSalaryTransaction.created_at >= start,
-            WorkshopSalaryTransaction.created_at < end,
-        )
-        .scalar()
-        or 0
-    )
-    orders_total = Decimal(str(orders_total))
-    materials_cogs = Decimal(str(materials_cogs))
-    expenses_total = Decimal(str(expenses_total))
-    salary_payout_total = Decimal(str(salary_payout_total))
-    salary_bonus_total = Decimal(str(salary_bonus_total))
-    salary_total = salary_payout_total + salary_bonus_total
-    orders_margin = orders_total - materials_cogs
-    net_profit = orders_margin - (expenses_total + salary_total)
-
-    return workshop_schema.WorkshopReportSummaryOut(
-        month=month_label,
-        orders_total=orders_total,
-        materials_cogs=materials_cogs,
-        orders_margin=orders_margin,
-        expenses_total=expenses_total,
-        salary_payout_total=salary_payout_total,
-        salary_bonus_total=salary_bonus_total,
-        salary_total=salary_total,
-        net_profit=net_profit,
-    )
+    return cached_report(db, "workshop_summary", {"month": month})
 
 
 @router.get("/salary/summary", response_model=list[workshop_schema.WorkshopSalarySummaryItem])
@@ -1316,63 +1279,11 @@ def workshop_salary_summary(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_production_access),
 ):
-    start, end, _ = _parse_month(month)
-    employees = db.query(WorkshopEmployee).order_by(WorkshopEmployee.id.asc()).all()
-    order_payouts = dict(
-        db.query(
-            WorkshopOrderPayout.employee_id,
-            func.coalesce(func.sum(WorkshopOrderPayout.amount), 0),
-        )
-        .filter(WorkshopOrderPayout.created_at >= start, WorkshopOrderPayout.created_at < end)
-        .group_by(WorkshopOrderPayout.employee_id)
-        .all()
-    )
-    payout_transactions = dict(
-        db.query(
-            WorkshopSalaryTransaction.employee_id,
-            func.coalesce(func.sum(WorkshopSalaryTransaction.amount), 0),
-        )
-        .filter(
-            WorkshopSalaryTransaction.type == "payout",
-            WorkshopSalaryTransaction.created_at >= start,
-            WorkshopSalaryTransaction.created_at < end,
-        )
-        .group_by(WorkshopSalaryTransaction.employee_id)
-        .all()
-    )
-    bonus_transactions = dict(
-        db.query(
-            WorkshopSalaryTransaction.employee_id,
-            func.coalesce(func.sum(WorkshopSalaryTransaction.amount), 0),
-        )
-        .filter(
-            WorkshopSalaryTransaction.type == "bonus",
-            WorkshopSalaryTransaction.created_at >= start,
-            WorkshopSalaryTransaction.created_at < end,
-        )
-        .group_by(WorkshopSalaryTransaction.employee_id)
-        .all()
-    )
-
-    results: list[workshop_schema.WorkshopSalarySummaryItem] = []
-    for employee in employees:
-        full_name = " ".join(filter(None, [employee.first_name, employee.last_name])).strip() or employee.first_name
-        accrued = Decimal(str(order_payouts.get(employee.id, 0)))
-        payout = Decimal(str(payout_transactions.get(employee.id, 0)))
-        bonus = Decimal(str(bonus_transactions.get(employee.id, 0)))
-        balance = accrued + bonus - payout
-        results.append(
-            workshop_schema.WorkshopSalarySummaryItem(
-                employee_id=employee.id,
-                full_name=full_name,
-                position=employee.position,
-                accrued=accrued,
-                payout=payout,
-                bonus=bonus,
-                balance=balance,
-            )
-        )
-    return results
+    params = normalize_workshop_month({"month": month})
+    frozen = period_snapshot(db, "workshop_salary", params["month"])
+    if frozen is not None:
+        return frozen
+    return compute_workshop_salary(db, params)
 
 
 @router.post("/salary/payout", status_code=status.HTTP_201_CREATED)
@@ -1389,6 +1300,7 @@ def create_salary_payout(
     created_at = datetime.utcnow()
     if payload.date:
         created_at = datetime.combine(payload.date, datetime.min.time())
+        ensure_open(db, created_at)
     transaction = WorkshopSalaryTransaction(
         employee_id=employee.id,
         type="payout",
@@ -1416,6 +1328,7 @@ def create_salary_bonus(
     created_at = datetime.utcnow()
     if payload.date:
         created_at = datetime.combine(payload.date, datetime.min.time())
+        ensure_open(db, created_at)
     transaction = WorkshopSalaryTransaction(
         employee_id=employee.id,
         type="bonus",
@@ -1514,10 +1427,12 @@ def _get_products_catalog(
     db: Session,
 ) -> list[workshop_schema.WorkshopStockProduct]:
     query = db.query(Product)
+    search = normalize_search_term(search)
     if search:
-        term = f"%{search}%"
-        query = query.filter((Product.name.ilike(term)) | (Product.barcode.ilike(term)))
-    rows = query.order_by(Product.name.asc()).limit(limit).all()
+        query = apply_product_search(query, search)
+    else:
+        query = query.order_by(Product.name.asc())
+    rows = query.limit(limit).all()
     return [
         workshop_schema.WorkshopStockProduct(
             id=product.id,
@@ -1544,10 +1459,12 @@ def _get_workshop_stock(
         .join(Product, Stock.product_id == Product.id)
         .filter(Stock.branch_id == branch.id, Stock.quantity > 0)
     )
+    search = normalize_search_term(search)
     if search:
-        term = f"%{search}%"
-        query = query.filter((Product.name.ilike(term)) | (Product.barcode.ilike(term)))
-    stock_rows = query.order_by(Product.name.asc()).limit(limit).all()
+        query = apply_product_search(query, search)
+    else:
+        query = query.order_by(Product.name.asc())
+    stock_rows = query.limit(limit).all()
 
     items: list[workshop_schema.WorkshopStockProduct] = []
     for stock in stock_rows:
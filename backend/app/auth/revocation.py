@@ -0,0 +1,79 @@
+"""Revoked access-token ids (``jti``), checked on every request.
+
+Access tokens are stateless, so logging out only takes effect once their ``jti`` is listed
+here. Logout writes the ``jti`` to ``revoked_access_tokens`` in its transaction; each worker
+keeps the unexpired rows in memory and reloads them at most every
+``TOKEN_REVOCATION_POLL_SECONDS`` (and on its first request), so a token logged out on one
+worker is refused by all of them, also after a restart. Revoking every token of a user
+(deactivation, role change) goes through ``User.token_version`` instead.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.user import RevokedAccessToken
+
+
+class RevokedTokens:
+    def __init__(self, poll_seconds: float) -> None:
+        self._lock = threading.Lock()
+        self._poll_seconds = poll_seconds
+        self._expiry: dict[str, float] = {}
+        self._next_sync = 0.0
+
+    def revoke(self, db: Session, jti: str, expires_at: float) -> None:
+        """Record the revocation in the caller's transaction and in this worker at once."""
+        now = datetime.now(timezone.utc)
+        db.execute(delete(RevokedAccessToken).where(RevokedAccessToken.expires_at < now))
+        db.merge(RevokedAccessToken(jti=jti, expires_at=datetime.fromtimestamp(expires_at, timezone.utc)))
+        with self._lock:
+            self._expiry[jti] = expires_at
+
+    def is_revoked(self, db: Session, jti: str) -> bool:
+        if time.monotonic() >= self._next_sync and self._claim_sync():
+            self.sync(db)
+        return jti in self._expiry
+
+    def _claim_sync(self) -> bool:
+        # One request per poll interval reloads; the others keep using the current set.
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_sync:
+                return False
+            self._next_sync = now + self._poll_seconds
+            return True
+
+    def sync(self, db: Session) -> None:
+        """Add the unexpired rows written by any worker and drop expired entries."""
+        rows = db.execute(
+            select(RevokedAccessToken.jti, RevokedAccessToken.expires_at).where(
+                RevokedAccessToken.expires_at > datetime.now(timezone.utc)
+            )
+        ).all()
+        now = time.time()
+        with self._lock:
+            # Revocations are never undone, so local entries not yet committed are kept.
+            expiry = {jti: expires_at for jti, expires_at in self._expiry.items() if expires_at >= now}
+            expiry.update((jti, _timestamp(expires_at)) for jti, expires_at in rows)
+            self._expiry = expiry
+
+    def clear(self) -> None:
+        """Forget the in-memory set; the next check reloads it from the database."""
+        with self._lock:
+            self._expiry = {}
+            self._next_sync = 0.0
+
+
+def _timestamp(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+revoked_tokens = RevokedTokens(get_settings().token_revocation_poll_seconds)
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import hmac
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib import exc as passlib_exc
@@ -12,9 +16,11 @@ from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from app.auth.revocation import revoked_tokens
+from app.auth.user_cache import user_cache
 from app.core.config import get_settings
 from app.core.enums import UserRole
-from app.database.session import get_db
+from app.database.session import SessionLocal, get_db
 from app.models.user import User
 
 settings = get_settings()
@@ -44,15 +50,14 @@ def create_token(payload: dict, expires_delta: timedelta) -> str:
     return jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
 
 
-def create_access_token(data: dict) -> str:
-    return create_token(data, timedelta(minutes=settings.access_token_expire_minutes))
+# bcrypt costs ~200 ms of CPU per call. Hashing and verification run in a small dedicated
+# pool so a burst of logins queues up here instead of occupying the request threadpool.
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="password-hash"
+)
 
 
-def create_refresh_token(data: dict) -> str:
-    return create_token(data, timedelta(minutes=settings.refresh_token_expire_minutes))
-
-
-def verify_password(plain: str, hashed: str) -> bool:
+def _verify_password(plain: str, hashed: str) -> bool:
     try:
         return password_context.verify(plain, hashed)
     except ValueError:
@@ -64,8 +69,16 @@ def verify_password(plain: str, hashed: str) -> bool:
         return False
 
 
+def verify_password(plain: str, hashed: str) -> bool:
+    return _password_executor.submit(_verify_password, plain, hashed).result()
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await asyncio.wrap_future(_password_executor.submit(_verify_password, plain, hashed))
+
+
 def hash_password(password: str) -> str:
-    return password_context.hash(password)
+    return _password_executor.submit(password_context.hash, password).result()
 
 
 def get_password_hash(password: str) -> str:
@@ -74,13 +87,22 @@ def get_password_hash(password: str) -> str:
     return hash_password(password)
 
 
-def authenticate(db: Session, login: str | None, password: str | None) -> User:
+def _load_login_user(login: str) -> User | None:
+    # A short-lived session: the connection goes back to the pool before bcrypt runs.
+    with SessionLocal() as db:
+        user = get_user_by_login(db, login)
+        if user is not None:
+            db.expunge(user)
+        return user
+
+
+async def authenticate(login: str | None, password: str | None) -> User:
     if not login or not password:
         logger.warning("Authentication attempt with missing credentials (login=%s)", login)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed")
 
     try:
-        user = get_user_by_login(db, login)
+        user = await run_in_threadpool(_load_login_user, login)
     except SQLAlchemyError as exc:
         logger.exception("Database error during login for user %s", login)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error") from exc
@@ -89,7 +111,7 @@ def authenticate(db: Session, login: str | None, password: str | None) -> User:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error") from exc
 
     try:
-        is_valid_password = verify_password(password, user.password_hash) if user else False
+        is_valid_password = await verify_password_async(password, user.password_hash) if user else False
     except Exception as exc:
         logger.exception("Password verification failed for user %s", login)
         raise HTTPException(
@@ -109,7 +131,7 @@ def authenticate(db: Session, login: str | None, password: str | None) -> User:
     return user
 
 
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
 ) -> User:
     credentials_exception = HTTPException(
@@ -124,13 +146,29 @@ async def get_current_user(
             raise credentials_exception
     except JWTError as exc:
         raise credentials_exception from exc
+    # Tokens issued before refresh rotation carry no "typ"/"jti" and are treated as access tokens.
+    if payload.get("typ", "access") != "access":
+        raise credentials_exception
+    jti = payload.get("jti")
+    if jti and revoked_tokens.is_revoked(db, jti):
+        raise credentials_exception
 
     try:
-        user = get_user_by_id(db, int(user_id))
+        user_id = int(user_id)
+        token_version = int(payload.get("ver") or 0)
     except (TypeError, ValueError) as exc:
         raise credentials_exception from exc
-    if user is None or not user.active:
+
+    cached = user_cache.get(user_id, token_version)
+    if cached is not None:
+        # Attach a per-request copy without a round-trip; relationships still lazy-load.
+        return db.merge(cached, load=False)
+
+    generation = user_cache.generation
+    user = get_user_by_id(db, user_id)
+    if user is None or not user.active or (user.token_version or 0) != token_version:
         raise credentials_exception
+    user_cache.put(user, token_version, generation)
     return user
 
 
@@ -141,6 +179,14 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
+def require_metrics_access(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> None:
+    """Allow a Prometheus scrape with ``METRICS_SCRAPE_TOKEN`` as bearer token, or an admin."""
+    scrape_token = settings.metrics_scrape_token
+    if scrape_token and hmac.compare_digest(token.encode("utf-8"), scrape_token.encode("utf-8")):
+        return
+    require_admin(get_current_user(token, db))
+
+
 def require_employee(current_user: User = Depends(get_current_user)) -> User:
     role_value = get_role_value(current_user.role)
     if role_value not in {UserRole.ADMIN.value, UserRole.EMPLOYEE.value, UserRole.PRODUCTION_MANAGER.value, UserRole.MANAGER.value}:
@@ -0,0 +1,119 @@
+"""Token issuing, refresh-token rotation and revocation.
+
+Every token carries ``jti`` (unique id), ``typ`` (``access``/``refresh``) and ``ver`` (the
+user's ``token_version``). Refresh tokens are also recorded in ``refresh_tokens``; using
+one marks it revoked and issues a replacement, so each refresh token works exactly once.
+"""
+from __future__ import annotations
+
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from jose import JWTError, jwt
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from app.auth.revocation import revoked_tokens
+from app.auth.security import create_token, get_role_value
+from app.core.config import get_settings
+from app.models.user import RefreshToken, User
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+
+def issue_tokens(db: Session, user: User, refresh_jti: str | None = None) -> dict:
+    """Create an access/refresh pair for ``user`` and record the refresh token; the caller commits."""
+    base_payload = {
+        "sub": str(user.id),
+        "user_id": user.id,
+        "role": get_role_value(user.role),
+        "branch_id": user.branch_id,
+        "ver": user.token_version or 0,
+    }
+    refresh_jti = refresh_jti or uuid.uuid4().hex
+    refresh_lifetime = timedelta(minutes=settings.refresh_token_expire_minutes)
+    access_token = create_token(
+        {**base_payload, "jti": uuid.uuid4().hex, "typ": ACCESS_TOKEN_TYPE},
+        timedelta(minutes=settings.access_token_expire_minutes),
+    )
+    refresh_token = create_token({**base_payload, "jti": refresh_jti, "typ": REFRESH_TOKEN_TYPE}, refresh_lifetime)
+
+    now = datetime.now(timezone.utc)
+    # Expired rows of this user are dropped here so the table stays proportional to active sessions.
+    db.execute(delete(RefreshToken).where(RefreshToken.user_id == user.id, RefreshToken.expires_at < now))
+    db.add(RefreshToken(jti=refresh_jti, user_id=user.id, expires_at=now + refresh_lifetime))
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+def decode_refresh_token(token: str) -> dict:
+    try:
+        data = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+    except JWTError as exc:
+        raise _invalid_refresh_token() from exc
+    if data.get("typ") != REFRESH_TOKEN_TYPE or not data.get("jti"):
+        raise _invalid_refresh_token()
+    return data
+
+
+def rotate_refresh_token(db: Session, token: str) -> dict:
+    """Exchange a refresh token for a new pair; the presented token cannot be used again."""
+    data = decode_refresh_token(token)
+    now = datetime.now(timezone.utc)
+    user = db.get(User, int(data.get("user_id") or data.get("sub") or 0))
+    if user is None or not user.active or (user.token_version or 0) != int(data.get("ver") or 0):
+        raise _invalid_refresh_token()
+
+    new_jti = uuid.uuid4().hex
+    new_tokens = issue_tokens(db, user, refresh_jti=new_jti)
+    # Conditional UPDATE so that two concurrent refreshes with the same token cannot both win.
+    consumed = db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.jti == data["jti"],
+            RefreshToken.user_id == user.id,
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(revoked_at=now, replaced_by=new_jti)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if consumed != 1:
+        db.rollback()
+        logger.warning("Rejected reuse of refresh token %s for user %s", data["jti"], user.id)
+        raise _invalid_refresh_token()
+    return new_tokens
+
+
+def revoke_refresh_token(db: Session, token: str, user_id: int) -> None:
+    try:
+        data = decode_refresh_token(token)
+    except HTTPException:
+        return
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.jti == data["jti"], RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def revoke_access_token(db: Session, payload: dict) -> None:
+    """Revoke one access token on every worker; the caller commits."""
+    jti = payload.get("jti")
+    if jti:
+        revoked_tokens.revoke(db, jti, float(payload.get("exp") or 0))
+
+
+def revoke_user_tokens(user: User) -> None:
+    """Invalidate every access and refresh token issued to ``user`` so far."""
+    user.token_version = (user.token_version or 0) + 1
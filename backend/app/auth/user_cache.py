@@ -0,0 +1,108 @@
+"""Short-lived cache of authenticated users for ``get_current_user``.
+
+Entries are detached ``User`` snapshots keyed by ``(user_id, token_version)``. They are
+attached to the request's session with ``Session.merge(load=False)``, which costs no SQL.
+Any committed write to a user drops its entry, so deactivation and role changes apply to
+the next request rather than after the TTL.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import ORMExecuteState, Session, make_transient_to_detached
+
+from app.core.config import get_settings
+from app.models.user import User
+
+_CHANGED_KEY = "auth_changed_user_ids"
+_CHANGED_ALL_KEY = "auth_changed_all_users"
+
+
+class UserCache:
+    def __init__(self, ttl_seconds: float, max_size: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[int, int], tuple[float, User]] = OrderedDict()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id: int, token_version: int) -> User | None:
+        if self.max_size <= 0:
+            return None
+        key = (user_id, token_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, user: User, token_version: int, generation: int) -> None:
+        """Cache a snapshot of ``user`` unless a user write committed since ``generation``."""
+        if self.max_size <= 0:
+            return
+        snapshot = User(**{attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+        make_transient_to_detached(snapshot)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[(user.id, token_version)] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end((user.id, token_version))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids=None) -> None:
+        """Drop the given users, or every entry when ``user_ids`` is None."""
+        with self._lock:
+            self._generation += 1
+            if user_ids is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] in user_ids]:
+                del self._entries[key]
+
+
+settings = get_settings()
+user_cache = UserCache(settings.user_cache_ttl_seconds, settings.user_cache_max_size)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(state: ORMExecuteState) -> None:
+    if not (state.is_update or state.is_delete):
+        return
+    if getattr(getattr(state.statement, "table", None), "name", None) == User.__tablename__:
+        state.session.info[_CHANGED_ALL_KEY] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session: Session, flush_context) -> None:
+    for obj in chain(session.dirty, session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            session.info.setdefault(_CHANGED_KEY, set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    changed = session.info.pop(_CHANGED_KEY, None)
+    if session.info.pop(_CHANGED_ALL_KEY, False):
+        user_cache.invalidate()
+    elif changed:
+        user_cache.invalidate(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session: Session) -> None:
+    session.info.pop(_CHANGED_KEY, None)
+    session.info.pop(_CHANGED_ALL_KEY, None)
@@ -17,6 +17,7 @@ from app.core.config import Settings
 from app.database.migrations import run_migrations_on_startup
 from app.database.session import SessionLocal
 from app.models import Branch, User
+from app.services.rollups import ensure_daily_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -150,6 +151,11 @@ def ensure_default_branches(settings: Settings) -> None:
         logger.info("Default branches already exist")
 
 
+def backfill_sales_rollups() -> None:
+    with _session_scope() as db:
+        ensure_daily_rollups(db)
+
+
 def _run_step(name: str, func: Callable[[], None]) -> None:
     logger.info("[bootstrap] START %s", name)
     start = time.perf_counter()
@@ -172,6 +178,7 @@ def bootstrap(settings: Settings) -> None:
         ("run migrations", lambda: apply_migrations(settings)),
         ("seed branches", lambda: ensure_default_branches(settings)),
         ("seed admin user", lambda: ensure_admin_user(settings)),
+        ("backfill sales rollups", backfill_sales_rollups),
     ]
 
     for name, func in steps:
@@ -19,6 +19,40 @@ class Settings(BaseSettings):
     vite_host: str | None = None
     vite_port: int | None = None
     sale_branch_name: str = "Магазин"
+    # Cashier catalogue / barcode index: how often each worker re-reads the shared catalogue
+    # version, and the age after which a snapshot is rebuilt even without a version change.
+    catalog_version_check_seconds: float = Field(default=2.0, env="CATALOG_VERSION_CHECK_SECONDS")
+    catalog_max_age_seconds: float = Field(default=300.0, env="CATALOG_MAX_AGE_SECONDS")
+    # Threads dedicated to bcrypt hashing/verification; bounds concurrent logins' CPU use.
+    password_hash_workers: int = Field(default=4, env="PASSWORD_HASH_WORKERS")
+    # Authenticated users are cached per process; writes to a user invalidate the entry at once.
+    user_cache_ttl_seconds: float = Field(default=60.0, env="USER_CACHE_TTL_SECONDS")
+    user_cache_max_size: int = Field(default=1024, env="USER_CACHE_MAX_SIZE")
+    # How often each worker reloads access tokens revoked by logout on other workers.
+    token_revocation_poll_seconds: float = Field(default=5.0, env="TOKEN_REVOCATION_POLL_SECONDS")
+    # Sync handlers run in AnyIO's worker pool. Keep it at most DB_POOL_SIZE + DB_MAX_OVERFLOW:
+    # extra threads would only queue on the pool and fail after DB_POOL_TIMEOUT.
+    threadpool_max_workers: int = Field(default=20, env="THREADPOOL_MAX_WORKERS")
+
+    # Connection pool (ignored for SQLite). Each uvicorn worker owns its own pool,
+    # so workers * (pool_size + max_overflow) must stay below Postgres max_connections.
+    db_pool_size: int = Field(default=10, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, env="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=10.0, env="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=1800, env="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(default=True, env="DB_POOL_PRE_PING")
+    db_slow_checkout_ms: float = Field(default=200.0, env="DB_SLOW_CHECKOUT_MS")
+
+    # Prometheus text metrics at /api/metrics; requests issuing more SQL statements than the
+    # threshold are logged and counted as query-heavy (usually an N+1).
+    metrics_enabled: bool = Field(default=True, env="METRICS_ENABLED")
+    # Bearer token for the scraper; without it only admins can read /api/metrics.
+    metrics_scrape_token: str | None = Field(default=None, env="METRICS_SCRAPE_TOKEN")
+    sql_query_warn_threshold: int = Field(default=30, env="SQL_QUERY_WARN_THRESHOLD")
+    # Upper bound on the lines of one bulk goods receipt (/api/income/import).
+    income_import_max_lines: int = Field(default=20000, env="INCOME_IMPORT_MAX_LINES")
+    # Background threads computing report jobs (/api/reports/jobs).
+    report_workers: int = Field(default=2, env="REPORT_WORKERS")
 
     environment: str = "dev"
     auto_run_migrations: bool = True
@@ -88,6 +122,7 @@ class Settings(BaseSettings):
         data = self.model_dump()
         data.pop("jwt_secret_key", None)
         data.pop("admin_password", None)
+        data.pop("metrics_scrape_token", None)
         data["database_url"] = self.safe_database_url
         return data
 
@@ -0,0 +1,233 @@
+"""Request and SQL metrics rendered in the Prometheus text exposition format.
+
+A small in-process registry (no ``prometheus_client`` dependency) fed by the request
+middleware in ``app.main`` and by engine cursor events. SQL statements are attributed to
+the request that issued them through a context variable, which AnyIO copies into the
+worker threads that run sync handlers.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, *labels, value: float) -> None:
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._values.items())
+        lines = self._header()
+        for labels, series in items:
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-2]}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run ``collector`` before every render, e.g. to copy pool counters into gauges."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:  # pragma: no cover - a broken collector must not break scraping
+                logger.exception("Metrics collector failed")
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LABELS = ("method", "route")
+
+http_requests = registry.register(
+    Counter("kassa_http_requests_total", "HTTP requests by route and status.", REQUEST_LABELS + ("status",))
+)
+http_request_duration = registry.register(
+    Histogram("kassa_http_request_duration_seconds", "HTTP request latency.", REQUEST_LABELS)
+)
+http_in_flight = registry.register(
+    Gauge("kassa_http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+)
+http_response_size = registry.register(
+    Histogram(
+        "kassa_http_response_size_bytes",
+        "Response body size (Content-Length; streamed responses are not counted).",
+        REQUEST_LABELS,
+        buckets=SIZE_BUCKETS,
+    )
+)
+sql_queries_per_request = registry.register(
+    Histogram(
+        "kassa_http_request_sql_queries", "SQL statements issued per request.", REQUEST_LABELS, buckets=QUERY_COUNT_BUCKETS
+    )
+)
+sql_seconds_per_request = registry.register(
+    Histogram("kassa_http_request_sql_seconds", "Time spent in SQL per request.", REQUEST_LABELS)
+)
+query_heavy_requests = registry.register(
+    Counter(
+        "kassa_http_query_heavy_requests_total",
+        "Requests that issued more SQL statements than SQL_QUERY_WARN_THRESHOLD (likely N+1).",
+        REQUEST_LABELS,
+    )
+)
+sql_statements = registry.register(
+    Counter("kassa_sql_statements_total", "SQL statements executed, including those outside requests.")
+)
+db_pool = registry.register(Gauge("kassa_db_pool", "Connection pool state and counters (see /api/health/db).", ("stat",)))
+
+
+@dataclass
+class RequestSqlStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+_request_sql: ContextVar[RequestSqlStats | None] = ContextVar("request_sql", default=None)
+
+
+def start_request_sql_tracking() -> tuple[RequestSqlStats, object]:
+    stats = RequestSqlStats()
+    return stats, _request_sql.set(stats)
+
+
+def stop_request_sql_tracking(token) -> None:
+    _request_sql.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.get("query_started")
+    elapsed = time.perf_counter() - started.pop() if started else 0.0
+    sql_statements.inc()
+    stats = _request_sql.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+
+def _handle_error(exception_context) -> None:
+    connection = exception_context.connection
+    started = connection.info.get("query_started") if connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
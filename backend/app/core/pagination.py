@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Pack the sort key of the last row of a page into an opaque, URL-safe token."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, ValueError, UnicodeError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Неверный курсор") from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Неверный курсор")
+    return values
+
+
+def parse_cursor_datetime(value: Any) -> datetime:
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Неверный курсор") from exc
+
+
+def decode_created_at_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by ``encode_cursor(created_at, id)``."""
+    created_at_value, row_id = decode_cursor(cursor, 2)
+    if not isinstance(row_id, int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Неверный курсор")
+    return parse_cursor_datetime(created_at_value), row_id
+
+
+def created_at_keyset(created_at_column, id_column, after: tuple[datetime, int]):
+    """Rows that sort after ``after`` in (created_at, id) DESC order."""
+    after_created_at, after_id = after
+    return or_(
+        created_at_column < after_created_at,
+        and_(created_at_column == after_created_at, id_column < after_id),
+    )
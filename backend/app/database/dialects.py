@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import Table
+from sqlalchemy.orm import Session
+
+
+def upsert_insert(db: Session, table: Table | Any):
+    """Return a dialect-specific INSERT that supports ``on_conflict_do_update``.
+
+    Postgres is the production database; SQLite is used for local runs.
+    """
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:  # pragma: no cover - unsupported backends
+        raise NotImplementedError(f"UPSERT is not supported for dialect '{dialect_name}'")
+    return insert(table)
+
+
+def supports_upsert_returning(db: Session) -> bool:
+    """Whether ``upsert_insert`` can be used together with ``RETURNING`` on this connection.
+
+    SQLite only gained ``RETURNING`` in 3.35, so older builds report ``insert_returning=False``.
+    """
+    dialect = db.get_bind().dialect
+    return dialect.name in {"postgresql", "sqlite"} and bool(dialect.insert_returning)
@@ -0,0 +1,176 @@
+"""EXPLAIN the report queries and flag the ones that scan whole tables.
+
+    python -m app.database.index_audit [--days 31] [--planner-costs]
+
+Each query mirrors a filter used by the reports (date range combined with branch, seller
+or client, and the item lookups by parent id). On PostgreSQL sequential scans are disabled
+for the session by default, so a ``Seq Scan`` left in the plan means no index can serve the
+query at all; pass ``--planner-costs`` to see the plans the planner would really choose.
+On SQLite every ``SCAN <table>`` step is reported. Exits with status 1 when a query is
+flagged, so the command can guard migrations in CI.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.models.entities import (
+    Debt,
+    DebtPayment,
+    Expense,
+    Income,
+    IncomeItem,
+    Return,
+    ReturnItem,
+    SalaryPayment,
+    Sale,
+    SaleItem,
+    WorkshopOrder,
+)
+
+
+class _Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement, prefix: str) -> None:
+        self.statement = statement
+        self.prefix = prefix
+
+
+@compiles(_Explain)
+def _compile_explain(element: _Explain, compiler, **kw) -> str:
+    return f"{element.prefix} {compiler.process(element.statement, **kw)}"
+
+
+@dataclass
+class AuditResult:
+    name: str
+    scanned_tables: list[str]
+    plan: str
+
+    @property
+    def ok(self) -> bool:
+        return not self.scanned_tables
+
+
+def report_queries(start: datetime, end: datetime) -> dict[str, object]:
+    """Representative report statements; the ids are placeholders, only the plan shape matters."""
+    return {
+        "sales by branch and period": select(Sale.id).where(
+            Sale.created_at >= start, Sale.created_at < end, Sale.branch_id == 1
+        ),
+        "sales by seller and period": select(Sale.id).where(
+            Sale.seller_id == 1, Sale.created_at >= start, Sale.created_at < end
+        ),
+        "sales by client and period": select(Sale.id).where(
+            Sale.client_id == 1, Sale.created_at >= start, Sale.created_at < end
+        ),
+        "sale items of a sale": select(SaleItem.id).where(SaleItem.sale_id == 1),
+        "returns by branch and period": select(Return.id).where(
+            Return.created_at >= start, Return.created_at < end, Return.branch_id == 1
+        ),
+        "returns of a sale": select(Return.id).where(Return.sale_id == 1),
+        "return items of a return": select(ReturnItem.id).where(ReturnItem.return_id == 1),
+        "return items of a sale item": select(ReturnItem.id).where(ReturnItem.sale_item_id == 1),
+        "debt payments by branch and period": select(DebtPayment.id).where(
+            DebtPayment.created_at >= start, DebtPayment.created_at < end, DebtPayment.branch_id == 1
+        ),
+        "debt payments by client": select(DebtPayment.id)
+        .where(DebtPayment.client_id == 1)
+        .order_by(DebtPayment.created_at),
+        "open debts by client (FIFO)": select(Debt.id).where(Debt.client_id == 1).order_by(Debt.created_at),
+        "expenses by period": select(Expense.id).where(Expense.created_at >= start, Expense.created_at < end),
+        "salary payments by period": select(SalaryPayment.id).where(
+            SalaryPayment.created_at >= start, SalaryPayment.created_at < end
+        ),
+        "income page by branch": select(Income.id)
+        .where(Income.branch_id == 1)
+        .order_by(Income.created_at.desc(), Income.id.desc())
+        .limit(50),
+        "income items of an income": select(IncomeItem.id).where(IncomeItem.income_id == 1),
+        "workshop orders page": select(WorkshopOrder.id)
+        .where(WorkshopOrder.branch_id == 1)
+        .order_by(WorkshopOrder.created_at.desc(), WorkshopOrder.id.desc())
+        .limit(50),
+    }
+
+
+def _postgres_seq_scans(plan: dict) -> list[str]:
+    tables = []
+    if plan.get("Node Type") == "Seq Scan":
+        tables.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        tables.extend(_postgres_seq_scans(child))
+    return tables
+
+
+def _sqlite_scanned_table(step: str) -> str | None:
+    # "SCAN sales" on SQLite >= 3.36, "SCAN TABLE sales" before; "SEARCH ..." uses an index.
+    words = step.split()
+    if len(words) < 2 or words[0] != "SCAN":
+        return None
+    return words[2] if words[1] == "TABLE" and len(words) > 2 else words[1]
+
+
+def explain(db: Session, name: str, statement) -> AuditResult:
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        document = db.execute(_Explain(statement, "EXPLAIN (FORMAT JSON)")).scalar_one()
+        if isinstance(document, str):
+            document = json.loads(document)
+        root = document[0]["Plan"]
+        return AuditResult(name, _postgres_seq_scans(root), json.dumps(root, indent=2))
+    if dialect == "sqlite":
+        steps = [row[-1] for row in db.execute(_Explain(statement, "EXPLAIN QUERY PLAN"))]
+        scanned = [table for table in map(_sqlite_scanned_table, steps) if table]
+        return AuditResult(name, scanned, "\n".join(steps))
+    raise RuntimeError(f"Index audit does not support the {dialect} dialect")
+
+
+def audit(db: Session, days: int = 31, planner_costs: bool = False) -> list[AuditResult]:
+    end = datetime.now()
+    start = end - timedelta(days=days)
+    if db.get_bind().dialect.name == "postgresql" and not planner_costs:
+        db.execute(text("SET LOCAL enable_seqscan = off"))
+    try:
+        return [explain(db, name, statement) for name, statement in report_queries(start, end).items()]
+    finally:
+        db.rollback()
+
+
+def main() -> None:
+    from app.database.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="EXPLAIN the report queries and flag full table scans")
+    parser.add_argument("--days", type=int, default=31, help="Length of the audited date range")
+    parser.add_argument(
+        "--planner-costs",
+        action="store_true",
+        help="PostgreSQL: keep sequential scans enabled and show the plans the planner would choose",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Print every plan, not only the flagged ones")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        results = audit(db, args.days, args.planner_costs)
+
+    for result in results:
+        status = "ok" if result.ok else f"SEQ SCAN on {', '.join(result.scanned_tables)}"
+        print(f"{result.name:<40} {status}")
+        if args.verbose or not result.ok:
+            print("    " + result.plan.replace("\n", "\n    "))
+    flagged = [result for result in results if not result.ok]
+    print(f"{len(results) - len(flagged)}/{len(results)} report queries use an index")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,115 @@
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+
+from sqlalchemy import create_engine, event, exc as sa_exc
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from app.core.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Process-wide counters for connection checkout wait and hold time."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_timeouts = 0
+            self.slow_checkouts = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.checkins = 0
+            self.hold_total_ms = 0.0
+            self.hold_max_ms = 0.0
+
+    def record_checkout(self, wait_ms: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            if wait_ms >= settings.db_slow_checkout_ms:
+                self.slow_checkouts += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def record_checkin(self, hold_ms: float) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.hold_total_ms += hold_ms
+            self.hold_max_ms = max(self.hold_max_ms, hold_ms)
+
+    def snapshot(self) -> dict[str, float | int]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "slow_checkouts": self.slow_checkouts,
+                "wait_avg_ms": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "checkins": self.checkins,
+                "hold_avg_ms": round(self.hold_total_ms / self.checkins, 3) if self.checkins else 0.0,
+                "hold_max_ms": round(self.hold_max_ms, 3),
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool recording how long each checkout waited for a free connection.
+
+    The wait is timed here, when a session first needs a connection, so requests answered
+    from in-process caches never touch the pool.
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except sa_exc.TimeoutError:
+            pool_stats.record_timeout()
+            logger.error("DB pool exhausted: %s", get_pool_status())
+            raise
+        wait_ms = (time.perf_counter() - started) * 1000
+        pool_stats.record_checkout(wait_ms)
+        if wait_ms >= settings.db_slow_checkout_ms:
+            logger.warning("Slow DB connection checkout: %.1f ms (%s)", wait_ms, get_pool_status())
+        return connection
+
+
+pool_stats = PoolStats()
 
 
 def create_sync_engine(url: str) -> Engine:
     connect_args = {}
+    pool_options: dict[str, object] = {}
     if url.startswith("sqlite"):
         connect_args["check_same_thread"] = False
-    elif url.startswith("postgresql"):
-        connect_args["connect_timeout"] = 5
+    else:
+        if url.startswith("postgresql"):
+            connect_args["connect_timeout"] = 5
+        pool_options = {
+            "poolclass": TimedQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+        }
     return create_engine(
         url,
         echo=bool(settings.debug),
         future=True,
-        pool_pre_ping=True,
+        pool_pre_ping=settings.db_pool_pre_ping,
         connect_args=connect_args,
+        **pool_options,
     )
 
 
@@ -26,7 +117,35 @@ engine = create_sync_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@event.listens_for(engine, "checkout")
+def _stamp_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+
+@event.listens_for(engine, "checkin")
+def _record_checkin(dbapi_connection, connection_record) -> None:
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        pool_stats.record_checkin((time.perf_counter() - checked_out_at) * 1000)
+
+
+def get_pool_status() -> dict[str, object]:
+    pool = engine.pool
+    status: dict[str, object] = {"pool_class": type(pool).__name__}
+    # QueuePool exposes live counters; SQLite's pools do not.
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    status["max_overflow"] = getattr(pool, "_max_overflow", None)
+    status["timeout"] = getattr(pool, "_timeout", None)
+    status["pre_ping"] = bool(getattr(pool, "_pre_ping", False))
+    status.update(pool_stats.snapshot())
+    return status
+
+
 def get_db() -> Session:
+    # The session checks a connection out only when it first runs a statement.
     db = SessionLocal()
     try:
         yield db
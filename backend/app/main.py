@@ -4,9 +4,11 @@ import time
 from contextlib import asynccontextmanager
 from pprint import pformat
 
+import anyio.to_thread
+
 from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.staticfiles import StaticFiles
 from starlette.requests import Request
 from app.api import (
@@ -31,11 +33,19 @@ from app.api import (
     routes_production,
     routes_workshop,
 )
-from app.auth.security import reject_manager, reject_production_manager
+from app.auth.security import (
+    reject_manager,
+    reject_production_manager,
+    require_admin,
+    require_metrics_access,
+)
 from app.bootstrap import bootstrap
 from app.core.config import get_settings
 from app.core.errors import register_error_handlers
 from app.database.base import Base
+from app.core import metrics
+from app.database.session import SessionLocal, engine, get_pool_status
+from app.services.catalog import warm_caches
 
 import app.models  # noqa: F401 - ensure models are imported for metadata
 
@@ -83,14 +93,32 @@ def log_registered_routes(application: FastAPI) -> None:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     log_startup_configuration()
+    # Route handlers are plain ``def`` functions using the sync Session, so FastAPI
+    # dispatches them to this pool; size it explicitly instead of AnyIO's default of 40.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_max_workers
+    logger.info("Threadpool size for sync handlers: %s", settings.threadpool_max_workers)
+    pool_capacity = settings.db_pool_size + settings.db_max_overflow
+    if engine.dialect.name != "sqlite" and settings.threadpool_max_workers > pool_capacity:
+        logger.warning(
+            "THREADPOOL_MAX_WORKERS=%s exceeds DB_POOL_SIZE + DB_MAX_OVERFLOW=%s; "
+            "busy handlers will wait up to DB_POOL_TIMEOUT for a connection",
+            settings.threadpool_max_workers,
+            pool_capacity,
+        )
     logger.info("Application startup: running bootstrap")
     startup_start = time.perf_counter()
     try:
-        bootstrap(settings)
+        # Bootstrap is blocking (migrations, admin password check); keep it off the event loop.
+        await anyio.to_thread.run_sync(bootstrap, settings)
     except Exception:
         logger.exception(
             "Application bootstrap failed; API will continue to start regardless of bootstrap errors"
         )
+    try:
+        with SessionLocal() as db:
+            warm_caches(db)
+    except Exception:
+        logger.exception("Warming in-process caches failed; they will be filled on first use")
     logger.info("Application startup complete. elapsed=%.2fs", time.perf_counter() - startup_start)
     yield
     logger.info("Application shutdown complete")
@@ -120,32 +148,80 @@ app.add_middleware(
 )
 
 register_error_handlers(app)
+metrics.instrument_engine(engine)
+
+
+def _collect_pool_metrics() -> None:
+    for name, value in get_pool_status().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics.db_pool.set(name, value=value)
+
+
+metrics.registry.add_collector(_collect_pool_metrics)
+
+
+def _route_label(request: Request) -> str:
+    # Templated path of the matched route; keeps label cardinality bounded.
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _record_request_metrics(method: str, route: str, status_code: int, elapsed: float, sql_stats, response=None) -> None:
+    metrics.http_requests.inc(method, route, str(status_code))
+    metrics.http_request_duration.observe(method, route, value=elapsed)
+    metrics.sql_queries_per_request.observe(method, route, value=sql_stats.queries)
+    metrics.sql_seconds_per_request.observe(method, route, value=sql_stats.seconds)
+    content_length = response.headers.get("content-length") if response is not None else None
+    if content_length is not None:
+        metrics.http_response_size.observe(method, route, value=int(content_length))
+    if sql_stats.queries > settings.sql_query_warn_threshold:
+        metrics.query_heavy_requests.inc(method, route)
+        logger.warning(
+            "Query-heavy request | method=%s route=%s sql_queries=%s sql_ms=%.2f threshold=%s",
+            method,
+            route,
+            sql_stats.queries,
+            sql_stats.seconds * 1000,
+            settings.sql_query_warn_threshold,
+        )
 
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start = time.perf_counter()
-    route_path = getattr(request.scope.get("route"), "path", request.url.path)
+    method = request.method
+    metrics.http_in_flight.inc(method)
+    sql_stats, sql_token = metrics.start_request_sql_tracking()
     try:
         response = await call_next(request)
     except Exception:
-        elapsed_ms = (time.perf_counter() - start) * 1000
+        elapsed = time.perf_counter() - start
+        route_path = _route_label(request)
+        _record_request_metrics(method, route_path, 500, elapsed, sql_stats)
         logger.exception(
-            "Request failed | method=%s path=%s elapsed_ms=%.2f",
-            request.method,
+            "Request failed | method=%s path=%s elapsed_ms=%.2f sql_queries=%s",
+            method,
             route_path,
-            elapsed_ms,
+            elapsed * 1000,
+            sql_stats.queries,
         )
         raise
-    elapsed_ms = (time.perf_counter() - start) * 1000
+    finally:
+        metrics.http_in_flight.dec(method)
+        metrics.stop_request_sql_tracking(sql_token)
+    elapsed = time.perf_counter() - start
+    route_path = _route_label(request)
     status_code = getattr(response, "status_code", 500)
+    _record_request_metrics(method, route_path, status_code, elapsed, sql_stats, response)
     log_method = logger.info if status_code < 400 else logger.warning if status_code < 500 else logger.error
     log_method(
-        "Request completed | method=%s path=%s status=%s elapsed_ms=%.2f",
-        request.method,
+        "Request completed | method=%s path=%s status=%s elapsed_ms=%.2f sql_queries=%s sql_ms=%.2f",
+        method,
         route_path,
         status_code,
-        elapsed_ms,
+        elapsed * 1000,
+        sql_stats.queries,
+        sql_stats.seconds * 1000,
     )
     return response
 
@@ -223,6 +299,29 @@ else:
     logger.warning("Frontend assets directory not found at %s; assets mount skipped", assets_dir)
 
 
+# Declared before the SPA catch-all, which would otherwise shadow them.
+@app.get("/api/health", tags=["system"])
+def api_healthcheck() -> dict[str, str]:
+    return {"status": "ok"}
+
+
+@app.get("/api/health/db", tags=["system"], dependencies=[Depends(require_admin)])
+def db_pool_healthcheck() -> dict[str, object]:
+    return {"status": "ok", "pool": get_pool_status()}
+
+
+@app.get("/api/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_access)])
+def prometheus_metrics() -> Response:
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not found")
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/health", tags=["system"])
+def healthcheck() -> dict[str, str]:
+    return {"status": "ok"}
+
+
 @app.get("/{full_path:path}", include_in_schema=False)
 async def serve_spa(full_path: str):
     protected_prefixes = ("api", "static", "assets", "docs", "redoc", "openapi.json")
@@ -236,13 +335,3 @@ async def serve_spa(full_path: str):
         "SPA fallback attempted but frontend build is missing | path=%s index=%s", full_path, frontend_index
     )
     raise HTTPException(status_code=503, detail="Frontend build not found; run npm run build")
-
-
-@app.get("/api/health", tags=["system"])
-def api_healthcheck() -> dict[str, str]:
-    return {"status": "ok"}
-
-
-@app.get("/health", tags=["system"])
-def healthcheck() -> dict[str, str]:
-    return {"status": "ok"}
@@ -1,11 +1,15 @@
 from .entities import (
     Branch,
+    CatalogVersion,
     Category,
     Counterparty,
     CounterpartySale,
     CounterpartySaleItem,
     Client,
+    ClosedPeriod,
+    DailySalesRollup,
     Debt,
+    DebtLedgerEntry,
     DebtPayment,
     Income,
     IncomeItem,
@@ -16,7 +20,9 @@ from .entities import (
     ProductionOrder,
     ProductionOrderMaterial,
     ProductionOrderPayment,
+    PeriodSnapshot,
     Product,
+    ReportResult,
     Return,
     Sale,
     SaleItem,
@@ -32,16 +38,20 @@ from .entities import (
     WorkshopOrderTemplate,
     WorkshopOrderTemplateItem,
 )
-from .user import User
+from .user import RefreshToken, RevokedAccessToken, User
 
 __all__ = [
     "Branch",
+    "CatalogVersion",
     "Category",
     "Counterparty",
     "CounterpartySale",
     "CounterpartySaleItem",
     "Client",
+    "ClosedPeriod",
+    "DailySalesRollup",
     "Debt",
+    "DebtLedgerEntry",
     "DebtPayment",
     "Income",
     "IncomeItem",
@@ -52,7 +62,11 @@ __all__ = [
     "ProductionOrder",
     "ProductionOrderMaterial",
     "ProductionOrderPayment",
+    "PeriodSnapshot",
     "Product",
+    "RefreshToken",
+    "ReportResult",
+    "RevokedAccessToken",
     "Return",
     "Sale",
     "SaleItem",
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional, TYPE_CHECKING
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
+    Date,
     DateTime,
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    JSON,
     Numeric,
     String,
     Text,
@@ -142,6 +146,7 @@ class MovementItem(Base):
 
 class Income(Base, TimestampMixin):
     __tablename__ = "income"
+    __table_args__ = (Index("ix_income_branch_id_created_at", "branch_id", "created_at"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     branch_id: Mapped[int] = mapped_column(
@@ -161,6 +166,7 @@ class Income(Base, TimestampMixin):
 
 class Expense(Base, TimestampMixin):
     __tablename__ = "expenses"
+    __table_args__ = (Index("ix_expenses_created_at_branch_id", "created_at", "branch_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -174,6 +180,10 @@ class Expense(Base, TimestampMixin):
 
 class SalaryPayment(Base):
     __tablename__ = "salary_payments"
+    __table_args__ = (
+        Index("ix_salary_payments_created_at", "created_at"),
+        Index("ix_salary_payments_employee_id_created_at", "employee_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     employee_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -254,6 +264,7 @@ class ProductionExpense(Base, TimestampMixin):
 
 class IncomeItem(Base):
     __tablename__ = "income_items"
+    __table_args__ = (Index("ix_income_items_income_id", "income_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     income_id: Mapped[int] = mapped_column(ForeignKey("income.id", ondelete="CASCADE"))
@@ -271,7 +282,9 @@ class Client(Base, TimestampMixin):
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(255))
     phone: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
-    total_debt: Mapped[float] = mapped_column(Float, default=0)
+    total_debt: Mapped[Decimal] = mapped_column(
+        Numeric(12, 2), nullable=False, default=Decimal("0"), server_default=text("0")
+    )
 
     debts: Mapped[List[Debt]] = relationship(back_populates="client")
     sales: Mapped[List[Sale]] = relationship(back_populates="client")
@@ -332,6 +345,11 @@ class CounterpartySaleItem(Base):
 
 class Sale(Base, TimestampMixin):
     __tablename__ = "sales"
+    __table_args__ = (
+        Index("ix_sales_created_at_branch_id", "created_at", "branch_id"),
+        Index("ix_sales_seller_id_created_at", "seller_id", "created_at"),
+        Index("ix_sales_client_id_created_at", "client_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     branch_id: Mapped[int] = mapped_column(ForeignKey("branches.id"))
@@ -356,6 +374,7 @@ class Sale(Base, TimestampMixin):
 
 class SaleItem(Base):
     __tablename__ = "sales_items"
+    __table_args__ = (Index("ix_sales_items_sale_id", "sale_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     sale_id: Mapped[int] = mapped_column(ForeignKey("sales.id", ondelete="CASCADE"))
@@ -364,6 +383,7 @@ class SaleItem(Base):
     price: Mapped[float] = mapped_column(Float)
     discount: Mapped[float] = mapped_column(Float, default=0)
     total: Mapped[float] = mapped_column(Float, default=0)
+    returned_quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text("0"))
 
     sale: Mapped[Sale] = relationship(back_populates="items")
     product: Mapped[Product] = relationship()
@@ -371,18 +391,26 @@ class SaleItem(Base):
 
 class Debt(Base, TimestampMixin):
     __tablename__ = "debts"
+    __table_args__ = (
+        Index("ix_debts_client_id_created_at", "client_id", "created_at"),
+        Index("ix_debts_sale_id", "sale_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"))
     sale_id: Mapped[int] = mapped_column(ForeignKey("sales.id"))
-    amount: Mapped[float] = mapped_column(Float)
-    paid: Mapped[float] = mapped_column(Float, default=0)
+    amount: Mapped[Decimal] = mapped_column(Numeric(12, 2))
+    paid: Mapped[Decimal] = mapped_column(Numeric(12, 2), default=Decimal("0"), server_default=text("0"))
 
     client: Mapped[Client] = relationship(back_populates="debts")
 
 
 class Return(Base, TimestampMixin):
     __tablename__ = "returns"
+    __table_args__ = (
+        Index("ix_returns_created_at_branch_id", "created_at", "branch_id"),
+        Index("ix_returns_sale_id", "sale_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     sale_id: Mapped[int] = mapped_column(ForeignKey("sales.id", ondelete="CASCADE"))
@@ -393,6 +421,11 @@ class Return(Base, TimestampMixin):
     debt_offset_amount: Mapped[Optional[Decimal]] = mapped_column(
         Numeric(12, 2), nullable=True
     )
+    # Refund split by the sale's payment channels, fixed when the return is created.
+    refund_total: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    refund_cash: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    refund_card: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    refund_debt: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
     created_by_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
 
     sale: Mapped[Sale] = relationship(back_populates="returns")
@@ -405,6 +438,10 @@ class Return(Base, TimestampMixin):
 
 class ReturnItem(Base):
     __tablename__ = "return_items"
+    __table_args__ = (
+        Index("ix_return_items_return_id", "return_id"),
+        Index("ix_return_items_sale_item_id", "sale_item_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     return_id: Mapped[int] = mapped_column(ForeignKey("returns.id", ondelete="CASCADE"))
@@ -418,6 +455,10 @@ class ReturnItem(Base):
 
 class DebtPayment(Base, TimestampMixin):
     __tablename__ = "debt_payments"
+    __table_args__ = (
+        Index("ix_debt_payments_created_at_branch_id", "created_at", "branch_id"),
+        Index("ix_debt_payments_client_id_created_at", "client_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id", ondelete="CASCADE"))
@@ -441,6 +482,135 @@ class DebtPayment(Base, TimestampMixin):
     branch: Mapped[Optional[Branch]] = relationship("Branch")
 
 
+class DebtLedgerEntry(Base):
+    """Append-only history of every change to ``Client.total_debt``.
+
+    ``amount`` is signed (positive raises the debt) and ``balance_after`` is the client's
+    balance once the entry was applied, so ``total_debt`` always equals the sum of the
+    client's entries; ``app.services.debt_ledger`` is the only writer.
+    """
+
+    __tablename__ = "debt_ledger"
+    __table_args__ = (Index("ix_debt_ledger_client_id_id", "client_id", "id"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    client_id: Mapped[int] = mapped_column(ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    entry_type: Mapped[str] = mapped_column(String(30), nullable=False)
+    amount: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+    balance_after: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+    sale_id: Mapped[Optional[int]] = mapped_column(ForeignKey("sales.id", ondelete="SET NULL"), nullable=True)
+    debt_payment_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("debt_payments.id", ondelete="SET NULL"), nullable=True
+    )
+    return_id: Mapped[Optional[int]] = mapped_column(ForeignKey("returns.id", ondelete="SET NULL"), nullable=True)
+    created_by_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class DailySalesRollup(Base):
+    """Per-day, per-branch, per-seller totals maintained alongside sales, returns and debt payments.
+
+    ``branch_id``/``seller_id`` are plain integers (0 when the source row has none) so that
+    they can take part in the primary key; the table carries no foreign keys on purpose.
+    """
+
+    __tablename__ = "daily_sales_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    branch_id: Mapped[int] = mapped_column(Integer, primary_key=True, default=0)
+    seller_id: Mapped[int] = mapped_column(Integer, primary_key=True, default=0)
+    sales_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text("0"))
+    sales_total: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    sales_cash: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    sales_card: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    sales_debt: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    debts_created: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    refunds_total: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    refunds_cash: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    refunds_card: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    refunds_debt: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    sales_cogs: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    returns_cogs: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    debt_payments_cash: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    debt_payments_card: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    debt_payments_total: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0"), server_default=text("0"))
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class CatalogVersion(Base):
+    """Single-row counter shared by every process serving the cashier catalogue.
+
+    Bumped in each transaction that writes products, categories, stock or branches
+    (``products_version`` only when more than stock moved), so workers can tell that their
+    in-process catalogue snapshot and barcode index are out of date.
+    """
+
+    __tablename__ = "catalog_version"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default=text("0"))
+    products_version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default=text("0"))
+
+
+class ReportResult(Base):
+    """A computed report, or a job computing one, keyed by type, parameters and data version.
+
+    ``params_key`` is a hash of the normalized parameters and ``data_version`` a hash of the
+    report's source rows (see ``app.services.reports``), so a stored result stays valid
+    exactly as long as nothing it was computed from has changed.
+    """
+
+    __tablename__ = "report_results"
+    __table_args__ = (
+        UniqueConstraint("report_type", "params_key", "data_version", name="uq_report_results_key_version"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    report_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    params_key: Mapped[str] = mapped_column(String(64), nullable=False)
+    params: Mapped[dict] = mapped_column(JSON, nullable=False)
+    data_version: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
+    result: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    requested_by_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class ClosedPeriod(Base):
+    """A closed accounting month; its reports are served from ``PeriodSnapshot`` rows."""
+
+    __tablename__ = "closed_periods"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    month: Mapped[str] = mapped_column(String(7), nullable=False, unique=True)
+    closed_by_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    closed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    snapshots: Mapped[List["PeriodSnapshot"]] = relationship(
+        back_populates="period", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+class PeriodSnapshot(Base):
+    """A report of a closed month frozen at close time (see ``app.services.period_close``)."""
+
+    __tablename__ = "period_snapshots"
+    __table_args__ = (UniqueConstraint("month", "report_type", name="uq_period_snapshots_month_report"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    period_id: Mapped[int] = mapped_column(ForeignKey("closed_periods.id", ondelete="CASCADE"), nullable=False)
+    month: Mapped[str] = mapped_column(String(7), nullable=False)
+    report_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    result: Mapped[dict | list] = mapped_column(JSON, nullable=False)
+
+    period: Mapped[ClosedPeriod] = relationship(back_populates="snapshots")
+
+
 class Log(Base):
     __tablename__ = "logs"
 
@@ -487,6 +657,7 @@ class WorkshopCustomer(Base, TimestampMixin):
 
 class WorkshopOrder(Base, TimestampMixin):
     __tablename__ = "workshop_orders"
+    __table_args__ = (Index("ix_workshop_orders_branch_id_created_at", "branch_id", "created_at"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
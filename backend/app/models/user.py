@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, ForeignKey, UniqueConstraint, func, text
 from sqlalchemy.orm import relationship
 
 from app.core.enums import UserRole
@@ -21,6 +21,8 @@ class User(Base):
         nullable=False,
     )
     active = Column(Boolean, default=True)
+    # Embedded in issued tokens as "ver"; bumping it invalidates every token the user holds.
+    token_version = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True)
 
@@ -80,3 +82,31 @@ class User(Base):
         back_populates="created_by",
         cascade="all, delete-orphan",
     )
+
+
+class RefreshToken(Base):
+    """Server-side record of an issued refresh token; each refresh rotates it."""
+
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (UniqueConstraint("jti", name="uq_refresh_tokens_jti"),)
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String(64), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    replaced_by = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class RevokedAccessToken(Base):
+    """An access token revoked by logout, kept until it would have expired anyway.
+
+    Every worker mirrors the unexpired rows in memory (``app.auth.revocation``).
+    """
+
+    __tablename__ = "revoked_access_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now())
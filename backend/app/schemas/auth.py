@@ -15,6 +15,9 @@ class TokenPayload(BaseModel):
     user_id: int
     role: str
     branch_id: int | None = None
+    ver: int = 0
+    jti: Optional[str] = None
+    typ: Optional[str] = None
     exp: int
 
 
@@ -27,6 +30,10 @@ class RefreshRequest(BaseModel):
     refresh_token: str
 
 
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+
 class AuthUser(BaseModel):
     id: int
     login: str
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -17,3 +17,10 @@ class CashierProduct(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class CashierCatalogDelta(BaseModel):
+    version: int
+    full: bool
+    items: List[CashierProduct]
+    removed: List[int] = []
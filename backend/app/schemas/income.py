@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class IncomeItemBase(BaseModel):
@@ -33,6 +33,35 @@ class Income(IncomeBase):
     created_at: datetime
     updated_at: datetime
     items: List[IncomeItem]
+    item_count: int = 0
+    purchase_total: float = 0
+    sale_total: float = 0
 
     class Config:
         from_attributes = True
+
+
+class IncomeImportItem(BaseModel):
+    """One receipt line; the product is found by ``product_id`` or else by ``barcode``."""
+
+    product_id: Optional[int] = None
+    barcode: Optional[str] = None
+    name: Optional[str] = None
+    unit: Optional[str] = None
+    quantity: int = Field(gt=0)
+    purchase_price: float = Field(ge=0)
+    sale_price: float = Field(ge=0)
+
+
+class IncomeImport(BaseModel):
+    branch_id: Optional[int] = None
+    create_missing: bool = False
+    category_id: Optional[int] = None
+    items: List[IncomeImportItem] = Field(min_length=1)
+
+
+class IncomeImportResult(BaseModel):
+    income: Income
+    lines: int
+    products: int
+    created_products: int
@@ -18,3 +18,14 @@ class PosProduct(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class PosBarcodeProduct(BaseModel):
+    id: int
+    name: str
+    barcode: str
+    sale_price: float
+    red_price: Optional[float] = None
+    unit: Optional[str] = None
+    branch_id: int
+    quantity: float
@@ -68,7 +68,7 @@ class PaymentOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
-class ProductionOrderOut(BaseModel):
+class ProductionOrderSummary(BaseModel):
     id: int
     title: str
     amount: Decimal
@@ -78,6 +78,11 @@ class ProductionOrderOut(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime]
     branch_id: Optional[int]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductionOrderOut(ProductionOrderSummary):
     materials: list[MaterialOut] = []
     payments: list[PaymentOut] = []
 
@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import List
+from typing import Any, List, Optional
 
 from pydantic import BaseModel
 
@@ -96,3 +96,33 @@ class CounterpartyProfitReportResponse(BaseModel):
     revenue: float
     cost: float
     profit: float
+
+
+class ReportJobCreate(BaseModel):
+    report_type: str
+    params: dict[str, Any] = {}
+
+
+class ReportJob(BaseModel):
+    id: int
+    report_type: str
+    params: dict[str, Any]
+    status: str
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ClosedPeriod(BaseModel):
+    id: int
+    month: str
+    closed_by_id: Optional[int] = None
+    closed_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -26,6 +26,7 @@ class SaleItem(SaleItemBase):
 class SaleItemDetail(SaleItem):
     product_name: Optional[str] = None
     product_unit: Optional[str] = None
+    returned_quantity: int = 0
 
 
 class SaleBase(BaseModel):
@@ -0,0 +1,504 @@
+"""In-process snapshot of the cashier catalogue.
+
+Every till loads the whole catalogue on start and on refresh. Instead of re-running the
+product/stock/category join for each poll, the catalogue is built once per *version* and
+served from memory. The version is the shared ``catalog_version`` row, bumped inside every
+transaction that writes to products, categories, stock or branches, so the snapshot is
+rebuilt at most once per change no matter how many tills are polling. Each process
+re-reads the row at most every ``CATALOG_VERSION_CHECK_SECONDS`` to pick up writes made
+by other workers and CLIs, and rebuilds anything older than ``CATALOG_MAX_AGE_SECONDS`` to
+bound staleness after out-of-band SQL.
+
+The same change tracking keeps ``barcode_index`` (barcode -> product, plus per-branch stock)
+current for the POS scan endpoint: product and branch writes drop the whole map, while
+stock writes only drop the ``(branch_id, product_id)`` quantities they touched.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from itertools import chain
+from typing import Iterable
+
+from pydantic import TypeAdapter
+from sqlalchemy import case, event, inspect, select
+from sqlalchemy.orm import ORMExecuteState, Session, joinedload
+from sqlalchemy.orm.attributes import get_history
+
+from app.core.config import get_settings
+from app.database.dialects import supports_upsert_returning, upsert_insert
+from app.models.entities import Branch, CatalogVersion, Category, Product, Stock
+from app.schemas.cashier import CashierProduct
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+TRACKED_TABLES = frozenset({"products", "categories", "stock", "branches"})
+_TRACKED_MODELS = (Product, Category, Stock, Branch)
+_DIRTY_KEY = "catalog_dirty"
+_PRODUCTS_DIRTY_KEY = "catalog_products_dirty"
+_STOCK_KEYS_KEY = "catalog_stock_keys"
+_STOCK_ALL_KEY = "catalog_stock_all"
+_SHARED_VERSION_KEY = "catalog_shared_version"
+_VERSION_ROW_ID = 1
+
+# Execution options for writes that describe themselves, so the trackers can avoid
+# dropping the whole barcode map: ``STOCK_KEYS_OPTION`` lists the ``(branch_id,
+# product_id)`` pairs a stock statement changes, and ``COUNTERS_ONLY_OPTION`` marks a
+# products statement that only moves ``Product.quantity``.
+STOCK_KEYS_OPTION = "catalog_stock_keys"
+COUNTERS_ONLY_OPTION = "catalog_counters_only"
+_PRODUCT_COUNTER_FIELDS = frozenset({"quantity", "updated_at"})
+
+_items_adapter = TypeAdapter(list[CashierProduct])
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    branch_id: int
+    items: list[CashierProduct]
+    body: bytes
+
+    @property
+    def etag(self) -> str:
+        return f'W/"catalog-{self.version}"'
+
+
+@dataclass(frozen=True)
+class CatalogChanges:
+    version: int
+    full: bool
+    items: list[CashierProduct]
+    removed: list[int]
+
+
+def load_catalog_items(db: Session, branch_id: int) -> list[CashierProduct]:
+    query = (
+        select(Product, Stock)
+        .join(Stock, (Stock.product_id == Product.id) & (Stock.branch_id == branch_id), isouter=True)
+        .options(joinedload(Product.category))
+        .order_by(
+            case((Product.rating.is_(None) | (Product.rating == 0), 0), else_=1),
+            Product.rating.asc(),
+            Product.name.asc(),
+        )
+    )
+    items: list[CashierProduct] = []
+    for product, stock in db.execute(query).all():
+        items.append(
+            CashierProduct(
+                id=product.id,
+                name=product.name,
+                barcode=product.barcode,
+                sale_price=product.sale_price or 0,
+                red_price=float(product.red_price) if product.red_price is not None else None,
+                unit=product.unit,
+                image_url=product.image_url,
+                photo=product.photo,
+                available_qty=stock.quantity if stock else 0,
+                category=product.category.name if product.category else None,
+                rating=product.rating or 0,
+            )
+        )
+    return items
+
+
+def read_shared_version(db: Session) -> tuple[int, int]:
+    row = db.execute(
+        select(CatalogVersion.version, CatalogVersion.products_version).where(CatalogVersion.id == _VERSION_ROW_ID)
+    ).first()
+    return (int(row[0]), int(row[1])) if row else (0, 0)
+
+
+def bump_shared_version(db: Session, products: bool) -> tuple[int, int]:
+    """Increment the shared version in the caller's transaction and return the new values."""
+    table = CatalogVersion.__table__
+    products_step = 1 if products else 0
+    stmt = upsert_insert(db, table).values(id=_VERSION_ROW_ID, version=1, products_version=products_step)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={"version": table.c.version + 1, "products_version": table.c.products_version + products_step},
+    )
+    if supports_upsert_returning(db):
+        row = db.execute(stmt.returning(table.c.version, table.c.products_version)).one()
+        return int(row[0]), int(row[1])
+    db.execute(stmt)
+    return read_shared_version(db)
+
+
+class CatalogVersionWatcher:
+    """This process's view of the shared ``catalog_version`` row."""
+
+    def __init__(self, check_seconds: float) -> None:
+        self._lock = threading.Lock()
+        self._check_seconds = check_seconds
+        self._next_check = 0.0
+        self._version: int | None = None
+        self._products_version: int | None = None
+
+    def check(self, db: Session) -> None:
+        """Pick up versions committed by other processes, at most once per check interval."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_check:
+                return
+            self._next_check = now + self._check_seconds
+        self.advance(*read_shared_version(db))
+
+    def advance(self, version: int, products_version: int, own_products: int | None = None) -> None:
+        """Move to ``version``; whatever this process did not write itself invalidates broadly.
+
+        ``own_products`` is set for a local commit (``1`` if it bumped ``products_version``),
+        whose exact changes the caller invalidates itself.
+        """
+        own_steps = 0 if own_products is None else 1
+        with self._lock:
+            if self._version is not None and version <= self._version:
+                return
+            foreign = self._version is None or version - self._version > own_steps
+            foreign_products = (
+                self._products_version is None or products_version - self._products_version > (own_products or 0)
+            )
+            self._version, self._products_version = version, products_version
+        catalog_cache.set_version(version)
+        if foreign:
+            barcode_index.invalidate(products=foreign_products, stock_all=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._next_check = 0.0
+
+
+class CatalogCache:
+    def __init__(self, max_age_seconds: float) -> None:
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._max_age = max_age_seconds
+        self._version = 0
+        self._built_at = 0.0
+        self._snapshot: CatalogSnapshot | None = None
+        self._baseline: int | None = None
+        self._changed: dict[int, int] = {}
+        self._removed: dict[int, int] = {}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def set_version(self, version: int) -> None:
+        with self._lock:
+            if version > self._version:
+                self._version = version
+
+    def _is_current(self, snapshot: CatalogSnapshot | None, branch_id: int) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.version == self._version
+            and snapshot.branch_id == branch_id
+            and time.monotonic() - self._built_at < self._max_age
+        )
+
+    def snapshot(self, db: Session, branch_id: int) -> CatalogSnapshot:
+        version_watcher.check(db)
+        snapshot = self._snapshot
+        if self._is_current(snapshot, branch_id):
+            return snapshot
+        with self._build_lock:
+            snapshot = self._snapshot
+            if self._is_current(snapshot, branch_id):
+                return snapshot
+            # Read the version before querying: a commit landing mid-build leaves the
+            # snapshot one version behind and the next request rebuilds it.
+            version = self._version
+            started = time.perf_counter()
+            items = load_catalog_items(db, branch_id)
+            if (
+                snapshot is not None
+                and snapshot.branch_id == branch_id
+                and snapshot.version == version
+                and snapshot.items != items
+            ):
+                # Changed behind the version counter (manual SQL): give the new content its own
+                # version so no process answers 304 for it under the old ETag.
+                version = _bump_out_of_band(db)
+            snapshot = CatalogSnapshot(
+                version=version,
+                branch_id=branch_id,
+                items=items,
+                body=_items_adapter.dump_json(items),
+            )
+            self._publish(snapshot)
+            self._built_at = time.monotonic()
+            logger.info(
+                "Cashier catalogue rebuilt: version=%s products=%s in %.1f ms",
+                version,
+                len(items),
+                (time.perf_counter() - started) * 1000,
+            )
+            return snapshot
+
+    def _publish(self, snapshot: CatalogSnapshot) -> None:
+        with self._lock:
+            previous = self._snapshot
+            if previous is None or previous.branch_id != snapshot.branch_id:
+                self._baseline = snapshot.version
+                self._changed = {item.id: snapshot.version for item in snapshot.items}
+                self._removed = {}
+            else:
+                before = {item.id: item for item in previous.items}
+                for item in snapshot.items:
+                    if before.pop(item.id, None) != item:
+                        self._changed[item.id] = snapshot.version
+                        self._removed.pop(item.id, None)
+                for product_id in before:
+                    self._changed.pop(product_id, None)
+                    self._removed[product_id] = snapshot.version
+            self._snapshot = snapshot
+
+    def changes_since(self, snapshot: CatalogSnapshot, since: int) -> CatalogChanges:
+        """Products that changed after version ``since``; a full list if ``since`` is unknown."""
+        with self._lock:
+            if (
+                self._snapshot is not snapshot
+                or self._baseline is None
+                or since < self._baseline
+                or since > snapshot.version
+            ):
+                return CatalogChanges(version=snapshot.version, full=True, items=snapshot.items, removed=[])
+            items = [item for item in snapshot.items if self._changed.get(item.id, 0) > since]
+            removed = sorted(product_id for product_id, version in self._removed.items() if version > since)
+        return CatalogChanges(version=snapshot.version, full=False, items=items, removed=removed)
+
+
+catalog_cache = CatalogCache(settings.catalog_max_age_seconds)
+version_watcher = CatalogVersionWatcher(settings.catalog_version_check_seconds)
+
+
+def _bump_out_of_band(db: Session) -> int:
+    with Session(bind=db.get_bind()) as session:
+        version, products_version = bump_shared_version(session, products=True)
+        session.commit()
+    version_watcher.advance(version, products_version)
+    return version
+
+
+@dataclass(frozen=True)
+class BarcodeEntry:
+    id: int
+    name: str
+    barcode: str
+    sale_price: float
+    red_price: float | None
+    unit: str | None
+
+
+def _barcode_entry(product: Product) -> BarcodeEntry:
+    return BarcodeEntry(
+        id=product.id,
+        name=product.name,
+        barcode=product.barcode,
+        sale_price=product.sale_price or 0,
+        red_price=float(product.red_price) if product.red_price is not None else None,
+        unit=product.unit,
+    )
+
+
+class BarcodeIndex:
+    """Barcode -> product map plus a ``(branch_id, product_id) -> quantity`` cache."""
+
+    def __init__(self, max_age_seconds: float) -> None:
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._max_age = max_age_seconds
+        self._built_at = 0.0
+        self._entries: dict[str, BarcodeEntry] | None = None
+        self._stock: dict[tuple[int, int], Decimal] = {}
+        # Bumped on every invalidation; loads started before a bump are not cached.
+        self._generation = 0
+
+    def rebuild(self, db: Session) -> None:
+        with self._build_lock:
+            with self._lock:
+                generation = self._generation
+            started = time.perf_counter()
+            entries = {
+                product.barcode: _barcode_entry(product)
+                for product in db.execute(select(Product).where(Product.barcode.is_not(None))).scalars()
+            }
+            stock = {
+                (branch_id, product_id): Decimal(str(quantity or 0))
+                for branch_id, product_id, quantity in db.execute(
+                    select(Stock.branch_id, Stock.product_id, Stock.quantity)
+                ).all()
+            }
+            with self._lock:
+                if generation == self._generation:
+                    self._entries = entries
+                    self._stock = stock
+                    self._built_at = time.monotonic()
+                else:
+                    # Something committed while loading: keep nothing that might predate it.
+                    self._entries = None
+                    self._stock = {}
+            logger.info(
+                "Barcode index rebuilt: barcodes=%s stock_rows=%s in %.1f ms",
+                len(entries),
+                len(stock),
+                (time.perf_counter() - started) * 1000,
+            )
+
+    def lookup(self, db: Session, code: str, branch_id: int) -> tuple[BarcodeEntry, Decimal] | None:
+        version_watcher.check(db)
+        entries = self._entries
+        if entries is not None and time.monotonic() - self._built_at >= self._max_age:
+            entries = None
+        if entries is None:
+            self.rebuild(db)
+            entries = self._entries
+            if entries is None:
+                # Invalidated again mid-rebuild; serve this scan from the fresh load anyway.
+                return self._lookup_uncached(db, code, branch_id)
+        entry = entries.get(code)
+        if entry is None:
+            return None
+        key = (branch_id, entry.id)
+        quantity = self._stock.get(key)
+        if quantity is None:
+            with self._lock:
+                generation = self._generation
+            quantity = Decimal(
+                str(
+                    db.execute(
+                        select(Stock.quantity).where(Stock.branch_id == branch_id, Stock.product_id == entry.id)
+                    ).scalar_one_or_none()
+                    or 0
+                )
+            )
+            with self._lock:
+                if generation == self._generation:
+                    self._stock[key] = quantity
+        return entry, quantity
+
+    def _lookup_uncached(self, db: Session, code: str, branch_id: int) -> tuple[BarcodeEntry, Decimal] | None:
+        row = db.execute(
+            select(Product, Stock.quantity)
+            .join(Stock, (Stock.product_id == Product.id) & (Stock.branch_id == branch_id), isouter=True)
+            .where(Product.barcode == code)
+        ).first()
+        if row is None:
+            return None
+        product, quantity = row
+        return _barcode_entry(product), Decimal(str(quantity or 0))
+
+    def invalidate(
+        self,
+        *,
+        products: bool = False,
+        stock_all: bool = False,
+        stock_keys: Iterable[tuple[int, int]] = (),
+    ) -> None:
+        with self._lock:
+            self._generation += 1
+            if products:
+                self._entries = None
+            if products or stock_all:
+                self._stock = {}
+            else:
+                for key in stock_keys:
+                    self._stock.pop(key, None)
+
+
+barcode_index = BarcodeIndex(settings.catalog_max_age_seconds)
+
+
+def warm_caches(db: Session) -> None:
+    version_watcher.check(db)
+    barcode_index.rebuild(db)
+
+
+def _only_counters_changed(product: Product) -> bool:
+    for attr in inspect(product).mapper.column_attrs:
+        if attr.key not in _PRODUCT_COUNTER_FIELDS and get_history(product, attr.key).has_changes():
+            return False
+    return True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(state: ORMExecuteState) -> None:
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table_name = getattr(getattr(state.statement, "table", None), "name", None)
+    if table_name not in TRACKED_TABLES:
+        return
+    info = state.session.info
+    info[_DIRTY_KEY] = True
+    options = state.execution_options
+    if table_name == "stock":
+        stock_keys = options.get(STOCK_KEYS_OPTION)
+        if stock_keys is None:
+            info[_STOCK_ALL_KEY] = True
+        else:
+            info.setdefault(_STOCK_KEYS_KEY, set()).update(stock_keys)
+    elif table_name == "products" and options.get(COUNTERS_ONLY_OPTION):
+        return
+    elif table_name in {"products", "branches"}:
+        info[_PRODUCTS_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session: Session, flush_context) -> None:
+    info = session.info
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, _TRACKED_MODELS):
+            continue
+        info[_DIRTY_KEY] = True
+        if isinstance(obj, Stock):
+            info.setdefault(_STOCK_KEYS_KEY, set()).add((obj.branch_id, obj.product_id))
+        elif isinstance(obj, Branch) or (
+            isinstance(obj, Product) and not (obj in session.dirty and _only_counters_changed(obj))
+        ):
+            info[_PRODUCTS_DIRTY_KEY] = True
+
+
+def _pop_changes(session: Session) -> tuple[bool, bool, bool, set[tuple[int, int]]]:
+    info = session.info
+    return (
+        info.pop(_DIRTY_KEY, False),
+        info.pop(_PRODUCTS_DIRTY_KEY, False),
+        info.pop(_STOCK_ALL_KEY, False),
+        info.pop(_STOCK_KEYS_KEY, set()),
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_shared_before_commit(session: Session) -> None:
+    # Flush first so that pending ORM changes are tracked before deciding.
+    session.flush()
+    info = session.info
+    if info.get(_DIRTY_KEY):
+        info[_SHARED_VERSION_KEY] = (
+            *bump_shared_version(session, products=bool(info.get(_PRODUCTS_DIRTY_KEY))),
+            bool(info.get(_PRODUCTS_DIRTY_KEY)),
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session: Session) -> None:
+    dirty, products, stock_all, stock_keys = _pop_changes(session)
+    shared = session.info.pop(_SHARED_VERSION_KEY, None)
+    if not dirty:
+        return
+    barcode_index.invalidate(products=products, stock_all=stock_all, stock_keys=stock_keys)
+    if shared is not None:
+        version, products_version, own_products = shared
+        version_watcher.advance(version, products_version, own_products=int(own_products))
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session: Session) -> None:
+    _pop_changes(session)
+    session.info.pop(_SHARED_VERSION_KEY, None)
@@ -0,0 +1,224 @@
+"""Client debt ledger.
+
+Every change to ``Client.total_debt`` is written here as an append-only ``DebtLedgerEntry``
+in the same transaction, so the materialized balance can always be re-derived (and checked)
+from the ledger. Payments are allocated to the client's open ``Debt`` rows oldest first by
+a single UPDATE instead of a Python loop over every debt.
+
+Reconcile balances with ``python -m app.services.debt_ledger [--fix]``.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from dataclasses import dataclass
+from decimal import Decimal
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.entities import Client, Debt, DebtLedgerEntry
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0")
+
+ENTRY_OPENING = "opening"
+ENTRY_SALE = "sale"
+ENTRY_PAYMENT = "payment"
+ENTRY_RETURN_OFFSET = "return_offset"
+ENTRY_ADJUSTMENT = "adjustment"
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def lock_balance(db: Session, client_id: int) -> Decimal:
+    """Lock the client row for the rest of the transaction and return its balance."""
+    balance = db.execute(
+        select(Client.total_debt).where(Client.id == client_id).with_for_update()
+    ).scalar_one_or_none()
+    return _money(balance)
+
+
+def post_entry(
+    db: Session,
+    client_id: int,
+    amount,
+    entry_type: str,
+    *,
+    sale_id: int | None = None,
+    debt_payment_id: int | None = None,
+    return_id: int | None = None,
+    created_by_id: int | None = None,
+) -> DebtLedgerEntry:
+    """Shift the client's balance by ``amount`` and append the matching ledger entry.
+
+    The balance is changed by one ``UPDATE ... RETURNING`` under the row lock, so
+    concurrent tills cannot lose each other's updates.
+    """
+    amount = _money(amount)
+    balance = db.execute(
+        update(Client)
+        .where(Client.id == client_id)
+        .values(total_debt=func.coalesce(Client.total_debt, 0) + amount)
+        .returning(Client.total_debt)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+    balance = _money(balance)
+    loaded = db.identity_map.get(db.identity_key(Client, client_id))
+    if loaded is not None:
+        set_committed_value(loaded, "total_debt", balance)
+
+    entry = DebtLedgerEntry(
+        client_id=client_id,
+        entry_type=entry_type,
+        amount=amount,
+        balance_after=balance,
+        sale_id=sale_id,
+        debt_payment_id=debt_payment_id,
+        return_id=return_id,
+        created_by_id=created_by_id,
+    )
+    db.add(entry)
+    return entry
+
+
+def record_sale_debt(db: Session, client_id: int, sale_id: int, amount, created_by_id: int | None = None) -> Debt:
+    debt = Debt(client_id=client_id, sale_id=sale_id, amount=_money(amount), paid=ZERO)
+    db.add(debt)
+    post_entry(db, client_id, amount, ENTRY_SALE, sale_id=sale_id, created_by_id=created_by_id)
+    return debt
+
+
+def set_balance(db: Session, client_id: int, balance, entry_type: str = ENTRY_ADJUSTMENT, created_by_id=None) -> None:
+    """Record a manual correction that brings the client's balance to ``balance``."""
+    delta = _money(balance) - lock_balance(db, client_id)
+    if delta != 0:
+        post_entry(db, client_id, delta, entry_type, created_by_id=created_by_id)
+
+
+def _allocate_oldest_first(db: Session, client_id: int, amount: Decimal, *criteria) -> None:
+    outstanding = Debt.amount - func.coalesce(Debt.paid, 0)
+    open_debts = (
+        select(
+            Debt.id.label("id"),
+            outstanding.label("remaining"),
+            (func.sum(outstanding).over(order_by=(Debt.created_at, Debt.id)) - outstanding).label("before"),
+        )
+        .where(Debt.client_id == client_id, outstanding > 0, *criteria)
+        .subquery()
+    )
+    left = amount - open_debts.c.before
+    db.execute(
+        update(Debt)
+        .where(Debt.id == open_debts.c.id, open_debts.c.before < amount)
+        .values(
+            paid=func.coalesce(Debt.paid, 0)
+            + case((open_debts.c.remaining < left, open_debts.c.remaining), else_=left)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def allocate_payment(db: Session, client_id: int, amount, debt_id: int | None = None) -> None:
+    """Mark ``amount`` of the client's open debts as paid, oldest first.
+
+    With ``debt_id`` that debt is settled first and the rest goes to the oldest debts.
+    Each pass is one ``UPDATE ... FROM`` over a running-total window, whatever the
+    number of open debts. Loaded ``Debt`` objects are not refreshed.
+    """
+    amount = _money(amount)
+    if amount <= 0:
+        return
+    if debt_id is not None:
+        targeted = db.get(Debt, debt_id)
+        if targeted is not None and targeted.client_id == client_id:
+            portion = min(amount, max(_money(targeted.amount) - _money(targeted.paid), ZERO))
+            if portion > 0:
+                targeted.paid = _money(targeted.paid) + portion
+                amount -= portion
+                db.flush()
+    if amount > 0:
+        _allocate_oldest_first(db, client_id, amount)
+
+
+@dataclass
+class BalanceMismatch:
+    client_id: int
+    balance: Decimal
+    ledger_total: Decimal
+    open_debts: Decimal
+
+
+def reconcile(db: Session, fix: bool = False) -> list[BalanceMismatch]:
+    """Compare every client's balance with its ledger in one query; optionally reset drifted balances."""
+    ledger = (
+        select(DebtLedgerEntry.client_id, func.sum(DebtLedgerEntry.amount).label("total"))
+        .group_by(DebtLedgerEntry.client_id)
+        .subquery()
+    )
+    debts = (
+        select(Debt.client_id, func.sum(Debt.amount - func.coalesce(Debt.paid, 0)).label("open"))
+        .group_by(Debt.client_id)
+        .subquery()
+    )
+    ledger_total = func.coalesce(ledger.c.total, 0)
+    rows = db.execute(
+        select(Client.id, func.coalesce(Client.total_debt, 0), ledger_total, func.coalesce(debts.c.open, 0))
+        .outerjoin(ledger, ledger.c.client_id == Client.id)
+        .outerjoin(debts, debts.c.client_id == Client.id)
+        .where(func.coalesce(Client.total_debt, 0) != ledger_total)
+        .order_by(Client.id)
+    ).all()
+    mismatches = [
+        BalanceMismatch(client_id, _money(balance), _money(total), _money(open_amount))
+        for client_id, balance, total, open_amount in rows
+    ]
+    if fix and mismatches:
+        db.execute(
+            update(Client)
+            .where(Client.id.in_([mismatch.client_id for mismatch in mismatches]))
+            .values(
+                total_debt=select(func.coalesce(func.sum(DebtLedgerEntry.amount), 0))
+                .where(DebtLedgerEntry.client_id == Client.id)
+                .scalar_subquery()
+            )
+            .execution_options(synchronize_session=False)
+        )
+    return mismatches
+
+
+def main() -> None:
+    from app.database.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Check client debt balances against the debt ledger")
+    parser.add_argument("--fix", action="store_true", help="Reset drifted balances to the ledger total")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        stream=sys.stdout,
+    )
+    with SessionLocal() as db:
+        mismatches = reconcile(db, fix=args.fix)
+        for mismatch in mismatches:
+            logger.warning(
+                "Client %s: balance %s, ledger %s, open debts %s",
+                mismatch.client_id,
+                mismatch.balance,
+                mismatch.ledger_total,
+                mismatch.open_debts,
+            )
+        if args.fix:
+            db.commit()
+    logger.info("%s client balance(s) differ from the ledger%s", len(mismatches), " (fixed)" if args.fix else "")
+    sys.exit(1 if mismatches and not args.fix else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Goods receipts (income) applied in bulk.
+
+A receipt takes the same handful of statements whatever its size: products are resolved
+by id or barcode in one SELECT, missing ones are created in one batched INSERT, income
+items are inserted in one batch, stock moves with one UPSERT (``adjust_stock_many``) and
+product prices and quantity counters with one UPDATE (``receive_products``).
+"""
+from __future__ import annotations
+
+import csv
+import io
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Sequence
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.entities import Income, IncomeItem, Product
+from app.schemas.income import Income as IncomeSchema, IncomeImportItem
+from app.services.inventory import aggregate_deltas, adjust_stock_many, receive_products
+
+CSV_COLUMNS = ("product_id", "barcode", "name", "unit", "quantity", "purchase_price", "sale_price")
+_NUMERIC_COLUMNS = frozenset({"product_id", "quantity", "purchase_price", "sale_price"})
+
+
+@dataclass
+class ReceiptResult:
+    income: Income
+    stock: dict[int, Decimal]
+    created_products: int = 0
+
+
+def serialize_income(income: Income) -> IncomeSchema:
+    """Income with its item totals, computed from the already loaded ``items``."""
+    return IncomeSchema(
+        id=income.id,
+        branch_id=income.branch_id,
+        created_by_id=income.created_by_id,
+        created_at=income.created_at,
+        updated_at=income.updated_at,
+        items=income.items,
+        item_count=len(income.items),
+        purchase_total=round(sum(item.quantity * (item.purchase_price or 0) for item in income.items), 2),
+        sale_total=round(sum(item.quantity * (item.sale_price or 0) for item in income.items), 2),
+    )
+
+
+def parse_receipt_csv(content: bytes) -> list[IncomeImportItem]:
+    """Parse a supplier CSV with a header row naming the ``CSV_COLUMNS`` it uses.
+
+    UTF-8 (with or without BOM) and cp1251 are accepted, the delimiter may be ``,``, ``;``
+    or a tab, and numbers may use a decimal comma, as spreadsheets export them.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = content.decode("cp1251")
+    header = text.split("\n", 1)[0]
+    delimiter = max((";", "\t", ","), key=header.count)
+    reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
+    fields = {(name or "").strip().lower() for name in reader.fieldnames or []}
+    if "quantity" not in fields or not fields & {"product_id", "barcode"}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="В заголовке CSV нужны колонки quantity и product_id или barcode",
+        )
+
+    items: list[IncomeImportItem] = []
+    for row in reader:
+        values = {}
+        for key, value in row.items():
+            key = (key or "").strip().lower()
+            value = value.strip() if isinstance(value, str) else None
+            if key not in CSV_COLUMNS or not value:
+                continue
+            values[key] = value.replace(" ", "").replace(",", ".") if key in _NUMERIC_COLUMNS else value
+        if not values:
+            continue
+        try:
+            items.append(IncomeImportItem.model_validate(values))
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Строка {reader.line_num}: {field} — {error['msg']}",
+            ) from exc
+    return items
+
+
+def _products_not_found(product_ids) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Product {', '.join(map(str, sorted(product_ids)))} not found",
+    )
+
+
+def require_products(db: Session, product_ids: Sequence[int]) -> None:
+    """Raise 404 unless every id in ``product_ids`` is an existing product (one query)."""
+    wanted = set(product_ids)
+    if not wanted:
+        return
+    missing = wanted - set(db.execute(select(Product.id).where(Product.id.in_(wanted))).scalars())
+    if missing:
+        raise _products_not_found(missing)
+
+
+def resolve_products(
+    db: Session,
+    items: Sequence[IncomeImportItem],
+    create_missing: bool = False,
+    category_id: int | None = None,
+) -> tuple[list[int], int]:
+    """Return the product id of every line and the number of products created.
+
+    Lines without ``product_id`` are matched by barcode; with ``create_missing`` unknown
+    barcodes become new products (one per barcode, named by the first line carrying it).
+    """
+    ids = {item.product_id for item in items if item.product_id is not None}
+    barcodes = {item.barcode for item in items if item.product_id is None and item.barcode}
+    for number, item in enumerate(items, start=1):
+        if item.product_id is None and not item.barcode:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Строка {number}: не указан товар (product_id или barcode)",
+            )
+
+    known_ids: set[int] = set()
+    by_barcode: dict[str, int] = {}
+    if ids or barcodes:
+        criteria = []
+        if ids:
+            criteria.append(Product.id.in_(ids))
+        if barcodes:
+            criteria.append(Product.barcode.in_(barcodes))
+        for product_id, barcode in db.execute(select(Product.id, Product.barcode).where(or_(*criteria))):
+            known_ids.add(product_id)
+            if barcode in barcodes:
+                by_barcode[barcode] = product_id
+
+    if ids - known_ids:
+        raise _products_not_found(ids - known_ids)
+
+    new_products: dict[str, dict] = {}
+    for number, item in enumerate(items, start=1):
+        if item.product_id is not None or item.barcode in by_barcode or item.barcode in new_products:
+            continue
+        if not create_missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Строка {number}: товар со штрихкодом {item.barcode} не найден",
+            )
+        if not item.name:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Строка {number}: для нового товара {item.barcode} нужно название",
+            )
+        new_products[item.barcode] = {
+            "name": item.name,
+            "barcode": item.barcode,
+            "unit": item.unit or "шт",
+            "category_id": category_id,
+            "purchase_price": item.purchase_price,
+            "sale_price": item.sale_price,
+            "quantity": 0,
+        }
+    if new_products:
+        db.execute(insert(Product), list(new_products.values()))
+        by_barcode.update(
+            db.execute(select(Product.barcode, Product.id).where(Product.barcode.in_(new_products))).tuples().all()
+        )
+
+    product_ids = [item.product_id if item.product_id is not None else by_barcode[item.barcode] for item in items]
+    return product_ids, len(new_products)
+
+
+def apply_receipt(
+    db: Session,
+    branch_id: int,
+    created_by_id: int,
+    items: Sequence,
+    product_ids: Sequence[int] | None = None,
+) -> ReceiptResult:
+    """Record an income for ``items`` and move stock, counters and prices; the caller commits.
+
+    ``items`` need ``quantity``, ``purchase_price`` and ``sale_price``; their products are
+    ``product_ids`` (or each item's ``product_id``). When a product appears on several
+    lines the prices of the last one win, as if the lines were received one by one.
+    """
+    if product_ids is None:
+        product_ids = [item.product_id for item in items]
+    income = Income(branch_id=branch_id, created_by_id=created_by_id)
+    db.add(income)
+    db.flush()
+    if items:
+        db.execute(
+            insert(IncomeItem),
+            [
+                {
+                    "income_id": income.id,
+                    "product_id": product_id,
+                    "quantity": item.quantity,
+                    "purchase_price": item.purchase_price,
+                    "sale_price": item.sale_price,
+                }
+                for product_id, item in zip(product_ids, items)
+            ],
+        )
+    quantities = aggregate_deltas((product_id, item.quantity) for product_id, item in zip(product_ids, items))
+    received = {
+        product_id: (int(quantities.get(product_id, 0)), item.purchase_price, item.sale_price)
+        for product_id, item in zip(product_ids, items)
+    }
+    stock = adjust_stock_many(db, branch_id, quantities)
+    receive_products(db, received)
+    return ReceiptResult(income=income, stock=stock)
+
+
+def import_receipt(
+    db: Session,
+    branch_id: int,
+    created_by_id: int,
+    items: Sequence[IncomeImportItem],
+    create_missing: bool = False,
+    category_id: int | None = None,
+) -> ReceiptResult:
+    product_ids, created = resolve_products(db, items, create_missing, category_id)
+    result = apply_receipt(db, branch_id, created_by_id, items, product_ids)
+    result.created_products = created
+    return result
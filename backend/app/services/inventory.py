@@ -1,9 +1,13 @@
+from collections import defaultdict
 from decimal import Decimal
+from typing import Iterable, Mapping
 
-from sqlalchemy import select
+from sqlalchemy import Float, Integer, case, column, func, select, update, values
 from sqlalchemy.orm import Session
 
-from app.models.entities import Stock
+from app.database.dialects import supports_upsert_returning, upsert_insert
+from app.models.entities import Product, Stock
+from app.services.catalog import COUNTERS_ONLY_OPTION, STOCK_KEYS_OPTION
 
 
 def adjust_stock(
@@ -13,15 +17,170 @@ def adjust_stock(
     delta: int | float | Decimal,
     allow_negative: bool = False,
 ) -> Stock:
-    result = db.execute(
-        select(Stock).where(Stock.branch_id == branch_id, Stock.product_id == product_id)
+    """Add ``delta`` to one stock row atomically and return the refreshed ``Stock``.
+
+    The row is created on first use and updated under the database's row lock in a single
+    ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING``, so concurrent tills cannot lose each
+    other's updates. Without ``allow_negative`` the result is clamped at zero.
+    """
+    delta = Decimal(str(delta))
+    if not supports_upsert_returning(db):
+        return _adjust_stock_locked(db, branch_id, product_id, delta, allow_negative)
+
+    table = Stock.__table__
+    quantity = table.c.quantity + delta
+    initial = delta
+    if not allow_negative:
+        quantity = case((quantity < 0, 0), else_=quantity)
+        initial = max(delta, Decimal("0"))
+    stmt = (
+        upsert_insert(db, Stock)
+        .values(branch_id=branch_id, product_id=product_id, quantity=initial)
+        .on_conflict_do_update(
+            index_elements=[table.c.branch_id, table.c.product_id],
+            set_={"quantity": quantity, "updated_at": func.now()},
+        )
+        .returning(Stock)
     )
-    stock = result.scalar_one_or_none()
+    return db.scalars(
+        stmt,
+        execution_options={"populate_existing": True, STOCK_KEYS_OPTION: [(branch_id, product_id)]},
+    ).one()
+
+
+def _adjust_stock_locked(
+    db: Session,
+    branch_id: int,
+    product_id: int,
+    delta: Decimal,
+    allow_negative: bool,
+) -> Stock:
+    """Read-modify-write fallback for databases without UPSERT ... RETURNING."""
+    stock = db.execute(
+        select(Stock)
+        .where(Stock.branch_id == branch_id, Stock.product_id == product_id)
+        .with_for_update()
+    ).scalar_one_or_none()
     if stock is None:
         stock = Stock(branch_id=branch_id, product_id=product_id, quantity=Decimal("0"))
         db.add(stock)
-    stock.quantity = Decimal(str(stock.quantity or 0)) + Decimal(str(delta))
+    stock.quantity = Decimal(str(stock.quantity or 0)) + delta
     if not allow_negative and stock.quantity < 0:
         stock.quantity = Decimal("0")
     db.flush()
     return stock
+
+
+def aggregate_deltas(pairs: Iterable[tuple[int, int | float | Decimal]]) -> dict[int, Decimal]:
+    """Sum ``(product_id, delta)`` pairs per product, dropping products whose deltas cancel out."""
+    totals: dict[int, Decimal] = defaultdict(Decimal)
+    for product_id, delta in pairs:
+        totals[product_id] += Decimal(str(delta))
+    return {product_id: delta for product_id, delta in totals.items() if delta != 0}
+
+
+def adjust_stock_many(
+    db: Session,
+    branch_id: int,
+    deltas: Mapping[int, int | float | Decimal],
+    allow_negative: bool = False,
+) -> dict[int, Decimal]:
+    """Apply per-product deltas to one branch's stock with a single multi-row UPSERT.
+
+    Rows are written in product_id order so that concurrent receipts lock stock rows in
+    the same order. Returns the resulting quantity per product. Stock objects already
+    loaded in the session are not refreshed.
+    """
+    rows = [
+        {"branch_id": branch_id, "product_id": product_id, "quantity": Decimal(str(delta))}
+        for product_id, delta in sorted(deltas.items())
+    ]
+    if not rows:
+        return {}
+    if not supports_upsert_returning(db):
+        return {
+            row["product_id"]: Decimal(
+                str(_adjust_stock_locked(db, branch_id, row["product_id"], row["quantity"], allow_negative).quantity)
+            )
+            for row in rows
+        }
+
+    table = Stock.__table__
+    stmt = upsert_insert(db, table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.branch_id, table.c.product_id],
+        set_={"quantity": table.c.quantity + stmt.excluded.quantity, "updated_at": func.now()},
+    ).returning(table.c.product_id, table.c.quantity)
+    stmt = stmt.execution_options(**{STOCK_KEYS_OPTION: [(branch_id, row["product_id"]) for row in rows]})
+    quantities = {product_id: Decimal(str(quantity)) for product_id, quantity in db.execute(stmt)}
+
+    if not allow_negative:
+        clamped = [product_id for product_id, quantity in quantities.items() if quantity < 0]
+        if clamped:
+            db.execute(
+                update(Stock)
+                .where(Stock.branch_id == branch_id, Stock.product_id.in_(clamped))
+                .values(quantity=0)
+                .execution_options(
+                    synchronize_session=False,
+                    **{STOCK_KEYS_OPTION: [(branch_id, product_id) for product_id in clamped]},
+                )
+            )
+            quantities.update({product_id: Decimal("0") for product_id in clamped})
+    return quantities
+
+
+def adjust_product_quantities(db: Session, deltas: Mapping[int, int | float | Decimal]) -> None:
+    """Shift the ``Product.quantity`` counters by ``deltas`` in one UPDATE."""
+    if not deltas:
+        return
+    db.execute(
+        update(Product)
+        .where(Product.id.in_(list(deltas)))
+        .values(
+            quantity=Product.quantity
+            + case({product_id: int(delta) for product_id, delta in deltas.items()}, value=Product.id, else_=0)
+        )
+        .execution_options(synchronize_session=False, **{COUNTERS_ONLY_OPTION: True})
+    )
+
+
+def receive_products(db: Session, received: Mapping[int, tuple[int, float, float]]) -> None:
+    """Apply a goods receipt to products in one UPDATE.
+
+    ``received`` maps product_id to ``(quantity, purchase_price, sale_price)``: the quantity
+    is added to ``Product.quantity`` and the prices replace the current ones. On PostgreSQL
+    this is ``UPDATE ... FROM (VALUES ...)``; elsewhere the same values go through CASE.
+    """
+    if not received:
+        return
+    ordered = sorted(received.items())
+    if db.get_bind().dialect.name == "postgresql":
+        rows = values(
+            column("id", Integer),
+            column("quantity", Integer),
+            column("purchase_price", Float),
+            column("sale_price", Float),
+            name="received",
+        ).data([(product_id, int(quantity), purchase, sale) for product_id, (quantity, purchase, sale) in ordered])
+        stmt = (
+            update(Product)
+            .where(Product.id == rows.c.id)
+            .values(
+                quantity=Product.quantity + rows.c.quantity,
+                purchase_price=rows.c.purchase_price,
+                sale_price=rows.c.sale_price,
+            )
+        )
+    else:
+        stmt = (
+            update(Product)
+            .where(Product.id.in_([product_id for product_id, _ in ordered]))
+            .values(
+                quantity=Product.quantity
+                + case({product_id: int(row[0]) for product_id, row in ordered}, value=Product.id, else_=0),
+                purchase_price=case({product_id: row[1] for product_id, row in ordered}, value=Product.id),
+                sale_price=case({product_id: row[2] for product_id, row in ordered}, value=Product.id),
+            )
+        )
+    db.execute(stmt.execution_options(synchronize_session=False))
@@ -0,0 +1,133 @@
+"""Month-end close: immutable report snapshots of past months.
+
+Closing a month computes its month-end reports once and stores each result as a
+``PeriodSnapshot``; from then on reads of that month are a single-row lookup by
+``(month, report_type)`` instead of aggregating the month's rows. Workshop materials are
+priced at the last receipt price before the month ended (``purchase_price_as_of``) and
+profit COGS come from the rollups recorded at sale time, so later edits of
+``Product.purchase_price`` no longer move a closed month. Backdated workshop salary
+entries into a closed month are refused; reopening a month drops its snapshots.
+
+Close a month from cron with ``python -m app.services.period_close YYYY-MM``.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from datetime import date, datetime
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.models.entities import ClosedPeriod, PeriodSnapshot
+from app.services.reports import (
+    compute_profit,
+    compute_salary_payments,
+    compute_workshop_salary,
+    compute_workshop_summary,
+    month_bounds,
+    parse_month,
+    purchase_price_as_of,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _dump(value: BaseModel | list[BaseModel]) -> Any:
+    if isinstance(value, list):
+        return [item.model_dump(mode="json") for item in value]
+    return value.model_dump(mode="json")
+
+
+def _workshop_summary_at_close(db: Session, params: dict):
+    _, end = month_bounds(params["month"])
+    return compute_workshop_summary(db, params, unit_cost=purchase_price_as_of(end))
+
+
+SNAPSHOTS: dict[str, Callable[[Session, dict], BaseModel | list[BaseModel]]] = {
+    "profit": compute_profit,
+    "workshop_summary": _workshop_summary_at_close,
+    "workshop_salary": compute_workshop_salary,
+    "salary_payments": compute_salary_payments,
+}
+
+
+def period_snapshot(db: Session, report_type: str, month: str) -> Any | None:
+    """The frozen result of ``report_type`` for ``month``, or ``None`` while the month is open."""
+    if report_type not in SNAPSHOTS:
+        return None
+    return db.execute(
+        select(PeriodSnapshot.result).where(PeriodSnapshot.month == month, PeriodSnapshot.report_type == report_type)
+    ).scalar_one_or_none()
+
+
+def is_closed(db: Session, moment: date | datetime) -> bool:
+    month = f"{moment.year:04d}-{moment.month:02d}"
+    return db.execute(select(ClosedPeriod.id).where(ClosedPeriod.month == month)).first() is not None
+
+
+def ensure_open(db: Session, moment: date | datetime) -> None:
+    """Refuse a backdated write into a closed month."""
+    if is_closed(db, moment):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Период {moment.year:04d}-{moment.month:02d} закрыт",
+        )
+
+
+def close_period(db: Session, month: str, closed_by_id: int | None = None) -> ClosedPeriod:
+    """Freeze every report of ``month`` (which must have ended); the caller commits."""
+    month = parse_month(month).strftime("%Y-%m")
+    _, end = month_bounds(month)
+    if end > datetime.utcnow():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Закрыть можно только завершённый месяц")
+    if db.execute(select(ClosedPeriod.id).where(ClosedPeriod.month == month)).first() is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Период {month} уже закрыт")
+
+    period = ClosedPeriod(month=month, closed_by_id=closed_by_id)
+    params = {"month": month}
+    period.snapshots = [
+        PeriodSnapshot(month=month, report_type=report_type, result=_dump(compute(db, params)))
+        for report_type, compute in SNAPSHOTS.items()
+    ]
+    db.add(period)
+    db.flush()
+    return period
+
+
+def reopen_period(db: Session, month: str) -> None:
+    """Drop the snapshots of a closed month so that its reports are computed live again."""
+    month = parse_month(month).strftime("%Y-%m")
+    db.execute(delete(PeriodSnapshot).where(PeriodSnapshot.month == month))
+    if not db.execute(delete(ClosedPeriod).where(ClosedPeriod.month == month)).rowcount:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Период {month} не закрыт")
+
+
+def main() -> None:
+    from app.database.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Close a month and freeze its reports")
+    parser.add_argument("month", help="Month to close, YYYY-MM")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        stream=sys.stdout,
+    )
+    with SessionLocal() as db:
+        try:
+            period = close_period(db, args.month)
+        except HTTPException as exc:
+            logger.error("%s", exc.detail)
+            sys.exit(1)
+        db.commit()
+        logger.info("Closed %s: %s report snapshot(s)", period.month, len(period.snapshots))
+
+
+if __name__ == "__main__":
+    main()
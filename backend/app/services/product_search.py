@@ -0,0 +1,52 @@
+"""Shared product search used by the POS, the products list and the workshop pickers.
+
+Matching is a case-insensitive substring match on name and barcode. On Postgres it is
+served by the ``pg_trgm`` GIN indexes ``ix_products_name_trgm`` / ``ix_products_barcode_trgm``
+(see migration ``20260314_add_product_search_indexes``), which accelerate ``ILIKE '%q%'``.
+Results are ranked: exact barcode, then name prefix, then barcode prefix, then the rest.
+"""
+from __future__ import annotations
+
+from sqlalchemy import Select, case, or_
+from sqlalchemy.orm import Query
+
+from app.models.entities import Product
+
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+
+
+def normalize_search_term(term: str | None) -> str | None:
+    term = (term or "").strip()
+    return term or None
+
+
+def search_limit(limit: int | None) -> int:
+    if not limit or limit <= 0:
+        return DEFAULT_SEARCH_LIMIT
+    return min(limit, MAX_SEARCH_LIMIT)
+
+
+def product_match(term: str):
+    return or_(
+        Product.name.icontains(term, autoescape=True),
+        Product.barcode.icontains(term, autoescape=True),
+    )
+
+
+def product_rank(term: str):
+    return case(
+        (Product.barcode == term, 0),
+        (Product.name.istartswith(term, autoescape=True), 1),
+        (Product.barcode.istartswith(term, autoescape=True), 2),
+        else_=3,
+    )
+
+
+def apply_product_search(query: Select | Query, term: str, *order_by) -> Select | Query:
+    """Filter ``query`` (a ``select`` or legacy ``Query`` over ``Product``) by ``term`` and rank it.
+
+    ``order_by`` breaks ties within a rank; the product name is used when omitted.
+    """
+    query = query.where(product_match(term)) if isinstance(query, Select) else query.filter(product_match(term))
+    return query.order_by(product_rank(term), *(order_by or (Product.name.asc(),)))
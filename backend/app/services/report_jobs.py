@@ -0,0 +1,184 @@
+"""Report results cache and background job runner.
+
+``cached_report`` answers from ``report_results`` when a result was stored for the same
+report, parameters and data version, and otherwise computes the report in the request
+and stores it; a past month is therefore computed once and then read back until one
+of its rows changes, and a month closed by ``app.services.period_close`` is read from its
+snapshot. ``submit_report`` does the same lookup but hands a miss to a small
+in-process thread pool and returns the job row for the client to poll.
+
+A job is claimed with a conditional UPDATE (pending -> running) so it runs once even when
+several workers see it. Jobs left pending or running by a restarted process are picked
+up again by the next submit once they are older than ``STALE_JOB_AFTER``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.database.session import SessionLocal
+from app.models.entities import ReportResult
+from app.services.period_close import period_snapshot
+from app.services.reports import REPORTS, ReportDefinition
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STALE_JOB_AFTER = timedelta(minutes=15)
+
+_executor = ThreadPoolExecutor(max_workers=get_settings().report_workers, thread_name_prefix="report")
+
+
+def _definition(report_type: str) -> ReportDefinition:
+    definition = REPORTS.get(report_type)
+    if definition is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Неизвестный отчёт: {report_type}")
+    return definition
+
+
+def _params_key(params: dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _lookup(db: Session, report_type: str, params_key: str, data_version: str) -> ReportResult | None:
+    return db.execute(
+        select(ReportResult).where(
+            ReportResult.report_type == report_type,
+            ReportResult.params_key == params_key,
+            ReportResult.data_version == data_version,
+        )
+    ).scalar_one_or_none()
+
+
+def _drop_superseded(db: Session, job: ReportResult) -> None:
+    """Finished results of older data versions will never be served again."""
+    db.execute(
+        delete(ReportResult)
+        .where(
+            ReportResult.report_type == job.report_type,
+            ReportResult.params_key == job.params_key,
+            ReportResult.data_version != job.data_version,
+            ReportResult.status.in_((STATUS_DONE, STATUS_FAILED)),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _is_stale(job: ReportResult) -> bool:
+    started = job.started_at if job.status == STATUS_RUNNING else job.created_at
+    if started is None:
+        return True
+    if started.tzinfo is None:
+        started = started.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - started > STALE_JOB_AFTER
+
+
+def cached_report(db: Session, report_type: str, params: dict, requested_by_id: int | None = None) -> dict:
+    """The report's JSON result, computed inline only when no result is stored for this data version.
+
+    Closed months are answered from their period snapshot without checking the data version.
+    """
+    definition = _definition(report_type)
+    params = definition.normalize(params)
+    frozen = period_snapshot(db, report_type, params["month"])
+    if frozen is not None:
+        return frozen
+    params_key = _params_key(params)
+    data_version = definition.data_version(db, params)
+    job = _lookup(db, report_type, params_key, data_version)
+    if job is not None and job.status == STATUS_DONE:
+        return job.result
+
+    result = definition.compute(db, params).model_dump(mode="json")
+    if job is None:
+        job = ReportResult(
+            report_type=report_type,
+            params_key=params_key,
+            params=params,
+            data_version=data_version,
+            requested_by_id=requested_by_id,
+        )
+        db.add(job)
+    job.status = STATUS_DONE
+    job.result = result
+    job.error = None
+    job.finished_at = datetime.now(timezone.utc)
+    try:
+        db.flush()
+        _drop_superseded(db, job)
+        db.commit()
+    except IntegrityError:
+        # A concurrent request stored the same result first.
+        db.rollback()
+    return result
+
+
+def submit_report(db: Session, report_type: str, params: dict, requested_by_id: int | None = None) -> ReportResult:
+    """Return the stored result or the running job for this report, queueing a new job if needed."""
+    definition = _definition(report_type)
+    params = definition.normalize(params)
+    params_key = _params_key(params)
+    data_version = definition.data_version(db, params)
+    job = _lookup(db, report_type, params_key, data_version)
+    if job is not None and (job.status == STATUS_DONE or (job.status != STATUS_FAILED and not _is_stale(job))):
+        return job
+
+    if job is None:
+        job = ReportResult(
+            report_type=report_type,
+            params_key=params_key,
+            params=params,
+            data_version=data_version,
+            requested_by_id=requested_by_id,
+        )
+        db.add(job)
+    job.status = STATUS_PENDING
+    job.error = None
+    job.started_at = None
+    job.finished_at = None
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return _lookup(db, report_type, params_key, data_version)
+    _executor.submit(run_report_job, job.id)
+    return job
+
+
+def run_report_job(job_id: int) -> None:
+    with SessionLocal() as db:
+        claimed = db.execute(
+            update(ReportResult)
+            .where(ReportResult.id == job_id, ReportResult.status == STATUS_PENDING)
+            .values(status=STATUS_RUNNING, started_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if claimed != 1:
+            return
+        job = db.get(ReportResult, job_id)
+        try:
+            result = REPORTS[job.report_type].compute(db, job.params).model_dump(mode="json")
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Report job %s (%s) failed", job_id, job.report_type)
+            job.status = STATUS_FAILED
+            job.error = str(getattr(exc, "detail", None) or exc)
+        else:
+            job.status = STATUS_DONE
+            job.result = result
+            _drop_superseded(db, job)
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
@@ -0,0 +1,465 @@
+"""Month reports that can be cached and computed in the background.
+
+Each report is registered in ``REPORTS`` with three functions: ``normalize`` validates the
+request parameters, ``compute`` builds the response, and ``data_version`` summarizes the
+rows the report reads (counts, last ids, last ``updated_at`` and amount sums of each
+source within the month) with a few cheap, index-backed aggregates. Two requests with the same
+parameters and data version are guaranteed the same result, so
+``app.services.report_jobs`` can serve the stored one instead of recomputing it.
+"""
+from __future__ import annotations
+
+import hashlib
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from typing import Any, Callable
+from zoneinfo import ZoneInfo
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.entities import (
+    CounterpartySale,
+    CounterpartySaleItem,
+    DailySalesRollup,
+    Expense,
+    Income,
+    IncomeItem,
+    Product,
+    SalaryPayment,
+    WorkshopEmployee,
+    WorkshopOrder,
+    WorkshopOrderMaterial,
+    WorkshopOrderPayout,
+    WorkshopSalaryTransaction,
+)
+from app.schemas.reports import CounterpartyProfitReportResponse, ProfitReportResponse
+from app.schemas.salary_payments import SalaryPaymentListOut, SalaryPaymentOut, SalaryPaymentUserOut
+from app.schemas.workshop import WorkshopReportSummaryOut, WorkshopSalarySummaryItem
+from app.services.rollups import ROLLUP_FIELDS, rollup_totals
+from app.services.workshop import get_workshop_branch_id
+
+
+@dataclass(frozen=True)
+class ReportDefinition:
+    name: str
+    normalize: Callable[[dict], dict]
+    compute: Callable[[Session, dict], BaseModel]
+    data_version: Callable[[Session, dict], str]
+
+
+def parse_month(month: str | None) -> date:
+    """First day of a ``YYYY-MM`` month."""
+    try:
+        return datetime.strptime(month or "", "%Y-%m").date()
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid month format. Use YYYY-MM."
+        ) from exc
+
+
+def month_bounds(month: str) -> tuple[datetime, datetime]:
+    """``[start, end)`` datetimes of a ``YYYY-MM`` month."""
+    start = parse_month(month)
+    end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return datetime.combine(start, time.min), datetime.combine(end, time.min)
+
+
+def almaty_month_bounds(month: str | None) -> tuple[datetime, datetime]:
+    """UTC bounds of a ``YYYY-MM`` month (the current one by default) in Almaty time."""
+    almaty_tz = ZoneInfo("Asia/Almaty")
+    if month:
+        period_start = parse_month(month)
+    else:
+        period_start = datetime.now(almaty_tz).date().replace(day=1)
+
+    last_day = monthrange(period_start.year, period_start.month)[1]
+    start_local = datetime(period_start.year, period_start.month, 1, tzinfo=almaty_tz)
+    end_local = datetime(period_start.year, period_start.month, last_day, 23, 59, 59, 999999, tzinfo=almaty_tz)
+    return start_local.astimezone(timezone.utc), end_local.astimezone(timezone.utc)
+
+
+def purchase_price_as_of(moment):
+    """Unit cost of ``Product`` at ``moment``: the price of its last receipt before then.
+
+    ``moment`` is a datetime or a column of the enclosing query (e.g. ``Sale.created_at``).
+    Products never received fall back to their current purchase price.
+    """
+    last_receipt = (
+        select(IncomeItem.purchase_price)
+        .join(Income, Income.id == IncomeItem.income_id)
+        .where(IncomeItem.product_id == Product.id, IncomeItem.purchase_price.isnot(None), Income.created_at < moment)
+        .order_by(Income.created_at.desc(), IncomeItem.id.desc())
+        .limit(1)
+        .correlate_except(Income, IncomeItem)
+        .scalar_subquery()
+    )
+    return func.coalesce(last_receipt, Product.purchase_price, 0)
+
+
+def _stamp(*columns) -> str:
+    """Hash of one row of fingerprint aggregates."""
+    return hashlib.sha256(repr(tuple(str(value) for value in columns)).encode("utf-8")).hexdigest()
+
+
+def _window_stamp(model, created_at, start: datetime, end: datetime, *criteria, sums=()):
+    """count, max(id), ``max(updated_at)`` and the sums of ``sums`` within ``[start, end)``.
+
+    ``updated_at`` comes from ``now()``, the start time of the writing transaction, so an
+    edit committed behind a later-started one leaves the maximum unchanged; the sums of the
+    columns the report reads catch it.
+    """
+    markers = [func.max(model.updated_at)] if hasattr(model, "updated_at") else []
+    markers.extend(func.sum(column) for column in sums)
+    return select(func.count(model.id), func.max(model.id), *markers).where(
+        created_at >= start, created_at < end, *criteria
+    )
+
+
+def _product_prices_stamp():
+    # Reports that fall back to the current purchase price must notice price edits.
+    return select(func.count(Product.id), func.sum(Product.purchase_price))
+
+
+def _version(db: Session, *queries) -> str:
+    values: list[Any] = []
+    for query in queries:
+        values.extend(db.execute(query).one())
+    return _stamp(*values)
+
+
+def _normalize_month(params: dict) -> dict:
+    return {"month": parse_month(params.get("month")).strftime("%Y-%m")}
+
+
+# --- Profit -------------------------------------------------------------------------------
+
+
+def compute_profit(db: Session, params: dict) -> ProfitReportResponse:
+    period_start = parse_month(params["month"])
+    _, last_day = monthrange(period_start.year, period_start.month)
+    period_end = date(period_start.year, period_start.month, last_day)
+    start_dt = datetime.combine(period_start, time.min)
+    end_dt = datetime.combine(period_end, time.max)
+
+    totals = rollup_totals(db, period_start, period_end)
+    sales_total_value = totals["sales_total"] - totals["refunds_total"]
+    cogs_total = totals["sales_cogs"] - totals["returns_cogs"]
+
+    expenses_total = db.execute(
+        select(func.coalesce(func.sum(Expense.amount), 0)).where(
+            Expense.created_at >= start_dt,
+            Expense.created_at <= end_dt,
+        )
+    ).scalar_one()
+
+    salary_expenses_total = db.execute(
+        select(func.coalesce(func.sum(SalaryPayment.amount), 0)).where(
+            SalaryPayment.created_at >= start_dt,
+            SalaryPayment.created_at <= end_dt,
+        )
+    ).scalar_one()
+
+    expenses_total_value = float(expenses_total or 0) + float(salary_expenses_total or 0)
+    profit_total = sales_total_value - cogs_total - expenses_total_value
+
+    return ProfitReportResponse(
+        month=params["month"],
+        sales_total=sales_total_value,
+        cogs_total=cogs_total,
+        expenses_total=expenses_total_value,
+        profit=profit_total,
+    )
+
+
+def profit_version(db: Session, params: dict) -> str:
+    start, end = month_bounds(params["month"])
+    return _version(
+        db,
+        select(
+            func.count(),
+            func.max(DailySalesRollup.updated_at),
+            *(func.sum(getattr(DailySalesRollup, name)) for name in ROLLUP_FIELDS),
+        ).where(DailySalesRollup.day >= start.date(), DailySalesRollup.day < end.date()),
+        _window_stamp(Expense, Expense.created_at, start, end, sums=(Expense.amount,)),
+        _window_stamp(SalaryPayment, SalaryPayment.created_at, start, end, sums=(SalaryPayment.amount,)),
+    )
+
+
+# --- Counterparty profit ------------------------------------------------------------------
+
+
+def _normalize_counterparty_profit(params: dict) -> dict:
+    counterparty_id = params.get("counterparty_id")
+    try:
+        counterparty_id = int(counterparty_id) if counterparty_id else None
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid counterparty_id") from exc
+    return {**_normalize_month(params), "counterparty_id": counterparty_id}
+
+
+def _counterparty_sale_filters(params: dict) -> list:
+    period_start = parse_month(params["month"])
+    _, last_day = monthrange(period_start.year, period_start.month)
+    filters = [
+        CounterpartySale.created_at >= datetime.combine(period_start, time.min),
+        CounterpartySale.created_at <= datetime.combine(date(period_start.year, period_start.month, last_day), time.max),
+    ]
+    if params.get("counterparty_id"):
+        filters.append(CounterpartySale.counterparty_id == params["counterparty_id"])
+    return filters
+
+
+def compute_counterparty_profit(db: Session, params: dict) -> CounterpartyProfitReportResponse:
+    sale_filters = _counterparty_sale_filters(params)
+
+    count_sales = db.execute(select(func.count(CounterpartySale.id)).where(*sale_filters)).scalar_one()
+
+    totals = db.execute(
+        select(
+            func.coalesce(func.sum(CounterpartySaleItem.quantity * CounterpartySaleItem.price), 0),
+            func.coalesce(
+                func.sum(
+                    CounterpartySaleItem.quantity
+                    * func.coalesce(CounterpartySaleItem.cost_price_snapshot, Product.purchase_price, 0)
+                ),
+                0,
+            ),
+        )
+        .join(CounterpartySale, CounterpartySaleItem.sale_id == CounterpartySale.id)
+        .join(Product, CounterpartySaleItem.product_id == Product.id)
+        .where(*sale_filters)
+    ).one()
+
+    revenue = float(totals[0] or 0)
+    cost = float(totals[1] or 0)
+    profit = revenue - cost
+
+    return CounterpartyProfitReportResponse(
+        count_sales=int(count_sales or 0),
+        revenue=revenue,
+        cost=cost,
+        profit=profit,
+    )
+
+
+def counterparty_profit_version(db: Session, params: dict) -> str:
+    sale_filters = _counterparty_sale_filters(params)
+    return _version(
+        db,
+        select(func.count(CounterpartySale.id), func.max(CounterpartySale.id), func.max(CounterpartySale.updated_at)).where(
+            *sale_filters
+        ),
+        select(
+            func.count(CounterpartySaleItem.id),
+            func.max(CounterpartySaleItem.id),
+            func.sum(CounterpartySaleItem.quantity * CounterpartySaleItem.price),
+            func.sum(CounterpartySaleItem.quantity * CounterpartySaleItem.cost_price_snapshot),
+        )
+        .join(CounterpartySale, CounterpartySaleItem.sale_id == CounterpartySale.id)
+        .where(*sale_filters),
+        _product_prices_stamp(),
+    )
+
+
+# --- Workshop month summary ---------------------------------------------------------------
+
+
+def normalize_workshop_month(params: dict) -> dict:
+    """``{"month": "YYYY-MM"}``, the current UTC month when none is given."""
+    if not params.get("month"):
+        today = datetime.utcnow()
+        return {"month": f"{today.year:04d}-{today.month:02d}"}
+    return _normalize_month(params)
+
+
+def compute_workshop_summary(db: Session, params: dict, unit_cost=None) -> WorkshopReportSummaryOut:
+    """``unit_cost`` prices the materials (the current purchase price by default)."""
+    start, end = month_bounds(params["month"])
+    branch_id = get_workshop_branch_id(db)
+    in_month = (WorkshopOrder.branch_id == branch_id, WorkshopOrder.created_at >= start, WorkshopOrder.created_at < end)
+    orders_total = db.execute(select(func.coalesce(func.sum(WorkshopOrder.amount), 0)).where(*in_month)).scalar() or 0
+    if unit_cost is None:
+        unit_cost = Product.purchase_price
+    materials_cogs = (
+        db.execute(
+            select(func.coalesce(func.sum(WorkshopOrderMaterial.quantity * unit_cost), 0))
+            .join(WorkshopOrder, WorkshopOrder.id == WorkshopOrderMaterial.order_id)
+            .join(Product, Product.id == WorkshopOrderMaterial.product_id)
+            .where(*in_month)
+        ).scalar()
+        or 0
+    )
+    expenses_total = (
+        db.execute(
+            select(func.coalesce(func.sum(Expense.amount), 0)).where(
+                Expense.branch_id == branch_id,
+                Expense.created_at >= start,
+                Expense.created_at < end,
+            )
+        ).scalar()
+        or 0
+    )
+    salary_totals = dict(
+        db.execute(
+            select(WorkshopSalaryTransaction.type, func.coalesce(func.sum(WorkshopSalaryTransaction.amount), 0))
+            .where(
+                WorkshopSalaryTransaction.type.in_(("payout", "bonus")),
+                WorkshopSalaryTransaction.created_at >= start,
+                WorkshopSalaryTransaction.created_at < end,
+            )
+            .group_by(WorkshopSalaryTransaction.type)
+        ).all()
+    )
+    orders_total = Decimal(str(orders_total))
+    materials_cogs = Decimal(str(materials_cogs))
+    expenses_total = Decimal(str(expenses_total))
+    salary_payout_total = Decimal(str(salary_totals.get("payout") or 0))
+    salary_bonus_total = Decimal(str(salary_totals.get("bonus") or 0))
+    salary_total = salary_payout_total + salary_bonus_total
+    orders_margin = orders_total - materials_cogs
+    net_profit = orders_margin - (expenses_total + salary_total)
+
+    return WorkshopReportSummaryOut(
+        month=params["month"],
+        orders_total=orders_total,
+        materials_cogs=materials_cogs,
+        orders_margin=orders_margin,
+        expenses_total=expenses_total,
+        salary_payout_total=salary_payout_total,
+        salary_bonus_total=salary_bonus_total,
+        salary_total=salary_total,
+        net_profit=net_profit,
+    )
+
+
+def workshop_summary_version(db: Session, params: dict) -> str:
+    start, end = month_bounds(params["month"])
+    branch_id = get_workshop_branch_id(db)
+    return _version(
+        db,
+        _window_stamp(
+            WorkshopOrder,
+            WorkshopOrder.created_at,
+            start,
+            end,
+            WorkshopOrder.branch_id == branch_id,
+            sums=(WorkshopOrder.amount,),
+        ),
+        select(
+            func.count(WorkshopOrderMaterial.id),
+            func.max(WorkshopOrderMaterial.id),
+            func.max(WorkshopOrderMaterial.updated_at),
+            func.sum(WorkshopOrderMaterial.quantity),
+        )
+        .join(WorkshopOrder, WorkshopOrder.id == WorkshopOrderMaterial.order_id)
+        .where(WorkshopOrder.branch_id == branch_id, WorkshopOrder.created_at >= start, WorkshopOrder.created_at < end),
+        _window_stamp(Expense, Expense.created_at, start, end, Expense.branch_id == branch_id, sums=(Expense.amount,)),
+        _window_stamp(
+            WorkshopSalaryTransaction,
+            WorkshopSalaryTransaction.created_at,
+            start,
+            end,
+            sums=(WorkshopSalaryTransaction.amount,),
+        ),
+        _product_prices_stamp(),
+    )
+
+
+# --- Salary ---------------------------------------------------------------------------------
+
+
+def compute_workshop_salary(db: Session, params: dict) -> list[WorkshopSalarySummaryItem]:
+    """Accrued order payouts, paid salary and bonuses of every workshop employee in the month."""
+    start, end = month_bounds(params["month"])
+    employees = db.execute(select(WorkshopEmployee).order_by(WorkshopEmployee.id.asc())).scalars().all()
+    order_payouts = dict(
+        db.execute(
+            select(WorkshopOrderPayout.employee_id, func.coalesce(func.sum(WorkshopOrderPayout.amount), 0))
+            .where(WorkshopOrderPayout.created_at >= start, WorkshopOrderPayout.created_at < end)
+            .group_by(WorkshopOrderPayout.employee_id)
+        ).all()
+    )
+    transactions: dict[tuple[int, str], Any] = {
+        (employee_id, kind): total
+        for employee_id, kind, total in db.execute(
+            select(
+                WorkshopSalaryTransaction.employee_id,
+                WorkshopSalaryTransaction.type,
+                func.coalesce(func.sum(WorkshopSalaryTransaction.amount), 0),
+            )
+            .where(
+                WorkshopSalaryTransaction.type.in_(("payout", "bonus")),
+                WorkshopSalaryTransaction.created_at >= start,
+                WorkshopSalaryTransaction.created_at < end,
+            )
+            .group_by(WorkshopSalaryTransaction.employee_id, WorkshopSalaryTransaction.type)
+        )
+    }
+
+    results: list[WorkshopSalarySummaryItem] = []
+    for employee in employees:
+        full_name = " ".join(filter(None, [employee.first_name, employee.last_name])).strip() or employee.first_name
+        accrued = Decimal(str(order_payouts.get(employee.id, 0)))
+        payout = Decimal(str(transactions.get((employee.id, "payout"), 0)))
+        bonus = Decimal(str(transactions.get((employee.id, "bonus"), 0)))
+        results.append(
+            WorkshopSalarySummaryItem(
+                employee_id=employee.id,
+                full_name=full_name,
+                position=employee.position,
+                accrued=accrued,
+                payout=payout,
+                bonus=bonus,
+                balance=accrued + bonus - payout,
+            )
+        )
+    return results
+
+
+def compute_salary_payments(db: Session, params: dict) -> SalaryPaymentListOut:
+    """Salary payments of the (Almaty) month, newest first, optionally of one employee."""
+    start_dt, end_dt = almaty_month_bounds(params.get("month"))
+    filters = [SalaryPayment.created_at >= start_dt, SalaryPayment.created_at <= end_dt]
+    if params.get("employee_id"):
+        filters.append(SalaryPayment.employee_id == params["employee_id"])
+
+    payments = (
+        db.execute(
+            select(SalaryPayment)
+            .options(joinedload(SalaryPayment.employee), joinedload(SalaryPayment.created_by))
+            .where(*filters)
+            .order_by(SalaryPayment.created_at.desc())
+        )
+        .scalars()
+        .all()
+    )
+    items = [
+        SalaryPaymentOut(
+            id=payment.id,
+            employee=SalaryPaymentUserOut(id=payment.employee.id, name=payment.employee.name),
+            payment_type=payment.payment_type,
+            amount=float(payment.amount),
+            comment=payment.comment,
+            created_at=payment.created_at,
+            created_by_admin=SalaryPaymentUserOut(id=payment.created_by.id, name=payment.created_by.name),
+        )
+        for payment in payments
+    ]
+    return SalaryPaymentListOut(items=items, total_amount=float(sum(payment.amount for payment in payments)))
+
+
+REPORTS: dict[str, ReportDefinition] = {
+    definition.name: definition
+    for definition in (
+        ReportDefinition("profit", _normalize_month, compute_profit, profit_version),
+        ReportDefinition(
+            "counterparty_profit", _normalize_counterparty_profit, compute_counterparty_profit, counterparty_profit_version
+        ),
+        ReportDefinition("workshop_summary", normalize_workshop_month, compute_workshop_summary, workshop_summary_version),
+    )
+}
@@ -1,76 +1,88 @@
 from __future__ import annotations
 
-from collections import defaultdict
 from dataclasses import dataclass
-from typing import Iterable
+from decimal import Decimal
+from typing import Mapping
 
-from app.models.entities import Return
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.entities import Return, Sale, SaleItem
+
+ZERO = Decimal("0")
 
 
 @dataclass
 class ReturnBreakdown:
-    total: float
-    cash: float
-    card: float
-    debt: float
-
-
-def calculate_return_breakdowns(returns: Iterable[Return]) -> dict[int, ReturnBreakdown]:
-    breakdowns: dict[int, ReturnBreakdown] = {}
-    returns_by_sale: dict[int, list[Return]] = defaultdict(list)
-
-    for return_entry in returns:
-        if return_entry.sale_id is not None:
-            returns_by_sale[return_entry.sale_id].append(return_entry)
-
-    for sale_returns in returns_by_sale.values():
-        if not sale_returns:
-            continue
-        sale = sale_returns[0].sale
-        if sale is None:
-            continue
-
-        cash_pool = float(sale.paid_cash or 0)
-        card_pool = float(sale.paid_card or 0)
-        debt_pool = float(sale.paid_debt or 0)
-
-        for entry in sorted(sale_returns, key=lambda r: r.created_at):
-            total_amount = float(sum(item.amount for item in entry.items) or 0)
-            debt_offset = float(entry.debt_offset_amount or 0)
-            if debt_offset > 0:
-                debt_used = min(debt_offset, total_amount)
-                cash_used = max(total_amount - debt_used, 0)
-                breakdowns[entry.id] = ReturnBreakdown(
-                    total=total_amount,
-                    cash=cash_used,
-                    card=0,
-                    debt=debt_used,
-                )
-                continue
-
-            remaining = total_amount
-
-            debt_used = min(remaining, debt_pool)
-            debt_pool -= debt_used
-            remaining -= debt_used
-
-            cash_used = min(remaining, cash_pool)
-            cash_pool -= cash_used
-            remaining -= cash_used
-
-            card_used = min(remaining, card_pool)
-            card_pool -= card_used
-            remaining -= card_used
-
-            if remaining > 0:
-                card_used += remaining
-                remaining = 0
-
-            breakdowns[entry.id] = ReturnBreakdown(
-                total=total_amount,
-                cash=cash_used,
-                card=card_used,
-                debt=debt_used,
-            )
-
-    return breakdowns
+    total: Decimal
+    cash: Decimal
+    card: Decimal
+    debt: Decimal
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def refunded_before(db: Session, sale_id: int, exclude_return_id: int | None = None) -> Decimal:
+    """Total already paid back for a sale by returns that were not offset against debt."""
+    query = select(func.coalesce(func.sum(Return.refund_total), 0)).where(
+        Return.sale_id == sale_id,
+        func.coalesce(Return.debt_offset_amount, 0) <= 0,
+    )
+    if exclude_return_id is not None:
+        query = query.where(Return.id != exclude_return_id)
+    return _money(db.execute(query).scalar_one())
+
+
+def split_refund(
+    sale: Sale,
+    already_refunded,
+    total_amount,
+    debt_offset=0,
+) -> ReturnBreakdown:
+    """Split a refund across the sale's payment channels.
+
+    Refunds consume the sale's debt first, then cash, then card; anything beyond the
+    sale's payments is treated as card. A return whose amount is offset against the
+    client's debt takes the offset as debt and the rest as cash, and does not consume
+    the sale's pools.
+    """
+    total = _money(total_amount)
+    offset = _money(debt_offset)
+    if offset > 0:
+        debt = min(offset, total)
+        return ReturnBreakdown(total=total, cash=max(total - debt, ZERO), card=ZERO, debt=debt)
+
+    debt_pool = _money(sale.paid_debt)
+    cash_pool = _money(sale.paid_cash)
+    start = _money(already_refunded)
+    end = start + total
+
+    debt = max(min(end, debt_pool) - min(start, debt_pool), ZERO)
+    cash = max(min(end, debt_pool + cash_pool) - max(start, debt_pool), ZERO)
+    card = total - debt - cash
+    return ReturnBreakdown(total=total, cash=cash, card=card, debt=debt)
+
+
+def reserve_returned_quantities(db: Session, sale_id: int, quantities: Mapping[int, int]) -> bool:
+    """Add ``quantities`` (sale_item_id -> qty) to ``sales_items.returned_quantity`` in one UPDATE.
+
+    The UPDATE only touches lines that stay within their sold quantity, so nothing can be
+    returned twice even without a prior read; returns False (and the caller rolls back) when
+    any line would be over-returned. Loaded ``SaleItem`` objects are not refreshed.
+    """
+    if not quantities:
+        return True
+    increment = case(dict(quantities), value=SaleItem.id, else_=0)
+    result = db.execute(
+        update(SaleItem)
+        .where(
+            SaleItem.sale_id == sale_id,
+            SaleItem.id.in_(list(quantities)),
+            SaleItem.returned_quantity + increment <= SaleItem.quantity,
+        )
+        .values(returned_quantity=SaleItem.returned_quantity + increment)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(quantities)
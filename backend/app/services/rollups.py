@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.database.dialects import upsert_insert
+from app.models.entities import (
+    DailySalesRollup,
+    DebtPayment,
+    Product,
+    Return,
+    ReturnItem,
+    Sale,
+    SaleItem,
+)
+
+logger = logging.getLogger(__name__)
+
+MONEY_FIELDS = (
+    "sales_total",
+    "sales_cash",
+    "sales_card",
+    "sales_debt",
+    "debts_created",
+    "refunds_total",
+    "refunds_cash",
+    "refunds_card",
+    "refunds_debt",
+    "sales_cogs",
+    "returns_cogs",
+    "debt_payments_cash",
+    "debt_payments_card",
+    "debt_payments_total",
+)
+ROLLUP_FIELDS = ("sales_count",) + MONEY_FIELDS
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def _increment(db: Session, values: dict[str, object], *, branch_id: int | None, seller_id: int | None) -> None:
+    """Add ``values`` to today's rollup row for the branch/seller pair in one atomic UPSERT."""
+    table = DailySalesRollup.__table__
+    stmt = upsert_insert(db, table).values(
+        day=func.current_date(),
+        branch_id=branch_id or 0,
+        seller_id=seller_id or 0,
+        **values,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.branch_id, table.c.seller_id],
+        set_={
+            **{name: table.c[name] + stmt.excluded[name] for name in values},
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def record_sale(db: Session, sale: Sale, cogs) -> None:
+    _increment(
+        db,
+        {
+            "sales_count": 1,
+            "sales_total": _money(sale.total_amount),
+            "sales_cash": _money(sale.paid_cash),
+            "sales_card": _money(sale.paid_card),
+            "sales_debt": _money(sale.paid_debt),
+            "debts_created": _money(sale.paid_debt) if sale.client_id else Decimal("0"),
+            "sales_cogs": _money(cogs),
+        },
+        branch_id=sale.branch_id,
+        seller_id=sale.seller_id,
+    )
+
+
+def record_return(db: Session, return_entry: Return, cogs) -> None:
+    _increment(
+        db,
+        {
+            "refunds_total": _money(return_entry.refund_total),
+            "refunds_cash": _money(return_entry.refund_cash),
+            "refunds_card": _money(return_entry.refund_card),
+            "refunds_debt": _money(return_entry.refund_debt),
+            "returns_cogs": _money(cogs),
+        },
+        branch_id=return_entry.branch_id,
+        seller_id=return_entry.created_by_id,
+    )
+
+
+def record_debt_payment(db: Session, payment: DebtPayment) -> None:
+    # Offsets against returns are not money received; the reports exclude them everywhere.
+    if payment.payment_type == "offset":
+        return
+    amount = _money(payment.amount)
+    is_cash = payment.payment_type == "cash"
+    _increment(
+        db,
+        {
+            "debt_payments_cash": amount if is_cash else Decimal("0"),
+            "debt_payments_card": Decimal("0") if is_cash else amount,
+            "debt_payments_total": amount,
+        },
+        branch_id=payment.branch_id,
+        seller_id=payment.processed_by_id,
+    )
+
+
+def _rollup_filters(
+    start_date: date | None,
+    end_date: date | None,
+    branch_id: int | None = None,
+    seller_id: int | None = None,
+) -> list:
+    filters = []
+    if start_date:
+        filters.append(DailySalesRollup.day >= start_date)
+    if end_date:
+        filters.append(DailySalesRollup.day <= end_date)
+    if branch_id:
+        filters.append(DailySalesRollup.branch_id == branch_id)
+    if seller_id:
+        filters.append(DailySalesRollup.seller_id == seller_id)
+    return filters
+
+
+def _sum_columns():
+    return [
+        func.coalesce(func.sum(getattr(DailySalesRollup, name)), 0).label(name) for name in ROLLUP_FIELDS
+    ]
+
+
+def rollup_totals(
+    db: Session,
+    start_date: date | None,
+    end_date: date | None,
+    branch_id: int | None = None,
+    seller_id: int | None = None,
+) -> dict[str, float]:
+    row = db.execute(
+        select(*_sum_columns()).where(*_rollup_filters(start_date, end_date, branch_id, seller_id))
+    ).mappings().one()
+    return {name: float(value or 0) for name, value in row.items()}
+
+
+def rollup_totals_by_day(
+    db: Session,
+    start_date: date | None,
+    end_date: date | None,
+    branch_id: int | None = None,
+    seller_id: int | None = None,
+) -> list[tuple[date, dict[str, float]]]:
+    rows = db.execute(
+        select(DailySalesRollup.day, *_sum_columns())
+        .where(*_rollup_filters(start_date, end_date, branch_id, seller_id))
+        .group_by(DailySalesRollup.day)
+        .order_by(DailySalesRollup.day)
+    ).mappings().all()
+    return [
+        (row["day"], {name: float(row[name] or 0) for name in ROLLUP_FIELDS})
+        for row in rows
+    ]
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _created_between(column, start_date: date | None, end_date: date | None) -> list:
+    filters = []
+    if start_date:
+        filters.append(column >= datetime.combine(start_date, time.min))
+    if end_date:
+        filters.append(column < datetime.combine(end_date + timedelta(days=1), time.min))
+    return filters
+
+
+def rebuild_daily_rollups(db: Session, start_date: date | None = None, end_date: date | None = None) -> int:
+    """Recompute rollup rows from the source tables for the given day range (all days by default).
+
+    Cost of goods is priced as of each sale or return (``purchase_price_as_of``), so a rebuild
+    does not reprice past days at today's ``Product.purchase_price``.
+    """
+    # reports imports this module for ROLLUP_FIELDS.
+    from app.services.reports import purchase_price_as_of
+
+    totals: dict[tuple[date, int, int], dict[str, Decimal]] = defaultdict(
+        lambda: {name: Decimal("0") for name in ROLLUP_FIELDS}
+    )
+
+    def add(day, branch_id, seller_id, **values) -> None:
+        row = totals[(_as_date(day), branch_id or 0, seller_id or 0)]
+        for name, value in values.items():
+            row[name] += Decimal(str(value or 0))
+
+    sale_day = func.date(Sale.created_at)
+    for day, branch_id, seller_id, count, total, cash, card, debt, debts_created in db.execute(
+        select(
+            sale_day,
+            Sale.branch_id,
+            Sale.seller_id,
+            func.count(Sale.id),
+            func.sum(Sale.total_amount),
+            func.sum(Sale.paid_cash),
+            func.sum(Sale.paid_card),
+            func.sum(Sale.paid_debt),
+            func.sum(case((Sale.client_id.is_not(None), Sale.paid_debt), else_=0)),
+        )
+        .where(*_created_between(Sale.created_at, start_date, end_date))
+        .group_by(sale_day, Sale.branch_id, Sale.seller_id)
+    ).all():
+        add(
+            day,
+            branch_id,
+            seller_id,
+            sales_count=count,
+            sales_total=total,
+            sales_cash=cash,
+            sales_card=card,
+            sales_debt=debt,
+            debts_created=debts_created,
+        )
+
+    for day, branch_id, seller_id, cogs in db.execute(
+        select(
+            sale_day,
+            Sale.branch_id,
+            Sale.seller_id,
+            func.sum(SaleItem.quantity * purchase_price_as_of(Sale.created_at)),
+        )
+        .select_from(SaleItem)
+        .join(Sale, SaleItem.sale_id == Sale.id)
+        .join(Product, SaleItem.product_id == Product.id)
+        .where(*_created_between(Sale.created_at, start_date, end_date))
+        .group_by(sale_day, Sale.branch_id, Sale.seller_id)
+    ).all():
+        add(day, branch_id, seller_id, sales_cogs=cogs)
+
+    return_day = func.date(Return.created_at)
+    for day, branch_id, seller_id, total, cash, card, debt in db.execute(
+        select(
+            return_day,
+            Return.branch_id,
+            Return.created_by_id,
+            func.sum(Return.refund_total),
+            func.sum(Return.refund_cash),
+            func.sum(Return.refund_card),
+            func.sum(Return.refund_debt),
+        )
+        .where(*_created_between(Return.created_at, start_date, end_date))
+        .group_by(return_day, Return.branch_id, Return.created_by_id)
+    ).all():
+        add(
+            day,
+            branch_id,
+            seller_id,
+            refunds_total=total,
+            refunds_cash=cash,
+            refunds_card=card,
+            refunds_debt=debt,
+        )
+
+    for day, branch_id, seller_id, cogs in db.execute(
+        select(
+            return_day,
+            Return.branch_id,
+            Return.created_by_id,
+            func.sum(ReturnItem.quantity * purchase_price_as_of(Return.created_at)),
+        )
+        .select_from(ReturnItem)
+        .join(Return, ReturnItem.return_id == Return.id)
+        .join(SaleItem, ReturnItem.sale_item_id == SaleItem.id)
+        .join(Product, SaleItem.product_id == Product.id)
+        .where(*_created_between(Return.created_at, start_date, end_date))
+        .group_by(return_day, Return.branch_id, Return.created_by_id)
+    ).all():
+        add(day, branch_id, seller_id, returns_cogs=cogs)
+
+    payment_day = func.date(DebtPayment.created_at)
+    for day, branch_id, seller_id, cash, card in db.execute(
+        select(
+            payment_day,
+            DebtPayment.branch_id,
+            DebtPayment.processed_by_id,
+            func.sum(case((DebtPayment.payment_type == "cash", DebtPayment.amount), else_=0)),
+            func.sum(
+                case((DebtPayment.payment_type.notin_(["cash", "offset"]), DebtPayment.amount), else_=0)
+            ),
+        )
+        .where(*_created_between(DebtPayment.created_at, start_date, end_date))
+        .group_by(payment_day, DebtPayment.branch_id, DebtPayment.processed_by_id)
+    ).all():
+        add(
+            day,
+            branch_id,
+            seller_id,
+            debt_payments_cash=cash,
+            debt_payments_card=card,
+            debt_payments_total=Decimal(str(cash or 0)) + Decimal(str(card or 0)),
+        )
+
+    db.execute(delete(DailySalesRollup).where(*_rollup_filters(start_date, end_date)))
+    rows = [
+        {
+            "day": day,
+            "branch_id": branch_id,
+            "seller_id": seller_id,
+            "sales_count": int(values["sales_count"]),
+            **{name: _money(values[name]) for name in MONEY_FIELDS},
+        }
+        for (day, branch_id, seller_id), values in totals.items()
+    ]
+    if rows:
+        db.execute(insert(DailySalesRollup), rows)
+    logger.info("Rebuilt %s daily sales rollup rows (start=%s, end=%s)", len(rows), start_date, end_date)
+    return len(rows)
+
+
+def ensure_daily_rollups(db: Session) -> None:
+    """Backfill the rollup table once, right after it has been introduced."""
+    if db.execute(select(DailySalesRollup.day).limit(1)).first() is not None:
+        logger.info("Daily sales rollups already populated")
+        return
+    if db.execute(select(Sale.id).limit(1)).first() is None and db.execute(select(DebtPayment.id).limit(1)).first() is None:
+        logger.info("No sales yet; nothing to roll up")
+        return
+    rebuild_daily_rollups(db)
+
+
+def main() -> None:
+    from app.database.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollup table from source rows")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        stream=sys.stdout,
+    )
+    with SessionLocal() as db:
+        rebuild_daily_rollups(db, args.start, args.end)
+        db.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+from decimal import Decimal
+from typing import Iterable, Mapping
+
 from sqlalchemy.orm import Session
 
-from app.models import Branch
+from app.models import Branch, Product
+from app.services.inventory import adjust_stock_many, aggregate_deltas
 
 WORKSHOP_NAME = "Цех"
 
@@ -27,3 +31,26 @@ def get_workshop_branch_id(db: Session) -> int:
     db.commit()
     db.refresh(branch)
     return branch.id
+
+
+def load_products(db: Session, product_ids: Iterable[int]) -> dict[int, Product]:
+    """Fetch a bill of materials' products with one query; missing ids are absent from the result."""
+    ids = set(product_ids)
+    if not ids:
+        return {}
+    return {product.id: product for product in db.query(Product).filter(Product.id.in_(ids))}
+
+
+def write_off_materials(
+    db: Session,
+    branch_id: int,
+    quantities: Mapping[int, Decimal],
+) -> dict[int, Decimal]:
+    """Take ``quantities`` (product_id -> consumed qty, negative to return) off the workshop stock.
+
+    All rows go through one multi-row UPSERT in product_id order, so orders built from large
+    templates lock their stock rows briefly and in the same order. Workshop stock may go
+    negative, as it did before. Returns the resulting quantity per product.
+    """
+    deltas = aggregate_deltas((product_id, -quantity) for product_id, quantity in quantities.items())
+    return adjust_stock_many(db, branch_id, deltas, allow_negative=True)
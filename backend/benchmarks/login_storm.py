@@ -0,0 +1,128 @@
+"""Login storm benchmark.
+
+Fires concurrent logins at a running API (a shift change at the tills) and meanwhile
+probes another endpoint, then prints login throughput and the probe's latency with and
+without the storm. Only the standard library is used, so it runs from the backend venv:
+
+    python -m benchmarks.login_storm --base-url http://127.0.0.1:8000 --login admin --password admin
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _request(url: str, *, body: dict | None = None, token: str | None = None, timeout: float = 30.0) -> tuple[int, float, bytes]:
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, headers=headers, method="POST" if data is not None else "GET")
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        payload = exc.read()
+        status = exc.code
+    return status, (time.perf_counter() - started) * 1000, payload
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(values: list[float]) -> str:
+    if not values:
+        return "no samples"
+    return (
+        f"n={len(values)} p50={_percentile(values, 50):.1f}ms "
+        f"p99={_percentile(values, 99):.1f}ms max={max(values):.1f}ms mean={statistics.fmean(values):.1f}ms"
+    )
+
+
+def _probe(url: str, token: str | None, stop: threading.Event, interval: float, samples: list[float], errors: list[int]) -> None:
+    while not stop.is_set():
+        status, elapsed, _ = _request(url, token=token)
+        if status >= 400:
+            errors.append(status)
+        else:
+            samples.append(elapsed)
+        stop.wait(interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure login throughput and API latency during a login storm")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--login", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--logins", type=int, default=100, help="Total logins in the storm")
+    parser.add_argument("--concurrency", type=int, default=20, help="Logins in flight at once")
+    parser.add_argument("--probe-path", default="/api/auth/me", help="Endpoint probed during the storm")
+    parser.add_argument("--probe-interval", type=float, default=0.02, help="Pause between probe requests (s)")
+    parser.add_argument("--baseline-seconds", type=float, default=3.0, help="Probe-only warm-up before the storm")
+    args = parser.parse_args()
+
+    base = args.base_url.rstrip("/")
+    login_url = f"{base}/api/auth/login"
+    probe_url = f"{base}{args.probe_path}"
+    credentials = {"login": args.login, "password": args.password}
+
+    status, _, payload = _request(login_url, body=credentials)
+    if status != 200:
+        raise SystemExit(f"Initial login failed with HTTP {status}: {payload[:200]!r}")
+    token = json.loads(payload)["access_token"]
+
+    baseline: list[float] = []
+    baseline_errors: list[int] = []
+    stop = threading.Event()
+    prober = threading.Thread(
+        target=_probe, args=(probe_url, token, stop, args.probe_interval, baseline, baseline_errors), daemon=True
+    )
+    prober.start()
+    time.sleep(args.baseline_seconds)
+    stop.set()
+    prober.join()
+
+    during: list[float] = []
+    during_errors: list[int] = []
+    stop = threading.Event()
+    prober = threading.Thread(
+        target=_probe, args=(probe_url, token, stop, args.probe_interval, during, during_errors), daemon=True
+    )
+    prober.start()
+
+    login_times: list[float] = []
+    login_errors: list[int] = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for status, elapsed, _ in pool.map(lambda _: _request(login_url, body=credentials), range(args.logins)):
+            if status == 200:
+                login_times.append(elapsed)
+            else:
+                login_errors.append(status)
+    storm_seconds = time.perf_counter() - started
+    stop.set()
+    prober.join()
+
+    print(f"Logins: {len(login_times)} ok, {len(login_errors)} failed in {storm_seconds:.2f}s "
+          f"({len(login_times) / storm_seconds:.1f}/s, concurrency={args.concurrency})")
+    print(f"  login latency: {_summary(login_times)}")
+    print(f"Probe {args.probe_path}")
+    print(f"  baseline:     {_summary(baseline)} errors={len(baseline_errors)}")
+    print(f"  during storm: {_summary(during)} errors={len(during_errors)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""add daily sales rollups
+
+Revision ID: 20260310_add_daily_sales_rollups
+Revises: 20260305_decimal_workshop_quantities
+Create Date: 2026-03-10 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260310_add_daily_sales_rollups"
+down_revision = "20260305_decimal_workshop_quantities"
+branch_labels = None
+depends_on = None
+
+MONEY_COLUMNS = (
+    "sales_total",
+    "sales_cash",
+    "sales_card",
+    "sales_debt",
+    "debts_created",
+    "refunds_total",
+    "refunds_cash",
+    "refunds_card",
+    "refunds_debt",
+    "sales_cogs",
+    "returns_cogs",
+    "debt_payments_cash",
+    "debt_payments_card",
+    "debt_payments_total",
+)
+
+
+def upgrade() -> None:
+    # Rows are backfilled by the application bootstrap (app.services.rollups.ensure_daily_rollups).
+    op.create_table(
+        "daily_sales_rollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("branch_id", sa.Integer(), nullable=False),
+        sa.Column("seller_id", sa.Integer(), nullable=False),
+        sa.Column("sales_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        *[
+            sa.Column(name, sa.Numeric(14, 2), nullable=False, server_default=sa.text("0"))
+            for name in MONEY_COLUMNS
+        ],
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+        sa.PrimaryKeyConstraint("day", "branch_id", "seller_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_sales_rollups")
@@ -0,0 +1,95 @@
+"""persist refund breakdown on returns
+
+Revision ID: 20260312_add_return_refund_breakdown
+Revises: 20260310_add_daily_sales_rollups
+Create Date: 2026-03-12 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260312_add_return_refund_breakdown"
+down_revision = "20260310_add_daily_sales_rollups"
+branch_labels = None
+depends_on = None
+
+REFUND_COLUMNS = ("refund_total", "refund_cash", "refund_card", "refund_debt")
+
+# Each non-offset return covers the interval [prior, prior + total) of the sale's payments,
+# laid out as debt, then cash, then card (the same order app.services.returns.split_refund uses).
+BACKFILL_SQL = """
+WITH totals AS (
+    SELECT
+        r.id,
+        r.sale_id,
+        r.created_at,
+        CAST(COALESCE(r.debt_offset_amount, 0) AS NUMERIC(12, 2)) AS offset_amount,
+        CAST(COALESCE((SELECT SUM(ri.amount) FROM return_items ri WHERE ri.return_id = r.id), 0) AS NUMERIC(12, 2)) AS total
+    FROM returns r
+),
+ordered AS (
+    SELECT
+        t.id,
+        t.total,
+        t.offset_amount,
+        CAST(COALESCE(s.paid_debt, 0) AS NUMERIC(12, 2)) AS debt_pool,
+        CAST(COALESCE(s.paid_cash, 0) AS NUMERIC(12, 2)) AS cash_pool,
+        COALESCE(
+            SUM(CASE WHEN t.offset_amount > 0 THEN 0 ELSE t.total END) OVER (
+                PARTITION BY t.sale_id
+                ORDER BY t.created_at, t.id
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ),
+            0
+        ) AS prior
+    FROM totals t
+    JOIN sales s ON s.id = t.sale_id
+),
+split AS (
+    SELECT
+        id,
+        total,
+        CASE
+            WHEN offset_amount > 0 THEN {least}(offset_amount, total)
+            ELSE {greatest}({least}(prior + total, debt_pool) - {least}(prior, debt_pool), 0)
+        END AS debt,
+        CASE
+            WHEN offset_amount > 0 THEN total - {least}(offset_amount, total)
+            ELSE {greatest}({least}(prior + total, debt_pool + cash_pool) - {greatest}(prior, debt_pool), 0)
+        END AS cash
+    FROM ordered
+)
+UPDATE returns
+SET refund_total = split.total,
+    refund_debt = split.debt,
+    refund_cash = split.cash,
+    refund_card = split.total - split.debt - split.cash
+FROM split
+WHERE returns.id = split.id
+"""
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("returns")}
+    for name in REFUND_COLUMNS:
+        if name in columns:
+            continue
+        op.add_column(
+            "returns",
+            sa.Column(name, sa.Numeric(12, 2), nullable=False, server_default=sa.text("0")),
+        )
+
+    is_sqlite = op.get_bind().dialect.name == "sqlite"
+    op.execute(
+        BACKFILL_SQL.format(
+            least="MIN" if is_sqlite else "LEAST",
+            greatest="MAX" if is_sqlite else "GREATEST",
+        )
+    )
+
+
+def downgrade() -> None:
+    for name in reversed(REFUND_COLUMNS):
+        op.drop_column("returns", name)
@@ -0,0 +1,41 @@
+"""add trigram indexes for product search
+
+Revision ID: 20260314_add_product_search_indexes
+Revises: 20260312_add_return_refund_breakdown
+Create Date: 2026-03-14 10:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260314_add_product_search_indexes"
+down_revision = "20260312_add_return_refund_breakdown"
+branch_labels = None
+depends_on = None
+
+TRGM_INDEXES = {
+    "ix_products_name_trgm": "name",
+    "ix_products_barcode_trgm": "barcode",
+}
+
+
+def upgrade() -> None:
+    # SQLite (local runs) has no trigram indexes; product search falls back to a scan there.
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRGM_INDEXES.items():
+        op.create_index(
+            name,
+            "products",
+            [column],
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for name in TRGM_INDEXES:
+        op.drop_index(name, table_name="products")
@@ -0,0 +1,65 @@
+"""add composite indexes for report date ranges
+
+Revision ID: 20260318_add_report_range_indexes
+Revises: 20260316_add_refresh_tokens
+Create Date: 2026-03-18 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260318_add_report_range_indexes"
+down_revision = "20260316_add_refresh_tokens"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_sales_created_at_branch_id", "sales", ["created_at", "branch_id"]),
+    ("ix_sales_seller_id_created_at", "sales", ["seller_id", "created_at"]),
+    ("ix_sales_client_id_created_at", "sales", ["client_id", "created_at"]),
+    ("ix_sales_items_sale_id", "sales_items", ["sale_id"]),
+    ("ix_debts_client_id_created_at", "debts", ["client_id", "created_at"]),
+    ("ix_debts_sale_id", "debts", ["sale_id"]),
+    ("ix_returns_created_at_branch_id", "returns", ["created_at", "branch_id"]),
+    ("ix_returns_sale_id", "returns", ["sale_id"]),
+    ("ix_return_items_return_id", "return_items", ["return_id"]),
+    ("ix_return_items_sale_item_id", "return_items", ["sale_item_id"]),
+    ("ix_debt_payments_created_at_branch_id", "debt_payments", ["created_at", "branch_id"]),
+    ("ix_debt_payments_client_id_created_at", "debt_payments", ["client_id", "created_at"]),
+    ("ix_expenses_created_at_branch_id", "expenses", ["created_at", "branch_id"]),
+    ("ix_salary_payments_created_at", "salary_payments", ["created_at"]),
+    ("ix_salary_payments_employee_id_created_at", "salary_payments", ["employee_id", "created_at"]),
+    ("ix_workshop_orders_branch_id_created_at", "workshop_orders", ["branch_id", "created_at"]),
+]
+
+
+def _existing_indexes(inspector, table: str) -> set[str]:
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    missing = [
+        (name, table, columns)
+        for name, table, columns in INDEXES
+        if inspector.has_table(table) and name not in _existing_indexes(inspector, table)
+    ]
+    if not missing:
+        return
+    if bind.dialect.name == "postgresql":
+        # CONCURRENTLY keeps the sales tables writable while the indexes are built.
+        with op.get_context().autocommit_block():
+            for name, table, columns in missing:
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+        return
+    for name, table, columns in missing:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, _ in reversed(INDEXES):
+        if inspector.has_table(table) and name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,39 @@
+"""add returned quantity counter to sales items
+
+Revision ID: 20260320_add_sales_items_returned_quantity
+Revises: 20260318_add_report_range_indexes
+Create Date: 2026-03-20 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260320_add_sales_items_returned_quantity"
+down_revision = "20260318_add_report_range_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("sales_items")}
+    if "returned_quantity" not in columns:
+        op.add_column(
+            "sales_items",
+            sa.Column("returned_quantity", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        )
+    op.execute(
+        """
+        UPDATE sales_items
+        SET returned_quantity = COALESCE(
+            (SELECT SUM(return_items.quantity) FROM return_items WHERE return_items.sale_item_id = sales_items.id),
+            0
+        )
+        WHERE EXISTS (SELECT 1 FROM return_items WHERE return_items.sale_item_id = sales_items.id)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("sales_items", "returned_quantity")
@@ -0,0 +1,100 @@
+"""add client debt ledger and store debt amounts as numeric
+
+Revision ID: 20260322_add_debt_ledger
+Revises: 20260320_add_sales_items_returned_quantity
+Create Date: 2026-03-22 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260322_add_debt_ledger"
+down_revision = "20260320_add_sales_items_returned_quantity"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE clients SET total_debt = 0 WHERE total_debt IS NULL")
+    op.alter_column(
+        "clients",
+        "total_debt",
+        existing_type=sa.Float(),
+        type_=sa.Numeric(12, 2),
+        nullable=False,
+        server_default=sa.text("0"),
+        postgresql_using="round(total_debt::numeric, 2)",
+    )
+    op.execute("UPDATE debts SET paid = 0 WHERE paid IS NULL")
+    op.alter_column(
+        "debts",
+        "amount",
+        existing_type=sa.Float(),
+        type_=sa.Numeric(12, 2),
+        postgresql_using="round(amount::numeric, 2)",
+    )
+    op.alter_column(
+        "debts",
+        "paid",
+        existing_type=sa.Float(),
+        type_=sa.Numeric(12, 2),
+        server_default=sa.text("0"),
+        postgresql_using="round(paid::numeric, 2)",
+    )
+
+    op.create_table(
+        "debt_ledger",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("entry_type", sa.String(length=30), nullable=False),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("balance_after", sa.Numeric(12, 2), nullable=False),
+        sa.Column("sale_id", sa.Integer(), sa.ForeignKey("sales.id", ondelete="SET NULL"), nullable=True),
+        sa.Column(
+            "debt_payment_id",
+            sa.Integer(),
+            sa.ForeignKey("debt_payments.id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+        sa.Column("return_id", sa.Integer(), sa.ForeignKey("returns.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("created_by_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("ix_debt_ledger_client_id_id", "debt_ledger", ["client_id", "id"])
+    # Existing balances become opening entries, so the ledger sums to them from day one.
+    op.execute(
+        """
+        INSERT INTO debt_ledger (client_id, entry_type, amount, balance_after)
+        SELECT id, 'opening', total_debt, total_debt FROM clients WHERE total_debt <> 0
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_debt_ledger_client_id_id", table_name="debt_ledger")
+    op.drop_table("debt_ledger")
+    op.alter_column(
+        "debts",
+        "paid",
+        existing_type=sa.Numeric(12, 2),
+        type_=sa.Float(),
+        server_default=None,
+        postgresql_using="paid::double precision",
+    )
+    op.alter_column(
+        "debts",
+        "amount",
+        existing_type=sa.Numeric(12, 2),
+        type_=sa.Float(),
+        postgresql_using="amount::double precision",
+    )
+    op.alter_column(
+        "clients",
+        "total_debt",
+        existing_type=sa.Numeric(12, 2),
+        type_=sa.Float(),
+        nullable=True,
+        server_default=None,
+        postgresql_using="total_debt::double precision",
+    )
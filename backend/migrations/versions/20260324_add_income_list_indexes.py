@@ -0,0 +1,50 @@
+"""add indexes for the income list
+
+Revision ID: 20260324_add_income_list_indexes
+Revises: 20260322_add_debt_ledger
+Create Date: 2026-03-24 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260324_add_income_list_indexes"
+down_revision = "20260322_add_debt_ledger"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_income_branch_id_created_at", "income", ["branch_id", "created_at"]),
+    ("ix_income_items_income_id", "income_items", ["income_id"]),
+]
+
+
+def _existing_indexes(inspector, table: str) -> set[str]:
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    missing = [
+        (name, table, columns)
+        for name, table, columns in INDEXES
+        if inspector.has_table(table) and name not in _existing_indexes(inspector, table)
+    ]
+    if not missing:
+        return
+    if bind.dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, columns in missing:
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+        return
+    for name, table, columns in missing:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, _ in reversed(INDEXES):
+        if inspector.has_table(table) and name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,38 @@
+"""add report results cache and job table
+
+Revision ID: 20260326_add_report_results
+Revises: 20260324_add_income_list_indexes
+Create Date: 2026-03-26 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260326_add_report_results"
+down_revision = "20260324_add_income_list_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "report_results",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("report_type", sa.String(length=50), nullable=False),
+        sa.Column("params_key", sa.String(length=64), nullable=False),
+        sa.Column("params", sa.JSON(), nullable=False),
+        sa.Column("data_version", sa.String(length=64), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("requested_by_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("report_type", "params_key", "data_version", name="uq_report_results_key_version"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("report_results")
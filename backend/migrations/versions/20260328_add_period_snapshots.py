@@ -0,0 +1,39 @@
+"""add closed periods and period report snapshots
+
+Revision ID: 20260328_add_period_snapshots
+Revises: 20260326_add_report_results
+Create Date: 2026-03-28 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260328_add_period_snapshots"
+down_revision = "20260326_add_report_results"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "closed_periods",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("month", sa.String(length=7), nullable=False, unique=True),
+        sa.Column("closed_by_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("closed_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_table(
+        "period_snapshots",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("period_id", sa.Integer(), sa.ForeignKey("closed_periods.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("month", sa.String(length=7), nullable=False),
+        sa.Column("report_type", sa.String(length=50), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=False),
+        sa.UniqueConstraint("month", "report_type", name="uq_period_snapshots_month_report"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("period_snapshots")
+    op.drop_table("closed_periods")
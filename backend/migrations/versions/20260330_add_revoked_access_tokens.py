@@ -0,0 +1,30 @@
+"""add revoked access tokens shared by all workers
+
+Revision ID: 20260330_add_revoked_access_tokens
+Revises: 20260328_add_period_snapshots
+Create Date: 2026-03-30 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260330_add_revoked_access_tokens"
+down_revision = "20260328_add_period_snapshots"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "revoked_access_tokens",
+        sa.Column("jti", sa.String(length=64), primary_key=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+    )
+    op.create_index("ix_revoked_access_tokens_expires_at", "revoked_access_tokens", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_revoked_access_tokens_expires_at", table_name="revoked_access_tokens")
+    op.drop_table("revoked_access_tokens")
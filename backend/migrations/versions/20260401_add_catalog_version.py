@@ -0,0 +1,29 @@
+"""add shared catalogue version counter
+
+Revision ID: 20260401_add_catalog_version
+Revises: 20260330_add_revoked_access_tokens
+Create Date: 2026-04-01 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20260401_add_catalog_version"
+down_revision = "20260330_add_revoked_access_tokens"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "catalog_version",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("products_version", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+    )
+    op.execute("INSERT INTO catalog_version (id, version, products_version) VALUES (1, 0, 0)")
+
+
+def downgrade() -> None:
+    op.drop_table("catalog_version")
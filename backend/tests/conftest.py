@@ -0,0 +1,83 @@
+"""Test setup: the app on a throwaway SQLite database, as for local runs.
+
+The schema is created from the models rather than by Alembic, whose revisions are
+PostgreSQL-only; ``now()`` server defaults are rewritten to their SQLite equivalent.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+_DB_PATH = Path(tempfile.mkdtemp(prefix="kassa-tests-")) / "kassa.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+os.environ["AUTO_RUN_MIGRATIONS"] = "false"
+os.environ["DEBUG"] = "false"
+# Re-read the shared catalogue version on every request, as if polled by another worker.
+os.environ["CATALOG_VERSION_CHECK_SECONDS"] = "0"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
+from sqlalchemy.schema import DefaultClause  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.database.base import Base  # noqa: E402
+from app.database.session import engine  # noqa: E402
+
+_SQLITE_NOW = DefaultClause(text("(strftime('%Y-%m-%d %H:%M:%f000', 'now'))"))
+
+
+def _create_schema() -> None:
+    for table in Base.metadata.tables.values():
+        for column in table.columns:
+            default = column.server_default
+            arg = getattr(default, "arg", None)
+            if arg is not None and (str(getattr(arg, "text", "")) == "now()" or getattr(arg, "name", "") == "now"):
+                column.server_default = _SQLITE_NOW
+    Base.metadata.create_all(bind=engine)
+
+
+@event.listens_for(engine, "connect")
+def _register_now(dbapi_connection, connection_record):
+    dbapi_connection.create_function("now", 0, lambda: datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"))
+
+
+@pytest.fixture(scope="session")
+def client():
+    engine.dispose()
+    _create_schema()
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    response = client.post("/api/auth/login", json={"login": "admin", "password": "admin"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@contextmanager
+def _count_queries():
+    """Collect the SQL statements executed inside the block."""
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+@pytest.fixture
+def count_queries():
+    """``with count_queries() as statements:`` collects the statements run in the block."""
+    return _count_queries
@@ -0,0 +1,110 @@
+"""Catalogue and barcode caches notice writes committed by other processes."""
+from __future__ import annotations
+
+from itertools import count
+
+import pytest
+from sqlalchemy import text
+
+from app.database.session import engine
+from app.services.catalog import barcode_index, catalog_cache
+
+_codes = count(1)
+
+
+def _other_process(statement: str, **params) -> None:
+    # A plain connection bypasses this process's Session hooks, like another worker or psql.
+    with engine.begin() as connection:
+        connection.execute(text(statement), params)
+
+
+def _bump_shared_version(products: bool = True) -> None:
+    _other_process(
+        "UPDATE catalog_version SET version = version + 1, products_version = products_version + :step WHERE id = 1",
+        step=int(products),
+    )
+
+
+@pytest.fixture
+def product(client, admin_headers):
+    code = f"SV{next(_codes)}"
+    response = client.post(
+        "/api/products",
+        json={"name": f"Shared {code}", "barcode": code, "purchase_price": 10, "sale_price": 20, "unit": "шт"},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200, response.text
+    branches = client.get("/api/branches", headers=admin_headers).json()
+    store = next(branch for branch in branches if branch["name"] == "Магазин")
+    income = client.post(
+        "/api/income",
+        json={
+            "branch_id": store["id"],
+            "items": [{"product_id": response.json()["id"], "quantity": 10, "purchase_price": 10, "sale_price": 20}],
+        },
+        headers=admin_headers,
+    )
+    assert income.status_code == 201, income.text
+    return {**response.json(), "branch_id": store["id"]}
+
+
+def _catalog_item(response, product_id: int) -> dict:
+    return next(item for item in response.json() if item["id"] == product_id)
+
+
+def test_local_write_bumps_shared_version(client, admin_headers, product):
+    with engine.connect() as connection:
+        before = connection.execute(text("SELECT version FROM catalog_version WHERE id = 1")).scalar_one()
+    response = client.put(f"/api/products/{product['id']}", json={"sale_price": 21}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    with engine.connect() as connection:
+        after = connection.execute(text("SELECT version FROM catalog_version WHERE id = 1")).scalar_one()
+    assert after == before + 1
+
+
+def test_catalog_sees_price_change_from_other_process(client, admin_headers, product):
+    first = client.get("/api/cashier/products", headers=admin_headers)
+    assert first.status_code == 200, first.text
+    etag = first.headers["ETag"]
+
+    _other_process("UPDATE products SET sale_price = 55 WHERE id = :id", id=product["id"])
+    _bump_shared_version()
+
+    second = client.get("/api/cashier/products", headers={**admin_headers, "If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
+    assert _catalog_item(second, product["id"])["sale_price"] == 55
+
+
+def test_barcode_scan_sees_sale_from_other_process(client, admin_headers, product):
+    url = f"/api/pos/barcode/{product['barcode']}"
+    assert client.get(url, headers=admin_headers).json()["quantity"] == 10
+
+    _other_process(
+        "UPDATE stock SET quantity = 7 WHERE product_id = :product_id AND branch_id = :branch_id",
+        product_id=product["id"],
+        branch_id=product["branch_id"],
+    )
+    _bump_shared_version(products=False)
+    assert client.get(url, headers=admin_headers).json()["quantity"] == 7
+
+    _other_process("UPDATE products SET sale_price = 33 WHERE id = :id", id=product["id"])
+    _bump_shared_version()
+    assert client.get(url, headers=admin_headers).json()["sale_price"] == 33
+
+
+def test_unversioned_sql_is_picked_up_after_max_age(client, admin_headers, product, monkeypatch):
+    first = client.get("/api/cashier/products", headers=admin_headers)
+    etag = first.headers["ETag"]
+    url = f"/api/pos/barcode/{product['barcode']}"
+    client.get(url, headers=admin_headers)
+
+    _other_process("UPDATE products SET sale_price = 44 WHERE id = :id", id=product["id"])
+    monkeypatch.setattr(catalog_cache, "_max_age", 0)
+    monkeypatch.setattr(barcode_index, "_max_age", 0)
+
+    second = client.get("/api/cashier/products", headers={**admin_headers, "If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
+    assert _catalog_item(second, product["id"])["sale_price"] == 44
+    assert client.get(url, headers=admin_headers).json()["sale_price"] == 44
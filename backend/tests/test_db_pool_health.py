@@ -0,0 +1,15 @@
+"""The pool report at /api/health/db is admin-only and counts connection checkouts."""
+from __future__ import annotations
+
+
+def test_pool_health_requires_admin(client):
+    assert client.get("/api/health/db").status_code == 401
+
+
+def test_pool_health_reports_checkouts(client, admin_headers):
+    client.get("/api/branches", headers=admin_headers)
+    response = client.get("/api/health/db", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    pool = response.json()["pool"]
+    assert pool["checkins"] > 0
+    assert pool["hold_max_ms"] >= pool["hold_avg_ms"] >= 0
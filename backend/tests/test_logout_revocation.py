@@ -0,0 +1,30 @@
+"""A logged-out access token stays refused by workers that did not handle the logout."""
+from __future__ import annotations
+
+from app.auth.revocation import revoked_tokens
+
+
+def _login(client) -> dict:
+    response = client.post("/api/auth/login", json={"login": "admin", "password": "admin"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_logout_survives_cleared_memory(client):
+    headers = _login(client)
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    assert client.post("/api/auth/logout", headers=headers).status_code == 204
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+    # As seen by another worker, or by this one after a restart.
+    revoked_tokens.clear()
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_other_sessions_stay_valid_after_logout(client):
+    first, second = _login(client), _login(client)
+    assert client.post("/api/auth/logout", headers=first).status_code == 204
+
+    revoked_tokens.clear()
+    assert client.get("/api/auth/me", headers=second).status_code == 200
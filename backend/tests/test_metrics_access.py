@@ -0,0 +1,17 @@
+"""/api/metrics is readable by admins and by a scraper holding METRICS_SCRAPE_TOKEN."""
+from __future__ import annotations
+
+from app.core.config import get_settings
+
+
+def test_metrics_require_admin(client, admin_headers):
+    assert client.get("/api/metrics").status_code == 401
+    response = client.get("/api/metrics", headers=admin_headers)
+    assert response.status_code == 200
+    assert "kassa_http_requests_total" in response.text
+
+
+def test_metrics_accept_scrape_token(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "metrics_scrape_token", "scrape-secret")
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
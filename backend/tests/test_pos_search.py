@@ -0,0 +1,55 @@
+"""POS search limits products, not product × branch stock rows."""
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def stocked_products(client, admin_headers):
+    branches = []
+    for name in ("POS limit A", "POS limit B"):
+        branch = client.post("/api/branches", json={"name": name}, headers=admin_headers)
+        assert branch.status_code == 200, branch.text
+        branches.append(branch.json()["id"])
+    product_ids = []
+    for index in range(3):
+        product = client.post(
+            "/api/products",
+            json={"name": f"Polimit {index}", "barcode": f"PL{index}", "purchase_price": 5, "sale_price": 9, "unit": "шт"},
+            headers=admin_headers,
+        )
+        assert product.status_code == 200, product.text
+        product_ids.append(product.json()["id"])
+    for branch_id in branches:
+        income = client.post(
+            "/api/income",
+            json={
+                "branch_id": branch_id,
+                "items": [
+                    {"product_id": product_id, "quantity": 4, "purchase_price": 5, "sale_price": 9}
+                    for product_id in product_ids
+                ],
+            },
+            headers=admin_headers,
+        )
+        assert income.status_code == 201, income.text
+    return {"branches": branches, "products": product_ids}
+
+
+def test_limit_counts_products_across_branches(client, admin_headers, stocked_products):
+    response = client.get("/api/pos/products", params={"query": "polimit", "limit": 2}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    rows = [(item["id"], item["branch_id"]) for item in response.json()]
+    first, second = stocked_products["products"][:2]
+    assert rows == [(product_id, branch_id) for product_id in (first, second) for branch_id in stocked_products["branches"]]
+
+
+def test_limit_with_branch_scope(client, admin_headers, stocked_products):
+    branch_id = stocked_products["branches"][1]
+    response = client.get(
+        "/api/pos/products", params={"query": "polimit", "limit": 2, "branch_id": branch_id}, headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    assert [(item["id"], item["branch_id"]) for item in response.json()] == [
+        (product_id, branch_id) for product_id in stocked_products["products"][:2]
+    ]
@@ -0,0 +1,58 @@
+"""Rebuilding daily rollups keeps the cost of goods recorded when the goods were sold."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from app.database.session import SessionLocal
+from app.services.rollups import rebuild_daily_rollups, rollup_totals
+
+
+def _totals() -> dict[str, float]:
+    today = datetime.utcnow().date()
+    with SessionLocal() as db:
+        return rollup_totals(db, today, today)
+
+
+def _rebuild() -> None:
+    today = datetime.utcnow().date()
+    with SessionLocal() as db:
+        rebuild_daily_rollups(db, today, today)
+        db.commit()
+
+
+def test_rebuild_prices_cogs_as_of_the_sale(client, admin_headers):
+    product = client.post(
+        "/api/products",
+        json={"name": "Rollup cost", "barcode": "RC1", "purchase_price": 10, "sale_price": 20, "unit": "шт"},
+        headers=admin_headers,
+    )
+    assert product.status_code == 200, product.text
+    product_id = product.json()["id"]
+    branches = client.get("/api/branches", headers=admin_headers).json()
+    store = next(branch for branch in branches if branch["name"] == "Магазин")
+    income = client.post(
+        "/api/income",
+        json={
+            "branch_id": store["id"],
+            "items": [{"product_id": product_id, "quantity": 10, "purchase_price": 10, "sale_price": 20}],
+        },
+        headers=admin_headers,
+    )
+    assert income.status_code == 201, income.text
+    sale = client.post(
+        "/api/sales",
+        json={
+            "items": [{"product_id": product_id, "quantity": 3, "price": 20}],
+            "paid_cash": 60,
+            "payment_type": "cash",
+        },
+        headers=admin_headers,
+    )
+    assert sale.status_code == 201, sale.text
+    recorded = _totals()
+
+    repriced = client.put(f"/api/products/{product_id}", json={"purchase_price": 99}, headers=admin_headers)
+    assert repriced.status_code == 200, repriced.text
+    _rebuild()
+
+    assert _totals()["sales_cogs"] == recorded["sales_cogs"]
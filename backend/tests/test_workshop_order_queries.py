@@ -0,0 +1,109 @@
+"""The workshop order detail and quantity change must not issue a query per material or payout."""
+from __future__ import annotations
+
+from itertools import count
+
+import pytest
+
+DETAIL_QUERY_LIMIT = 5
+QUANTITY_UPDATE_QUERY_LIMIT = 15
+
+_names = count(1)
+
+
+def _make_order(client, headers, materials: int, payouts: int) -> int:
+    suffix = next(_names)
+    order_type = client.post("/api/workshop/order-types", json={"name": f"Type {suffix}"}, headers=headers)
+    assert order_type.status_code in (200, 201), order_type.text
+
+    product_ids = []
+    for index in range(materials):
+        product = client.post(
+            "/api/products",
+            json={
+                "name": f"Material {suffix}-{index}",
+                "barcode": f"WQ{suffix}-{index}",
+                "purchase_price": 10,
+                "sale_price": 20,
+                "unit": "шт",
+            },
+            headers=headers,
+        )
+        assert product.status_code == 200, product.text
+        product_ids.append(product.json()["id"])
+    income = client.post(
+        "/api/workshop/income",
+        json={
+            "items": [
+                {"product_id": product_id, "quantity": 100, "purchase_price": 10, "sale_price": 20}
+                for product_id in product_ids
+            ]
+        },
+        headers=headers,
+    )
+    assert income.status_code == 201, income.text
+
+    order = client.post(
+        "/api/workshop/orders",
+        json={
+            "title": f"Order {suffix}",
+            "order_type_id": order_type.json()["id"],
+            "quantity": 1,
+            "amount": 100,
+            "materials": [{"product_id": product_id, "quantity": 1} for product_id in product_ids],
+        },
+        headers=headers,
+    )
+    assert order.status_code == 201, order.text
+    order_id = order.json()["id"]
+
+    for index in range(payouts):
+        employee = client.post(
+            "/api/workshop/employees", json={"first_name": f"Worker {suffix}-{index}"}, headers=headers
+        )
+        assert employee.status_code in (200, 201), employee.text
+        payout = client.post(
+            f"/api/workshop/orders/{order_id}/payouts",
+            json={"employee_id": employee.json()["id"], "amount": 5},
+            headers=headers,
+        )
+        assert payout.status_code == 201, payout.text
+    return order_id
+
+
+@pytest.fixture(scope="module")
+def orders(client, admin_headers):
+    return {
+        "small": _make_order(client, admin_headers, materials=1, payouts=1),
+        "large": _make_order(client, admin_headers, materials=15, payouts=10),
+    }
+
+
+def _detail_queries(client, headers, count_queries, order_id: int) -> int:
+    with count_queries() as statements:
+        response = client.get(f"/api/workshop/orders/{order_id}", headers=headers)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+def _quantity_update_queries(client, headers, count_queries, order_id: int, quantity: int) -> int:
+    with count_queries() as statements:
+        response = client.put(f"/api/workshop/orders/{order_id}", json={"quantity": quantity}, headers=headers)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+def test_order_detail_query_count_is_fixed(client, admin_headers, count_queries, orders):
+    small = _detail_queries(client, admin_headers, count_queries, orders["small"])
+    large = _detail_queries(client, admin_headers, count_queries, orders["large"])
+
+    assert large == small
+    assert large <= DETAIL_QUERY_LIMIT
+
+
+def test_order_quantity_update_query_count_is_fixed(client, admin_headers, count_queries, orders):
+    small = _quantity_update_queries(client, admin_headers, count_queries, orders["small"], quantity=2)
+    large = _quantity_update_queries(client, admin_headers, count_queries, orders["large"], quantity=2)
+
+    assert large == small
+    assert large <= QUANTITY_UPDATE_QUERY_LIMIT